@@ -0,0 +1,62 @@
+# benchmarks/bench_backgrounds.py
+"""
+pytest-benchmark suite for background rendering.
+
+Not collected by the regular test run; run it explicitly with
+
+    pytest benchmarks/bench_backgrounds.py --benchmark-json=results.json
+
+Sizes default to 256x256 and 1024x1024; set RBGEN_BENCH_SIZES (e.g.
+"256x256,4096x4096") to change them. Each case also checks that the timed
+render is perceptually equivalent to the reference thumbnail committed in
+reference_thumbnails.npz, so a rewrite of a renderer that changes its
+output fails here while it is being timed. Cases without a reference
+fail too; after an intended change of output (or to add sizes), update
+the references with
+
+    rbgen bench -s 256x256 1024x1024 --repeat 1 --no-memory \
+        --save-thumbnails benchmarks/reference_thumbnails.npz
+"""
+import os
+import pytest
+from rbgen.backgrounds.regions import render_background
+from rbgen.benchmark import (
+    DEFAULT_PERCEPTUAL_THRESHOLD,
+    bench_cases,
+    load_thumbnails,
+    perceptual_distance,
+    plan_case,
+)
+from rbgen.processing.pool import parse_size
+
+pytest.importorskip("pytest_benchmark")
+
+SIZES = [
+    parse_size(size)
+    for size in os.environ.get("RBGEN_BENCH_SIZES", "256x256,1024x1024").split(",")
+]
+
+CASES = bench_cases(sizes=SIZES)
+
+REFERENCES = load_thumbnails(
+    os.path.join(os.path.dirname(__file__), "reference_thumbnails.npz")
+)
+
+
+@pytest.mark.parametrize("case", CASES, ids=[case["name"] for case in CASES])
+def test_render(benchmark, case):
+    reference = REFERENCES.get(case["name"])
+    if reference is None:
+        pytest.fail(f"No reference thumbnail for {case['name']} (see module docstring)")
+    spec = plan_case(case)
+
+    pixels = benchmark(render_background, spec)
+
+    megapixels = case["size"][0] * case["size"][1] / 1e6
+    benchmark.extra_info["megapixels"] = megapixels
+    distance = perceptual_distance(pixels, reference)
+    benchmark.extra_info["perceptual_distance"] = distance
+    assert distance <= DEFAULT_PERCEPTUAL_THRESHOLD, (
+        f"{case['name']} no longer matches its reference render "
+        f"(distance {distance:.2f})"
+    )
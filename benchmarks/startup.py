@@ -0,0 +1,59 @@
+# benchmarks/startup.py
+"""
+Measure rbgen start-up time.
+
+Each command is run in a fresh interpreter several times and the best
+and median wall-clock times are reported, e.g.
+
+    python benchmarks/startup.py --repeat 20
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+COMMANDS = {
+    "python (baseline)": [sys.executable, "-c", "pass"],
+    "import rbgen": [sys.executable, "-c", "import rbgen"],
+    "rbgen --list-modes": [sys.executable, "-m", "rbgen.main", "--list-modes"],
+    "rbgen --help": [sys.executable, "-m", "rbgen.main", "--help"],
+    "import ImageProcessor": [
+        sys.executable,
+        "-c",
+        "from rbgen.processing.image_processor import ImageProcessor",
+    ],
+}
+
+
+def time_command(command, repeat):
+    """Run a command `repeat` times and return the wall-clock times in seconds."""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [SRC, env.get("PYTHONPATH")]))
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, check=True, env=env, stdout=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure rbgen start-up time")
+    parser.add_argument("--repeat", type=int, default=10, help="Runs per command")
+    args = parser.parse_args()
+
+    print(f"{'command':<24} {'best (ms)':>10} {'median (ms)':>12}")
+    for name, command in COMMANDS.items():
+        times = time_command(command, args.repeat)
+        print(
+            f"{name:<24} {min(times) * 1000:>10.1f} "
+            f"{statistics.median(times) * 1000:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
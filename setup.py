@@ -11,8 +11,7 @@ setup(
     package_dir={"": "src"},
     install_requires=[ 
         "Pillow>=9.0.0",
-        "numpy>=1.20.0",
-        "scipy>=1.7.0"
+        "numpy>=1.20.0"
     ],
     python_requires=">=3.8",
     entry_points={
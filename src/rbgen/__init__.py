@@ -2,39 +2,45 @@
 """
 rbgen - random background generator
 A package for applying various backgrounds and textures to transparent images.
+
+Exports are loaded on first access, so importing rbgen (e.g. for the CLI)
+does not import NumPy, Pillow or any background module up front.
 """
-from rbgen.processing.image_processor import ImageProcessor
-from rbgen.color_schemes.color_utils import (
-    get_complementary,
-    get_analogous,
-    get_triadic,
-    get_monochromatic,
-    get_split_complementary,
-    get_tetradic,
-    generate_color_pair,
-)
-from rbgen.color_schemes.palettes import (
-    BASE_COLOR_OPTIONS, 
-    THEME_COLOR_SCHEMES, 
-    get_themed_color_scheme,
-)
-
-# Import backgrounds as a module
-from rbgen import backgrounds
-
-__all__ = [
-    "ImageProcessor",
-    "get_complementary",
-    "get_analogous",
-    "get_triadic",
-    "get_monochromatic",
-    "get_split_complementary",
-    "get_tetradic",
-    "generate_color_pair",
-    "BASE_COLOR_OPTIONS",
-    "THEME_COLOR_SCHEMES",
-    "get_themed_color_scheme",
-    "backgrounds"
-]
+import importlib
+
+# Public name: module it is loaded from
+_EXPORTS = {
+    "ImageProcessor": "rbgen.processing.image_processor",
+    "apply_background_array": "rbgen.backgrounds.arrays",
+    "get_complementary": "rbgen.color_schemes.color_utils",
+    "get_analogous": "rbgen.color_schemes.color_utils",
+    "get_triadic": "rbgen.color_schemes.color_utils",
+    "get_monochromatic": "rbgen.color_schemes.color_utils",
+    "get_split_complementary": "rbgen.color_schemes.color_utils",
+    "get_tetradic": "rbgen.color_schemes.color_utils",
+    "generate_color_pair": "rbgen.color_schemes.color_utils",
+    "generate_color_pairs": "rbgen.color_schemes.sampling",
+    "BASE_COLOR_OPTIONS": "rbgen.color_schemes.palettes",
+    "THEME_COLOR_SCHEMES": "rbgen.color_schemes.palettes",
+    "get_themed_color_scheme": "rbgen.color_schemes.palettes",
+}
+
+# Subpackages available as attributes
+_SUBMODULES = {"backgrounds", "color_schemes", "processing"}
+
+__all__ = list(_EXPORTS) + ["backgrounds"]
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        value = getattr(importlib.import_module(_EXPORTS[name]), name)
+    elif name in _SUBMODULES:
+        value = importlib.import_module(f"{__name__}.{name}")
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
 
 
+def __dir__():
+    return sorted(set(globals()) | set(__all__) | _SUBMODULES)
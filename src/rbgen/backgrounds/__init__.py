@@ -1,38 +1,24 @@
 # src/rbgen/backgrounds/__init__.py
-from rbgen.backgrounds.solid import apply_solid_background
-from rbgen.backgrounds.striped import apply_striped_background
-from rbgen.backgrounds.checkered import (
-    apply_checkered_background, 
-    apply_perspective_checkered_background,
-)
-from rbgen.backgrounds.fractal import (
-    apply_mandelbrot_background,
-    apply_nested_polygons_background
-)
-from rbgen.backgrounds.shapes import (
-    apply_geometric_shapes_background,
-    apply_concentric_shapes_background
-)
-from rbgen.backgrounds.line import (
-    apply_line_background, 
-    apply_wavy_line_background
-)
-from rbgen.backgrounds.textures import (
-    apply_perlin_noise_background,
-    apply_gradient_background,
-    apply_radial_pattern_background,
-    apply_marble_texture_background,
-    apply_cloud_background
-)
-from rbgen.backgrounds.utils import (
-    find_perspective_coeffs,
-    interpolate_color,
-    compose_images,
-    generate_perlin_noise,
-)
+import importlib
+from rbgen.backgrounds.registry import BUILTIN_MODES, available_modes
 
-from rbgen.backgrounds.waves import (
-    apply_waves_background,
+# Public name: module it is loaded from (on first access)
+_EXPORTS = {
+    apply: f"rbgen.backgrounds.{module}"
+    for module, apply, _, _ in BUILTIN_MODES.values()
+}
+_EXPORTS.update(
+    {
+        "find_perspective_coeffs": "rbgen.backgrounds.utils",
+        "interpolate_color": "rbgen.backgrounds.utils",
+        "compose_images": "rbgen.backgrounds.utils",
+        "generate_perlin_noise": "rbgen.backgrounds.utils",
+        "plan_background": "rbgen.backgrounds.regions",
+        "render_region": "rbgen.backgrounds.regions",
+        "render_background": "rbgen.backgrounds.regions",
+        "render_backgrounds": "rbgen.backgrounds.regions",
+        "apply_background_array": "rbgen.backgrounds.arrays",
+    }
 )
 
 __all__ = [
@@ -66,5 +52,24 @@ __all__ = [
     "generate_perlin_noise",
     # Waves
     "apply_waves_background",
+    # Mode registry and region rendering
+    "available_modes",
+    "plan_background",
+    "render_region",
+    "render_background",
+    "render_backgrounds",
+    # NumPy arrays in and out
+    "apply_background_array",
 ]
 
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
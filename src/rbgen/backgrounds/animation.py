@@ -0,0 +1,333 @@
+# src/rbgen/backgrounds/animation.py
+"""
+Animated backgrounds, rendered frame by frame from a planned spec.
+
+Each animator is a generator that keeps state between frames, so a frame
+costs far less than a fresh render:
+
+- perlin_noise and cloud sample a few keyframe noise lattices once each
+  and cross-fade between them, looping back to the first.
+- waves and wavy_line keep the phase-independent part of every curve and
+  only re-evaluate the sine of the moving phase.
+- mandelbrot renders an oversized keyframe once per zoom step and
+  resamples it for the frames in between.
+- striped and checkered rotate the planned pattern; the pattern itself is
+  reused and each frame renders on the band thread pool.
+
+Frames are RGBA uint8 arrays; ForegroundMask composites a foreground onto
+them without re-deriving its alpha for every frame.
+"""
+import math
+import numpy as np
+from PIL import Image, ImageFilter
+from rbgen.backgrounds.line import LINE_SCALE_FACTOR, render_wavy_line
+from rbgen.backgrounds.regions import render_background
+from rbgen.backgrounds.utils import lerp_colors, numpy_rng, sample_perlin_noise
+from rbgen.backgrounds.waves import render_waves
+from rbgen.profiling import span
+
+# Noise animations cross-fade to a new keyframe lattice this often
+FRAMES_PER_KEYFRAME = 12
+
+# Mandelbrot keyframes are rendered this much wider than a frame, which
+# is also the zoom between consecutive keyframes
+MANDELBROT_KEYFRAME_ZOOM = 1.25
+
+
+def _smoothstep(t):
+    return t * t * (3 - 2 * t)
+
+
+def _noise_fields(spec, frames, rng, frames_per_keyframe):
+    """
+    Yield the noise field of each frame of a looping noise animation.
+
+    The lattice of spec["noise"] is the first keyframe; the others are
+    drawn from rng with the same shapes. Sampling is linear in the lattice
+    values, so blending two sampled keyframe fields equals sampling the
+    blended lattice (value noise with a third, time axis). Only the two
+    keyframes being blended are held at a time.
+    """
+    rng = numpy_rng(rng)
+    noise = spec["noise"]
+    width, height = spec["size"]
+    box = (0, 0, width, height)
+    count = max(2, round(frames / frames_per_keyframe))
+    lattices = [noise] + [
+        {
+            "size": noise["size"],
+            "layers": [
+                (rng.random(grid.shape) * 2 - 1, amplitude)
+                for grid, amplitude in noise["layers"]
+            ],
+        }
+        for _ in range(count - 1)
+    ]
+
+    fields = {}
+
+    def field(index):
+        index %= count
+        if index not in fields:
+            with span("animate.keyframe"):
+                fields[index] = sample_perlin_noise(lattices[index], box)
+        return fields[index]
+
+    for frame in range(frames):
+        position = frame * count / frames
+        index = int(position)
+        weight = _smoothstep(position - index)
+        # Keep the first keyframe for the loop back to it
+        for stale in [k for k in fields if k not in (0, index, (index + 1) % count)]:
+            del fields[stale]
+        blended = field(index) * (1 - weight) + field(index + 1) * weight
+        # Blending independent fields lowers their contrast midway;
+        # rescale about the mid value to keep it constant
+        contrast = math.sqrt((1 - weight) ** 2 + weight**2)
+        yield np.clip((blended - 0.5) / contrast + 0.5, 0, 1)
+
+
+def animate_perlin_noise(spec, frames, rng=None, frames_per_keyframe=None):
+    """Animate a Perlin noise background by morphing between noise lattices."""
+    colors = spec["colors"]
+    for noise in _noise_fields(
+        spec, frames, rng, frames_per_keyframe or FRAMES_PER_KEYFRAME
+    ):
+        yield lerp_colors(colors[0], colors[1], noise)
+
+
+def animate_cloud(spec, frames, rng=None, frames_per_keyframe=None):
+    """Animate a cloud background by drifting between noise lattices."""
+    colors = spec["colors"]
+    blur = ImageFilter.GaussianBlur(radius=spec["blur_radius"])
+    for noise in _noise_fields(
+        spec, frames, rng, frames_per_keyframe or FRAMES_PER_KEYFRAME
+    ):
+        t = np.clip(noise**2.2, 0, 1)
+        background = Image.fromarray(lerp_colors(colors[0], colors[1], t))
+        yield np.asarray(background.filter(blur))
+
+
+def animate_waves(spec, frames, rng=None, cycles=1):
+    """
+    Animate a waves background by shifting the phase of every wave.
+
+    Each wave moves `cycles` whole periods over the animation, so it loops.
+    """
+    width, height = spec["size"]
+    margin_x, margin_y = spec["margin"]
+    horizontal = spec["horizontal"]
+    expanded = (width + 2 * margin_x, height + 2 * margin_y)
+    length, thickness = expanded if horizontal else expanded[::-1]
+
+    # Phase-independent part of every wave
+    positions = np.arange(0, length + 1, 2, dtype=np.float64)
+    envelope = 1 - (np.abs(positions - length / 2) / (length / 2)) ** 2
+    if horizontal:
+        start, end = [(0, thickness)], [(length, thickness)]
+    else:
+        start, end = [(0, 0)], [(thickness, length), (thickness, 0)]
+    layers = []
+    for wave_type, wave_height, frequency, phase, position, color in spec["layers"]:
+        cycles_along = frequency * positions
+        layers.append((wave_type, wave_height, cycles_along, phase, position, color))
+
+    for frame in range(frames):
+        shift = 2 * math.pi * cycles * frame / frames
+        polygons = []
+        for wave_type, wave_height, cycles_along, phase, position, color in layers:
+            angle = 2 * math.pi * cycles_along + (phase + shift)
+            if wave_type == "triangle":
+                x = (cycles_along + (phase + shift) / (2 * math.pi)) % 1
+                offset = wave_height * (4 * np.abs(x - 0.5) - 1)
+            elif wave_type == "ripple":
+                offset = wave_height * envelope * np.sin(angle)
+            else:
+                offset = wave_height * np.sin(angle)
+            across = position + offset
+            curve = np.column_stack(
+                (positions, across) if horizontal else (across, positions)
+            )
+            polygons.append((start + curve.tolist() + end, color))
+        yield render_waves({**spec, "polygons": polygons}, (0, 0, width, height))
+
+
+def animate_wavy_line(spec, frames, rng=None, cycles=1):
+    """
+    Animate a wavy line background by moving the waves along their paths.
+
+    All waves share one shape, so each frame evaluates a single sine over
+    the path positions and offsets every (precomputed) path by it.
+    """
+    width, height = spec["size"]
+    amplitude, frequency, phase_shift, angle = spec["wave_shape"]
+    high_res_width = width * LINE_SCALE_FACTOR
+    positions = np.arange(
+        -high_res_width, high_res_width, 2 * LINE_SCALE_FACTOR, dtype=np.float64
+    )
+    cos_a, sin_a = math.cos(angle), math.sin(angle)
+    bases = [
+        (start_x + positions * cos_a, start_y + positions * sin_a)
+        for start_x, start_y in spec["starts"]
+    ]
+    widths = [line_width for _, line_width in spec["waves"]]
+
+    for frame in range(frames):
+        shift = 2 * math.pi * cycles * frame / frames
+        offset = amplitude * np.sin(frequency * positions + (phase_shift + shift))
+        dx, dy = offset * sin_a, -offset * cos_a
+        waves = [
+            (np.column_stack((xs + dx, ys + dy)).tolist(), line_width)
+            for (xs, ys), line_width in zip(bases, widths)
+        ]
+        yield render_wavy_line({**spec, "waves": waves}, (0, 0, width, height))
+
+
+def animate_mandelbrot(spec, frames, rng=None, zoom_factor=2.0, threads=1):
+    """
+    Animate a Mandelbrot background zooming in on its center.
+
+    The zoom multiplies by `zoom_factor` over the animation. Escape times
+    are computed for keyframes MANDELBROT_KEYFRAME_ZOOM times wider than a
+    frame (in each direction) and that much more zoomed out than the next
+    keyframe, so every frame in between is a crop of one keyframe, resampled
+    down from at least the frame's own resolution.
+    """
+    width, height = spec["size"]
+    step = MANDELBROT_KEYFRAME_ZOOM
+    key_size = (math.ceil(width * step), math.ceil(height * step))
+    keyframe = None
+    key_index = None
+
+    for frame in range(frames):
+        # Zoom steps since the start, and the keyframe whose range covers it
+        steps = math.log(zoom_factor) / math.log(step) * frame / max(frames - 1, 1)
+        index = int(steps)
+        if index != key_index:
+            key_spec = {**spec, "size": key_size, "zoom": spec["zoom"] * step**index}
+            with span("animate.keyframe"):
+                keyframe = Image.fromarray(render_background(key_spec, threads))
+            key_index = index
+
+        # Part of the keyframe in view: 1/step**(steps - index) of its width
+        scale = step ** (steps - index)
+        crop_width, crop_height = key_size[0] / scale, key_size[1] / scale
+        left = (key_size[0] - crop_width) / 2
+        top = (key_size[1] - crop_height) / 2
+        box = (left, top, left + crop_width, top + crop_height)
+        yield np.asarray(keyframe.resize((width, height), Image.BILINEAR, box=box))
+
+
+def _animate_rotation(spec, frames, degrees, threads):
+    """Rotate a rotated-pattern background by `degrees` over the animation."""
+    for frame in range(frames):
+        angle = spec["angle"] + degrees * frame / frames
+        yield render_background({**spec, "angle": angle % 360}, threads)
+
+
+def animate_striped(spec, frames, rng=None, degrees=180.0, threads=1):
+    """Animate a striped background by rotating its stripes."""
+    return _animate_rotation(spec, frames, degrees, threads)
+
+
+def animate_checkered(spec, frames, rng=None, degrees=90.0, threads=1):
+    """
+    Animate a checkered background by rotating it.
+
+    A quarter turn maps the checkerboard onto itself, so the default loops.
+    """
+    return _animate_rotation(spec, frames, degrees, threads)
+
+
+# Animators of each mode, with the extra options they accept
+ANIMATORS = {
+    "perlin_noise": animate_perlin_noise,
+    "cloud": animate_cloud,
+    "waves": animate_waves,
+    "wavy_line": animate_wavy_line,
+    "mandelbrot": animate_mandelbrot,
+    "striped": animate_striped,
+    "checkered": animate_checkered,
+}
+
+# Animators that can render their frames on the band thread pool
+_THREADED_ANIMATORS = {"mandelbrot", "striped", "checkered"}
+
+
+def animated_modes():
+    """Return the background modes that can be animated."""
+    return list(ANIMATORS)
+
+
+def animate_background(spec, frames, rng=None, threads=1, **options):
+    """
+    Render the frames of an animated background.
+
+    Args:
+        spec (dict): Background spec from plan_background
+        frames (int): Number of frames
+        rng (optional): Random source for anything the animation adds to
+            the spec, such as further noise keyframes (None for the
+            global random states)
+        threads (int): Threads to render frames with, for modes that
+            render in bands
+        **options: Mode-specific options (e.g. zoom_factor, degrees,
+            cycles, frames_per_keyframe)
+
+    Yields:
+        np.array: RGBA uint8 array of shape (height, width, 4) per frame
+    """
+    mode = spec["mode"]
+    if mode not in ANIMATORS:
+        raise ValueError(f"Background mode '{mode}' cannot be animated")
+    if frames < 1:
+        raise ValueError("An animation needs at least one frame")
+    if mode in _THREADED_ANIMATORS:
+        options["threads"] = threads
+    yield from ANIMATORS[mode](spec, frames, rng, **options)
+
+
+class ForegroundMask:
+    """
+    A foreground prepared for compositing onto many background frames.
+
+    Its alpha, premultiplied color and inverse alpha are computed once, so
+    each frame costs one multiply-add per channel.
+    """
+
+    def __init__(self, image):
+        """
+        Args:
+            image (PIL.Image): Foreground with transparency
+        """
+        pixels = np.asarray(image.convert("RGBA"), dtype=np.float32) / 255
+        self.size = image.size
+        self.alpha = pixels[..., 3:]
+        self.inverse = 1 - self.alpha
+        self.premultiplied = pixels[..., :3] * self.alpha
+
+    def composite(self, background, opaque=True):
+        """
+        Composite the foreground over a background frame.
+
+        Args:
+            background (np.array): RGBA uint8 frame of the foreground's size
+            opaque (bool): Whether the frame is known to be fully opaque,
+                which skips the general alpha arithmetic
+
+        Returns:
+            np.array: RGBA uint8 result (RGB when opaque)
+        """
+        colors = background[..., :3].astype(np.float32) * (1 / 255)
+        if opaque:
+            result = self.premultiplied + colors * self.inverse
+            return np.rint(result * 255).astype(np.uint8)
+
+        back_alpha = background[..., 3:].astype(np.float32) * (1 / 255)
+        back_alpha = back_alpha * self.inverse
+        alpha = self.alpha + back_alpha
+        result = self.premultiplied + colors * back_alpha
+        np.divide(result, alpha, out=result, where=alpha > 0)
+        return np.rint(np.concatenate((result, alpha), axis=-1) * 255).astype(
+            np.uint8
+        )
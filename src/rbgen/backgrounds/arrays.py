@@ -0,0 +1,178 @@
+# src/rbgen/backgrounds/arrays.py
+"""
+NumPy entry points for array-based pipelines (e.g. training data loaders).
+
+Foregrounds come in as uint8 arrays and results are written straight into
+a caller-provided buffer in the layout it asks for, so no PIL images are
+created and nothing but the background itself is allocated per call.
+Compositing uses the same integer arithmetic as Pillow's alpha_composite,
+so results are identical to those of the apply_* functions.
+"""
+import numpy as np
+from PIL import Image
+from rbgen.backgrounds.registry import MODES
+from rbgen.backgrounds.regions import band_executor, plan_background, render_background
+
+# Output layouts: HWC (height, width, channels) or CHW (channels first)
+LAYOUTS = ("HWC", "CHW")
+
+# Output channels
+CHANNELS = ("RGB", "RGBA")
+
+# Pixels composited at a time, so intermediates stay small
+COMPOSITE_CHUNK_PIXELS = 2**16
+
+# Fixed-point precision of Pillow's alpha compositing
+_PRECISION_BITS = 7
+
+
+def _div255(values):
+    """Divide uint32 values by 255 with Pillow's shift-based rounding."""
+    return ((values >> 8) + values) >> 8
+
+
+def output_shape(size, layout="HWC", channels="RGB"):
+    """
+    Return the shape of an output buffer.
+
+    Args:
+        size (tuple): (width, height) of the image
+        layout (str): "HWC" or "CHW"
+        channels (str): "RGB" or "RGBA"
+
+    Returns:
+        tuple: Array shape
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown layout: {layout}")
+    if channels not in CHANNELS:
+        raise ValueError(f"Unknown channels: {channels}")
+    width, height = size
+    if layout == "CHW":
+        return (len(channels), height, width)
+    return (height, width, len(channels))
+
+
+def _split_foreground(foreground, alpha):
+    """Return the (color, alpha) arrays of a foreground, without copying."""
+    foreground = np.asarray(foreground)
+    if foreground.dtype != np.uint8 or foreground.ndim != 3:
+        raise ValueError("The foreground must be an HxWx3 or HxWx4 uint8 array")
+    if foreground.shape[2] == 4:
+        if alpha is not None:
+            raise ValueError("Pass alpha only with an RGB foreground")
+        return foreground[..., :3], foreground[..., 3]
+    if foreground.shape[2] != 3:
+        raise ValueError("The foreground must be an HxWx3 or HxWx4 uint8 array")
+    if alpha is None:
+        raise ValueError("An RGB foreground needs a separate alpha array")
+    alpha = np.asarray(alpha)
+    if alpha.dtype != np.uint8 or alpha.shape != foreground.shape[:2]:
+        raise ValueError("alpha must be an HxW uint8 array matching the foreground")
+    return foreground, alpha
+
+
+def composite_into(target, color, alpha, background, rows):
+    """
+    Composite rows of a foreground over a background into an HWC view.
+
+    Args:
+        target (np.array): HxWxC uint8 view of the output (C is 3 or 4)
+        color (np.array): HxWx3 uint8 foreground color
+        alpha (np.array): HxW uint8 foreground alpha
+        background (np.array): HxWx4 uint8 background
+        rows (tuple): (top, bottom) rows to composite
+    """
+    top, bottom = rows
+    src_a = alpha[top:bottom].astype(np.uint32)[..., None]
+    src = color[top:bottom].astype(np.uint32)
+    dst = background[top:bottom].astype(np.uint32)
+    dst_a = dst[..., 3:]
+
+    # As Pillow's ImagingAlphaComposite: blend in 8.7 fixed point
+    out_a255 = src_a * 255 + dst_a * (255 - src_a)
+    coef1 = (src_a * (255 * 255 << _PRECISION_BITS)) // np.maximum(out_a255, 1)
+    coef2 = (255 << _PRECISION_BITS) - coef1
+    blended = src * coef1 + dst[..., :3] * coef2 + (0x80 << _PRECISION_BITS)
+    blended = _div255(blended) >> _PRECISION_BITS
+
+    # A fully transparent foreground pixel leaves the background as is
+    visible = src_a > 0
+    target[top:bottom, :, :3] = np.where(visible, blended, dst[..., :3])
+    if target.shape[2] == 4:
+        out_alpha = np.where(visible, _div255(out_a255 + 0x80), dst_a)
+        target[top:bottom, :, 3:] = out_alpha
+
+
+def apply_background_array(
+    foreground,
+    mode,
+    colors,
+    alpha=None,
+    out=None,
+    layout="HWC",
+    channels="RGBA",
+    rng=None,
+    threads=1,
+    **params,
+):
+    """
+    Give a foreground array a background, writing the result into `out`.
+
+    Args:
+        foreground (np.array): HxWx4 uint8 RGBA image, or HxWx3 RGB with a
+            separate alpha
+        mode (str): Background mode
+        colors (list): Colors to use, as for the apply_* functions
+        alpha (np.array, optional): HxW uint8 alpha of an RGB foreground
+        out (np.array, optional): uint8 buffer of output_shape(...) to
+            write into (any strides, e.g. a slice of a batch array).
+            Allocated when None.
+        layout (str): "HWC" or "CHW"
+        channels (str): "RGB" or "RGBA"
+        rng (optional): Random source (None for the global random states)
+        threads (int): Threads to render and composite with
+        **params: Mode-specific parameters, as for the apply_* functions
+
+    Returns:
+        np.array: `out`, holding the result
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown background mode: {mode}")
+    color, alpha = _split_foreground(foreground, alpha)
+    height, width = alpha.shape
+    shape = output_shape((width, height), layout, channels)
+    if out is None:
+        out = np.empty(shape, dtype=np.uint8)
+    elif out.dtype != np.uint8 or out.shape != shape:
+        raise ValueError(f"out must be a uint8 array of shape {shape}")
+    # Channels-first buffers are written through a channels-last view
+    target = out.transpose(1, 2, 0) if layout == "CHW" else out
+    if rng is not None and not MODES.accepts_rng(mode):
+        rng = None
+
+    if not MODES.supports_regions(mode):
+        # Modes from other packages without a region renderer go through PIL
+        rgba = np.concatenate((color, alpha[..., None]), axis=-1)
+        extra = {"rng": rng} if rng is not None else {}
+        result = MODES[mode](Image.fromarray(rgba), colors, **params, **extra)
+        target[...] = np.asarray(result.convert("RGBA"))[..., : target.shape[2]]
+        return out
+
+    spec = plan_background(mode, (width, height), colors, rng=rng, **params)
+    background = render_background(spec, threads)
+
+    step = max(1, COMPOSITE_CHUNK_PIXELS // max(width, 1))
+    chunks = [(top, min(top + step, height)) for top in range(0, height, step)]
+    if threads <= 1 or len(chunks) == 1:
+        for rows in chunks:
+            composite_into(target, color, alpha, background, rows)
+        return out
+    executor = band_executor(threads)
+    futures = [
+        executor.submit(composite_into, target, color, alpha, background, rows)
+        for rows in chunks
+    ]
+    for future in futures:
+        future.result()
+    return out
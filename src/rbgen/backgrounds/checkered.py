@@ -1,11 +1,63 @@
 # src/rbgen/backgrounds/checkered.py
-import random
 import math
-from PIL import Image, ImageDraw
-from rbgen.backgrounds.utils import find_perspective_coeffs, compose_images
+import numpy as np
+from PIL import Image
+from rbgen.backgrounds.utils import (
+    find_perspective_coeffs,
+    compose_images,
+    lerp_colors,
+    python_rng,
+    rotated_pattern_coverage,
+    subpixel_offsets,
+)
+
+
+def plan_checkered(size, colors, square_size=20, rng=None):
+    """
+    Plan a randomly rotated checkered background.
+
+    Args:
+        size (tuple): (width, height) of the background
+        colors (tuple): A tuple of two RGB color tuples defining the
+            colors in the checkered pattern.
+        square_size (int, optional): The size of each checkered square.
+            Defaults to 20.
+        rng (optional): Random source (None for the global random state)
+
+    Returns:
+        dict: Background spec for render_checkered
+    """
+    rng = python_rng(rng)
+    width, height = size
+
+    # Pattern canvas large enough to avoid cutoff during rotation
+    diag = int(math.sqrt(width**2 + height**2))
+
+    return {
+        "mode": "checkered",
+        "size": size,
+        "opaque": True,
+        "colors": [tuple(c) for c in colors[:2]],
+        "square_size": square_size,
+        "canvas_size": diag * 2,
+        "angle": rng.uniform(0, 360),
+    }
+
 
+def render_checkered(spec, box):
+    """Render a (left, top, right, bottom) region of a checkered background."""
+    square_size = spec["square_size"]
 
-def apply_checkered_background(image, colors, square_size=20):
+    def inside(u, v):
+        return (np.floor(u / square_size) + np.floor(v / square_size)) % 2 == 0
+
+    coverage = rotated_pattern_coverage(
+        box, spec["size"], spec["angle"], spec["canvas_size"], inside
+    )
+    return lerp_colors(spec["colors"][0], spec["colors"][1], coverage)
+
+
+def apply_checkered_background(image, colors, square_size=20, rng=None):
     """
     Applies a randomly rotated checkered background to an image while keeping
     the foreground intact.
@@ -16,92 +68,47 @@ def apply_checkered_background(image, colors, square_size=20):
             colors in the checkered pattern.
         square_size (int, optional): The size of each checkered square.
             Defaults to 20.
+        rng (optional): Random source (None for the global random state)
 
     Returns:
         PIL.Image: The image with the applied checkered background.
     """
     width, height = image.size
-
-    # Expand canvas to avoid cutoff during rotation
-    diag = int(math.sqrt(width**2 + height**2))
-    expanded_size = diag * 2  # Ensure coverage after rotation
-    checkered = Image.new("RGBA", (expanded_size, expanded_size), colors[0] + (255,))
-    draw = ImageDraw.Draw(checkered)
-
-    # Draw checkered pattern on expanded canvas
-    for x in range(0, expanded_size, square_size):
-        for y in range(0, expanded_size, square_size):
-            if (x // square_size + y // square_size) % 2 == 0:
-                draw.rectangle(
-                    [x, y, x + square_size, y + square_size], fill=colors[1] + (255,)
-                )
-
-    # Apply random rotation
-    angle = random.uniform(0, 360)
-    rotated = checkered.rotate(angle, resample=Image.BICUBIC, expand=True)
-
-    # Crop center to match original size
-    left = (rotated.width - width) // 2
-    top = (rotated.height - height) // 2
-    cropped = rotated.crop((left, top, left + width, top + height))
-
-    return compose_images(cropped, image)
+    spec = plan_checkered(image.size, colors, square_size, rng=rng)
+    background = Image.fromarray(render_checkered(spec, (0, 0, width, height)))
+    return compose_images(background, image)
 
 
-def apply_perspective_checkered_background(image, colors, square_size=40):
+def plan_perspective_checkered(size, colors, square_size=40, rng=None):
     """
-    Applies a checkered background with shear, rotation, and perspective
+    Plan a checkered background with shear, rotation, and perspective
     transformation to create a depth effect.
 
     Args:
-        image (PIL.Image): The image with transparency.
+        size (tuple): (width, height) of the background
         colors (tuple): A tuple of two RGB color tuples defining the
             checkered pattern.
         square_size (int, optional): The size of each checkered square.
             Defaults to 40.
+        rng (optional): Random source (None for the global random state)
 
     Returns:
-        PIL.Image: The image with the transformed checkered background.
+        dict: Background spec for render_perspective_checkered
     """
-    width, height = image.size
+    rng = python_rng(rng)
+    width, height = size
 
     # Expand canvas to ensure full coverage after transformations
     expand_factor = 2
     expanded_width = int(width * expand_factor)
     expanded_height = int(height * expand_factor)
 
-    # Generate a checkered pattern
-    background = Image.new(
-        "RGBA", (expanded_width, expanded_height), colors[0] + (255,)
-    )
-    draw = ImageDraw.Draw(background)
-
-    for x in range(0, expanded_width, square_size):
-        for y in range(0, expanded_height, square_size):
-            if (x // square_size + y // square_size) % 2 == 0:
-                draw.rectangle(
-                    [x, y, x + square_size, y + square_size], fill=colors[1] + (255,)
-                )
-
-    # Apply shear transformation manually
-    # (since Image.transform doesn't support affine matrices directly)
-    shear_x = random.uniform(-0.3, 0.3)
-    shear_y = random.uniform(-0.1, 0.1)
-
-    affine_matrix = (1, shear_x, 0, shear_y, 1, 0)  # (a, b, c, d, e, f)
-
-    background = background.transform(
-        (expanded_width, expanded_height),
-        Image.AFFINE,
-        affine_matrix,
-        resample=Image.BILINEAR,
-    )
-
-    # Apply slight random rotation
-    angle = random.uniform(-10, 10)
-    background = background.rotate(angle, resample=Image.BILINEAR, expand=False)
+    # Shear, then a slight random rotation
+    shear_x = rng.uniform(-0.3, 0.3)
+    shear_y = rng.uniform(-0.1, 0.1)
+    angle = rng.uniform(-10, 10)
 
-    # Apply perspective transformation for depth effect
+    # Perspective transformation for depth effect
     vanish_x = expanded_width // 2  # Vanishing point in the center
 
     shrink_factor = 0.8  # Controls how much the tiles shrink into the distance
@@ -120,19 +127,103 @@ def apply_perspective_checkered_background(image, colors, square_size=40):
         (0, expanded_height),
     ]
 
-    coeffs = find_perspective_coeffs(src_quad, dst_quad)
+    return {
+        "mode": "perspective_checkered",
+        "size": size,
+        # Corners can fall outside the transformed pattern
+        "opaque": False,
+        "colors": [tuple(c) for c in colors[:2]],
+        "square_size": square_size,
+        "expanded_size": (expanded_width, expanded_height),
+        "shear": (shear_x, shear_y),
+        "angle": angle,
+        "coeffs": find_perspective_coeffs(src_quad, dst_quad),
+    }
+
+
+def render_perspective_checkered(spec, box, samples=3):
+    """
+    Render a (left, top, right, bottom) region of a perspective checkered
+    background.
 
-    background = background.transform(
-        (expanded_width, expanded_height),
-        Image.PERSPECTIVE,
-        coeffs,
-        resample=Image.BILINEAR,
-    )
+    Each output pixel is mapped back through the perspective, rotation and
+    shear transforms (in the same way as Image.transform and Image.rotate)
+    to the flat pattern, so no expanded canvas is allocated. Points that
+    fall outside the canvas at any step are transparent.
+    """
+    width, height = spec["size"]
+    expanded_width, expanded_height = spec["expanded_size"]
+    square_size = spec["square_size"]
+    shear_x, shear_y = spec["shear"]
+    a, b, c, d, e, f, g, h = spec["coeffs"]
+    left, top, right, bottom = box
+
+    # Inverse rotation matrix about the canvas center, as used by Image.rotate
+    theta = -math.radians(spec["angle"])
+    cos_a, sin_a = math.cos(theta), math.sin(theta)
+    center_x, center_y = expanded_width / 2.0, expanded_height / 2.0
+    rot_c = center_x - cos_a * center_x - sin_a * center_y
+    rot_f = center_y + sin_a * center_x - cos_a * center_y
+
+    def on_canvas(x, y):
+        return (x >= 0) & (x < expanded_width) & (y >= 0) & (y < expanded_height)
+
+    # Crop offset of the output inside the expanded canvas
+    offset_x = (expanded_width - width) // 2
+    offset_y = (expanded_height - height) // 2
+
+    color_0 = np.array(spec["colors"][0], dtype=np.float32)
+    color_1 = np.array(spec["colors"][1], dtype=np.float32)
+    total = np.zeros((bottom - top, right - left, 4), dtype=np.float32)
+    for oy in subpixel_offsets(samples):
+        y = np.arange(top, bottom, dtype=np.float64)[:, None] + (offset_y + oy)
+        for ox in subpixel_offsets(samples):
+            x = np.arange(left, right, dtype=np.float64)[None, :] + (offset_x + ox)
+
+            # Perspective
+            denominator = g * x + h * y + 1
+            px = (a * x + b * y + c) / denominator
+            py = (d * x + e * y + f) / denominator
+            valid = on_canvas(px, py)
+
+            # Rotation
+            rx = cos_a * px + sin_a * py + rot_c
+            ry = -sin_a * px + cos_a * py + rot_f
+            valid &= on_canvas(rx, ry)
+
+            # Shear
+            sx = rx + shear_x * ry
+            sy = shear_y * rx + ry
+            valid &= on_canvas(sx, sy)
+
+            parity = (np.floor(sx / square_size) + np.floor(sy / square_size)) % 2 == 0
+            total[..., :3] += np.where(parity[..., None], color_1, color_0) * valid[..., None]
+            total[..., 3] += 255 * valid
+
+    return (total / (samples * samples)).astype(np.uint8)
+
+
+def apply_perspective_checkered_background(image, colors, square_size=40, rng=None):
+    """
+    Applies a checkered background with shear, rotation, and perspective
+    transformation to create a depth effect.
+
+    Args:
+        image (PIL.Image): The image with transparency.
+        colors (tuple): A tuple of two RGB color tuples defining the
+            checkered pattern.
+        square_size (int, optional): The size of each checkered square.
+            Defaults to 40.
+        rng (optional): Random source (None for the global random state)
 
-    # Crop the final image to original dimensions
-    left = (background.width - width) // 2
-    top = (background.height - height) // 2
-    background = background.crop((left, top, left + width, top + height))
+    Returns:
+        PIL.Image: The image with the transformed checkered background.
+    """
+    width, height = image.size
+    spec = plan_perspective_checkered(image.size, colors, square_size, rng=rng)
+    background = Image.fromarray(
+        render_perspective_checkered(spec, (0, 0, width, height))
+    )
 
     # Preserve the original image (foreground) with transparency
     return compose_images(background, image)
@@ -1,16 +1,28 @@
 # src/rbgen/backgrounds/fractal.py
-import random
 import numpy as np
-from PIL import Image, ImageDraw, ImageFilter
-from rbgen.backgrounds.utils import interpolate_color, compose_images
+from PIL import Image, ImageFilter
+from rbgen.backgrounds.utils import (
+    interpolate_color,
+    compose_images,
+    blur_margin,
+    crop_padded,
+    draw_region,
+    full_width,
+    lerp_colors,
+    lerp_colors_batch,
+    pad_box,
+    python_rng,
+    shift_points,
+)
+from rbgen.profiling import span
 
 
-def apply_mandelbrot_background(image, colors, max_iter=100, zoom=None, center=None):
+def plan_mandelbrot(size, colors, max_iter=100, zoom=None, center=None, rng=None):
     """
-    Applies a Mandelbrot fractal background to an image with transparency.
+    Plan a Mandelbrot fractal background.
 
     Args:
-    image (PIL.Image): The image with transparency.
+    size (tuple): (width, height) of the background
     colors (tuple): Tuple of two RGB color tuples for gradient mapping.
     max_iter (int, optional): Maximum iterations for the fractal calculation.
         Default is 100.
@@ -18,71 +30,166 @@ def apply_mandelbrot_background(image, colors, max_iter=100, zoom=None, center=N
         value is used.
     center (tuple, optional): Center coordinates (x, y) for the fractal.
         If None, random values are used.
+    rng (optional): Random source (None for the global random state)
 
     Returns:
-        PIL.Image: Image with fractal background
+        dict: Background spec for render_mandelbrot
     """
-    width, height = image.size
-    background = Image.new("RGBA", (width, height))
-    pixels = background.load()
-
+    rng = python_rng(rng)
     # Use provided parameters or randomize if not specified
-    zoom = zoom if zoom is not None else random.uniform(0.8, 3.5)
+    zoom = zoom if zoom is not None else rng.uniform(0.8, 3.5)
+
+    if center is None:
+        center = (rng.uniform(-1.0, 0.5), rng.uniform(-0.5, 0.5))
+
+    return {
+        "mode": "mandelbrot",
+        "size": size,
+        "opaque": True,
+        "colors": [tuple(c) for c in colors[:2]],
+        "max_iter": max_iter,
+        "zoom": zoom,
+        "center": tuple(center),
+    }
+
+
+def render_mandelbrot(spec, box):
+    """Render a (left, top, right, bottom) region of a Mandelbrot background."""
+    width, height = spec["size"]
+    left, top, right, bottom = box
+    zoom = spec["zoom"]
+    center_x, center_y = spec["center"]
+    max_iter = spec["max_iter"]
 
-    if center is not None:
-        center_x, center_y = center
-    else:
-        center_x = random.uniform(-1.0, 0.5)
-        center_y = random.uniform(-0.5, 0.5)
+    # Map pixel coordinates to complex plane
+    xs = np.arange(left, right, dtype=np.float64)
+    ys = np.arange(top, bottom, dtype=np.float64)
+    cx = (xs / width - 0.5) * (3.5 / zoom) + center_x
+    cy = (ys / height - 0.5) * (2.0 / zoom) + center_y
+    cx, cy = [grid.ravel() for grid in np.meshgrid(cx, cy)]
 
-    for y in range(height):
-        for x in range(width):
-            # Map pixel coordinates to complex plane
-            zx = (x / width - 0.5) * (3.5 / zoom) + center_x
-            zy = (y / height - 0.5) * (2.0 / zoom) + center_y
+    # Mandelbrot iteration, only on the points that have not escaped yet
+    counts = np.zeros(cx.size, dtype=np.int32)
+    active = np.arange(cx.size)
+    zx, zy = cx.copy(), cy.copy()
+    with span("mandelbrot.iterate"):
+        for _ in range(max_iter):
+            inside = zx * zx + zy * zy < 4
+            if not inside.all():
+                active, zx, zy = active[inside], zx[inside], zy[inside]
+                cx, cy = cx[inside], cy[inside]
+                if active.size == 0:
+                    break
+            zx, zy = zx * zx - zy * zy + cx, 2.0 * zx * zy + cy
+            counts[active] += 1
 
-            # Initial values for iteration
-            cx, cy = zx, zy
+    # Color mapping based on iteration count
+    t = counts.reshape(bottom - top, right - left) / max_iter
+    return lerp_colors(spec["colors"][0], spec["colors"][1], t)
 
-            # Mandelbrot iteration
-            i = 0
-            while zx * zx + zy * zy < 4 and i < max_iter:
-                zx, zy = zx * zx - zy * zy + cx, 2.0 * zx * zy + cy
-                i += 1
 
-            # Color mapping based on iteration count
-            t = i / max_iter
-            pixels[x, y] = interpolate_color(colors[0], colors[1], t)
+def render_mandelbrot_batch(specs):
+    """
+    Render same-size Mandelbrot backgrounds as one (B, H, W, 4) array.
+
+    The points of every item are iterated together, each up to its own
+    max_iter, so the per-step overhead is paid once for the batch; each
+    item equals render_mandelbrot.
+    """
+    width, height = specs[0]["size"]
+    xs = np.arange(width, dtype=np.float64)
+    ys = np.arange(height, dtype=np.float64)
+    grids = []
+    for spec in specs:
+        zoom = spec["zoom"]
+        center_x, center_y = spec["center"]
+        cx = (xs / width - 0.5) * (3.5 / zoom) + center_x
+        cy = (ys / height - 0.5) * (2.0 / zoom) + center_y
+        grids.append(np.meshgrid(cx, cy))
+    cx = np.concatenate([cx.ravel() for cx, _ in grids])
+    cy = np.concatenate([cy.ravel() for _, cy in grids])
+    max_iters = np.array([spec["max_iter"] for spec in specs])
+    limits = np.repeat(max_iters, width * height)
+
+    counts = np.zeros(cx.size, dtype=np.int32)
+    active = np.arange(cx.size)
+    zx, zy = cx.copy(), cy.copy()
+    with span("mandelbrot.iterate"):
+        for step in range(max_iters.max()):
+            # Points also stop once they reach their own item's max_iter
+            inside = (zx * zx + zy * zy < 4) & (limits > step)
+            if not inside.all():
+                active, zx, zy = active[inside], zx[inside], zy[inside]
+                cx, cy, limits = cx[inside], cy[inside], limits[inside]
+                if active.size == 0:
+                    break
+            zx, zy = zx * zx - zy * zy + cx, 2.0 * zx * zy + cy
+            counts[active] += 1
+
+    t = counts.reshape(len(specs), height, width) / max_iters[:, None, None]
+    return lerp_colors_batch(
+        [spec["colors"][0] for spec in specs],
+        [spec["colors"][1] for spec in specs],
+        t,
+    )
+
+
+def apply_mandelbrot_background(
+    image, colors, max_iter=100, zoom=None, center=None, rng=None
+):
+    """
+    Applies a Mandelbrot fractal background to an image with transparency.
+
+    Args:
+    image (PIL.Image): The image with transparency.
+    colors (tuple): Tuple of two RGB color tuples for gradient mapping.
+    max_iter (int, optional): Maximum iterations for the fractal calculation.
+        Default is 100.
+    zoom (float, optional): Zoom level for the fractal. If None, a random
+        value is used.
+    center (tuple, optional): Center coordinates (x, y) for the fractal.
+        If None, random values are used.
+    rng (optional): Random source (None for the global random state)
+
+    Returns:
+        PIL.Image: Image with fractal background
+    """
+    width, height = image.size
+    spec = plan_mandelbrot(image.size, colors, max_iter, zoom, center, rng=rng)
+    background = Image.fromarray(render_mandelbrot(spec, (0, 0, width, height)))
 
     # Composite the original image on top of the fractal background
     return compose_images(background, image)
 
 
-def apply_nested_polygons_background(image, colors, line_width=3, depth=4):
+# Blur applied to the polygon outlines
+NESTED_POLYGONS_BLUR_RADIUS = 0.5
+
+
+def plan_nested_polygons(size, colors, line_width=3, depth=4, rng=None):
     """
-    Applies a fractal of recursive nested polygons using barycentric subdivision,
+    Plan a fractal of recursive nested polygons using barycentric subdivision,
     with a random choice of gradient mapping techniques.
 
     Args:
-        image (PIL.Image): The image with transparency.
+        size (tuple): (width, height) of the background
         colors (tuple): A tuple of RGB color tuples used for gradient mapping.
         line_width (int, optional): Line width for polygon outlines.
             Default is 3
         depth (int, optional): Recursion depth for the fractal subdivision.
             Default is 4.
+        rng (optional): Random source (None for the global random state)
 
     Returns:
-        PIL.Image: Image with fractal background.
+        dict: Background spec for render_nested_polygons
     """
-    width, height = image.size
-    # Initialize as transparent background
-    background = Image.new("RGBA", (width, height))
-    # For black background use:
-    # background = Image.new("RGBA", (width, height), (0, 0, 0, 255))
-    draw = ImageDraw.Draw(background)
+    rng = python_rng(rng)
+    width, height = size
+    colors = [tuple(c) for c in colors]
 
-    gradient_type = random.choice(["linear", "radial", "vertex"])
+    gradient_type = rng.choice(["linear", "radial", "vertex"])
     stack = [(width // 2, height // 2, min(width, height) / 2, depth, None)]
+    polygons = []
 
     while stack:
         x, y, size, depth, sides = stack.pop()
@@ -90,43 +197,94 @@ def apply_nested_polygons_background(image, colors, line_width=3, depth=4):
         if depth == 0 or size < 1:
             continue
 
-        sides = sides or random.randint(3, 8)
+        sides = sides or rng.randint(3, 8)
         angle = 2 * np.pi / sides
         vertices = [
             (
-                x + size * np.cos(i * angle + random.uniform(-0.05, 0.05)),
-                y + size * np.sin(i * angle + random.uniform(-0.05, 0.05)),
+                x + size * np.cos(i * angle + rng.uniform(-0.05, 0.05)),
+                y + size * np.sin(i * angle + rng.uniform(-0.05, 0.05)),
             )
             for i in range(sides)
         ]
 
         if gradient_type == "linear":
-            color1, color2 = random.sample(colors, 2)
-            poly_color = interpolate_color(color1, color2, random.uniform(0, 1))
+            color1, color2 = rng.sample(colors, 2)
+            poly_color = interpolate_color(color1, color2, rng.uniform(0, 1))
         elif gradient_type == "radial":
-            center_color = random.choice(colors)
-            edge_color = random.choice(colors)
+            center_color = rng.choice(colors)
+            edge_color = rng.choice(colors)
             distance_factor = min(size / width, size / height)
             poly_color = interpolate_color(center_color, edge_color, distance_factor)
         else:  # "vertex"
-            poly_color = random.choice(colors)
+            poly_color = rng.choice(colors)
 
-        # Adjust line width as needed
-        draw.polygon(vertices, outline=poly_color, width=line_width)
+        polygons.append((vertices, poly_color))
 
         # Subdivide
-        new_size = size * random.uniform(0.45, 0.55)
+        new_size = size * rng.uniform(0.45, 0.55)
         for vx, vy in vertices:
             stack.append(
                 (
-                    vx + random.uniform(-3, 3),
-                    vy + random.uniform(-3, 3),
+                    vx + rng.uniform(-3, 3),
+                    vy + rng.uniform(-3, 3),
                     new_size,
                     depth - 1,
                     sides,
                 )
             )
 
-    background = background.filter(ImageFilter.GaussianBlur(0.5))
+    return {
+        "mode": "nested_polygons",
+        "size": (width, height),
+        # Only the outlines are drawn
+        "opaque": False,
+        "line_width": line_width,
+        "polygons": polygons,
+    }
+
+
+def render_nested_polygons(spec, box):
+    """Render a (left, top, right, bottom) region of a nested polygons background."""
+    # Whole rows (see full_width), padded above and below for the blur
+    padded = pad_box(
+        full_width(box, spec["size"]),
+        blur_margin(NESTED_POLYGONS_BLUR_RADIUS),
+        spec["size"],
+    )
+
+    # Initialize as transparent background
+    # For black background use (0, 0, 0, 255)
+    background, draw, offset = draw_region(padded, (0, 0, 0, 0))
+    for vertices, poly_color in spec["polygons"]:
+        # Adjust line width as needed
+        draw.polygon(
+            shift_points(vertices, offset), outline=poly_color, width=spec["line_width"]
+        )
+
+    blur = ImageFilter.GaussianBlur(NESTED_POLYGONS_BLUR_RADIUS)
+    background = background.filter(blur)
+    return crop_padded(np.asarray(background), padded, box)
+
+
+def apply_nested_polygons_background(image, colors, line_width=3, depth=4, rng=None):
+    """
+    Applies a fractal of recursive nested polygons using barycentric subdivision,
+    with a random choice of gradient mapping techniques.
+
+    Args:
+        image (PIL.Image): The image with transparency.
+        colors (tuple): A tuple of RGB color tuples used for gradient mapping.
+        line_width (int, optional): Line width for polygon outlines.
+            Default is 3
+        depth (int, optional): Recursion depth for the fractal subdivision.
+            Default is 4.
+        rng (optional): Random source (None for the global random state)
+
+    Returns:
+        PIL.Image: Image with fractal background.
+    """
+    width, height = image.size
+    spec = plan_nested_polygons(image.size, colors, line_width, depth, rng=rng)
+    background = Image.fromarray(render_nested_polygons(spec, (0, 0, width, height)))
 
     return compose_images(background, image)
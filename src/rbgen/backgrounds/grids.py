@@ -0,0 +1,202 @@
+# src/rbgen/backgrounds/grids.py
+"""
+Per-pixel distance and angle fields shared across images and modes.
+
+How far each pixel is from a center, and at what angle, depends only on
+the region and the center, not on colors or random choices, yet radial
+gradients, radial patterns and concentric circles each recomputed these
+square roots and arctangents for every image. They are computed once
+here and kept, per process, in a least-recently-used cache bounded by
+bytes; inputs usually come in a handful of sizes, and jobs are run
+grouped by size (see scheduling.order_jobs), so most lookups hit. Even
+at 2048x2048, reading a field back from memory takes about a quarter of
+the time of computing a distance field and a tenth of an angle field.
+Fields that are cheap to compute (square roots) are not kept beyond the
+size of a 4K frame, so one very large image does not evict the fields of
+every other size for little gain.
+
+Fields are read-only float64 arrays for a (left, top, right, bottom)
+region, identical to what the modes computed themselves.
+"""
+import threading
+from collections import OrderedDict
+import numpy as np
+
+# Default budget of the field cache: the distance, angle and gradient
+# fields of a 4K frame (3840x2160 float64, 63 MiB each), or of a few
+# smaller sizes
+DEFAULT_GRID_CACHE_BYTES = 256 * 1024 * 1024
+
+# Cheap fields larger than this (a 4K frame) are recomputed, not cached
+CHEAP_FIELD_BYTES = 64 * 1024 * 1024
+
+
+class GridCache:
+    """
+    Least-recently-used cache of computed fields, bounded by bytes.
+
+    Safe to share between threads; a field missing from the cache may be
+    computed by two threads at once, which only costs time.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_GRID_CACHE_BYTES):
+        """
+        Create an empty cache.
+
+        Args:
+            max_bytes (int): Upper bound on the array data held; fields
+                larger than this are computed but never cached
+        """
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, build):
+        """
+        Return the field for a key, computing it with build() on a miss.
+
+        Args:
+            key (tuple): Hashable description of the field
+            build (callable): Computes the field as a NumPy array
+
+        Returns:
+            np.array: Read-only field
+        """
+        with self._lock:
+            field = self._entries.get(key)
+            if field is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return field
+            self.misses += 1
+
+        field = build()
+        field.setflags(write=False)
+        if field.nbytes > self.max_bytes:
+            return field
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= self._entries.pop(key).nbytes
+            self._evict(self.max_bytes - field.nbytes)
+            self._entries[key] = field
+            self.bytes += field.nbytes
+        return field
+
+    def resize(self, max_bytes):
+        """Change the byte budget, evicting fields beyond it (0 disables)."""
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict(max_bytes)
+
+    def _evict(self, limit):
+        while self._entries and self.bytes > limit:
+            _, evicted = self._entries.popitem(last=False)
+            self.bytes -= evicted.nbytes
+
+    def stats(self):
+        """
+        Return hit-rate statistics.
+
+        Returns:
+            dict: hits, misses, hit_rate, entries and bytes
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+        }
+
+
+# Fields of this process
+grid_cache = GridCache()
+
+
+def cached_field(key, box, build, cheap=False):
+    """
+    Return a float64 field over a region from the cache, or build it.
+
+    Args:
+        key (tuple): Hashable description of the field, besides the box
+        box (tuple): (left, top, right, bottom) region of the field
+        build (callable): Computes the field
+        cheap (bool): Whether the field is cheap enough to compute that
+            it is only worth caching up to CHEAP_FIELD_BYTES
+
+    Returns:
+        np.array: Field (read-only if it came through the cache)
+    """
+    left, top, right, bottom = box
+    if cheap and (right - left) * (bottom - top) * 8 > CHEAP_FIELD_BYTES:
+        return build()
+    return grid_cache.get(key + (tuple(box),), build)
+
+
+def _offsets(box, center):
+    """Column and row offsets of a region's pixels from a center."""
+    left, top, right, bottom = box
+    dx = np.arange(left, right, dtype=np.float64)[None, :] - center[0]
+    dy = np.arange(top, bottom, dtype=np.float64)[:, None] - center[1]
+    return dx, dy
+
+
+def _squared_distance(box, center):
+    """Squared distance of each pixel of a region from a center, uncached."""
+    dx, dy = _offsets(box, center)
+    return dx * dx + dy * dy
+
+
+def squared_distance_field(box, center):
+    """
+    Squared distance of each pixel of a region from a center.
+
+    Args:
+        box (tuple): (left, top, right, bottom) region
+        center (tuple): (x, y) center, in pixels
+
+    Returns:
+        np.array: Array of shape (bottom - top, right - left), read-only
+            when it came through the cache
+    """
+    center = tuple(center)
+
+    return cached_field(
+        ("squared_distance", center),
+        box,
+        lambda: _squared_distance(box, center),
+        cheap=True,
+    )
+
+
+def distance_field(box, center):
+    """Distance of each pixel of a region from a center (see above)."""
+    center = tuple(center)
+    # Built from its own squares, so they are only cached when used
+    return cached_field(
+        ("distance", center),
+        box,
+        lambda: np.sqrt(_squared_distance(box, center)),
+        cheap=True,
+    )
+
+
+def angle_field(box, center):
+    """
+    Angle of each pixel of a region around a center, in degrees (0-360)
+    clockwise from 3 o'clock, as in ImageDraw.pieslice.
+    """
+    center = tuple(center)
+
+    def build():
+        dx, dy = _offsets(box, center)
+        return np.degrees(np.arctan2(dy, dx)) % 360
+
+    return cached_field(("angle", center), box, build)
@@ -1,105 +1,173 @@
 # src/rbgen/backgrounds/line.py
 import math
-import random
-from PIL import Image, ImageDraw, ImageFilter
-
+import numpy as np
+from PIL import Image, ImageFilter
+from rbgen.backgrounds.utils import (
+    compose_images,
+    crop_padded,
+    draw_region,
+    full_width,
+    pad_box,
+    python_rng,
+    shift_points,
+)
+from rbgen.profiling import span
+
+# Supersample for smoother lines (2x resolution)
+LINE_SCALE_FACTOR = 2
+
+# Padding covering the LANCZOS downscale and the SMOOTH_MORE kernel
+LINE_MARGIN = 6
+
+
+def _render_supersampled(spec, box, draw_lines):
+    """
+    Render a region of a supersampled line background.
 
-def apply_line_background(image, colors):
-    """Creates a smooth anti-aliased line background with three sets of lines.
+    Whole rows around the region (see full_width), padded above and
+    below, are drawn at high resolution, downscaled for anti-aliasing,
+    smoothed and cropped back to the requested box.
+    """
+    scale_factor = LINE_SCALE_FACTOR
+    padded = pad_box(full_width(box, spec["size"]), LINE_MARGIN, spec["size"])
+    high_res, draw, offset = draw_region(
+        padded, spec["colors"][0] + (255,), scale=scale_factor
+    )
+    with span("line.draw"):
+        draw_lines(draw, offset)
+
+    with span("line.resample"):
+        # Downscale to original size for anti-aliasing
+        width, height = padded[2] - padded[0], padded[3] - padded[1]
+        background = high_res.resize((width, height), Image.LANCZOS)
+
+        # Apply slight blur for additional smoothing
+        background = background.filter(ImageFilter.SMOOTH_MORE)
+    return crop_padded(np.asarray(background), padded, box)
+
+
+def plan_line(size, colors, rng=None):
+    """Plan a smooth anti-aliased line background with three sets of lines.
     The three sets of lines are spaced approximately 120 degrees apart, to
     cover the image.
+
+    Returns:
+        dict: Background spec for render_line
     """
-    width, height = image.size
-    alpha = image.getchannel("A")
+    rng = python_rng(rng)
+    width, height = size
 
-    # Supersample for smoother lines (2x resolution)
-    scale_factor = 2
+    # Coordinates are planned at the supersampled resolution
+    scale_factor = LINE_SCALE_FACTOR
     high_res_width = width * scale_factor
     high_res_height = height * scale_factor
-    high_res = Image.new("RGBA", (high_res_width, high_res_height), colors[0] + (255,))
-    draw = ImageDraw.Draw(high_res)
 
     # Generate three vanishing points, spaced out across the image
     def get_vanishing_point():
-        edge = random.choice(["left", "right", "top", "bottom"])
+        edge = rng.choice(["left", "right", "top", "bottom"])
         if edge == "left":
             return (
-                random.randint(0, (width // 3) * scale_factor),
-                random.randint(0, high_res_height),
+                rng.randint(0, (width // 3) * scale_factor),
+                rng.randint(0, high_res_height),
             )
         elif edge == "right":
             return (
-                random.randint((2 * width // 3) * scale_factor, high_res_width),
-                random.randint(0, high_res_height),
+                rng.randint((2 * width // 3) * scale_factor, high_res_width),
+                rng.randint(0, high_res_height),
             )
         elif edge == "top":
             return (
-                random.randint(0, high_res_width),
-                random.randint(0, (height // 3) * scale_factor),
+                rng.randint(0, high_res_width),
+                rng.randint(0, (height // 3) * scale_factor),
             )
         else:  # bottom
             return (
-                random.randint(0, high_res_width),
-                random.randint((2 * height // 3) * scale_factor, high_res_height),
+                rng.randint(0, high_res_width),
+                rng.randint((2 * height // 3) * scale_factor, high_res_height),
             )
 
     vanishing_points = [get_vanishing_point() for _ in range(3)]
 
-    # Draw three sets of lines
+    # Plan three sets of lines
+    lines = []
     for vanish_x, vanish_y in vanishing_points:
-        num_lines = random.randint(15, 25)
+        num_lines = rng.randint(15, 25)
         for _ in range(num_lines):
             # Choose a random edge to start from
-            edge = random.choice(["left", "right", "top", "bottom"])
+            edge = rng.choice(["left", "right", "top", "bottom"])
             if edge in ["left", "right"]:
                 start_x = 0 if edge == "left" else high_res_width
-                start_y = random.randint(0, high_res_height)
+                start_y = rng.randint(0, high_res_height)
             else:
-                start_x = random.randint(0, high_res_width)
+                start_x = rng.randint(0, high_res_width)
                 start_y = 0 if edge == "top" else high_res_height
 
-            # Draw line from edge to vanishing point
-            draw.line(
-                [(start_x, start_y), (vanish_x, vanish_y)],
-                fill=colors[1] + (255,),
-                width=random.randint(2, 5),
+            # Line from edge to vanishing point
+            lines.append(
+                ([(start_x, start_y), (vanish_x, vanish_y)], rng.randint(2, 5))
             )
 
-    # Downscale to original size for anti-aliasing
-    background = high_res.resize((width, height), Image.LANCZOS)
+    return {
+        "mode": "line",
+        "size": size,
+        "opaque": True,
+        "colors": [tuple(c) for c in colors[:2]],
+        "lines": lines,
+    }
 
-    # Apply slight blur for additional smoothing
-    background = background.filter(ImageFilter.SMOOTH_MORE)
 
-    # Restore the original foreground using the alpha channel
-    final_image = Image.composite(image, background, alpha)
+def render_line(spec, box):
+    """Render a (left, top, right, bottom) region of a line background."""
+    fill = spec["colors"][1] + (255,)
 
-    return final_image
+    def draw_lines(draw, offset):
+        for points, line_width in spec["lines"]:
+            draw.line(shift_points(points, offset), fill=fill, width=line_width)
 
+    return _render_supersampled(spec, box, draw_lines)
 
-def apply_wavy_line_background(image, colors):
-    """Creates a wave pattern where waves move in a random direction."""
+
+def apply_line_background(image, colors, rng=None):
+    """Creates a smooth anti-aliased line background with three sets of lines.
+    The three sets of lines are spaced approximately 120 degrees apart, to
+    cover the image.
+    """
     width, height = image.size
-    alpha = image.getchannel("A")
+    spec = plan_line(image.size, colors, rng=rng)
+    background = Image.fromarray(render_line(spec, (0, 0, width, height)))
 
-    # Supersample for smoother waves (2x resolution)
-    scale_factor = 2
+    # Restore the original foreground using the alpha channel
+    return compose_images(background, image)
+
+
+def plan_wavy_line(size, colors, rng=None):
+    """Plan a wave pattern where waves move in a random direction.
+
+    Returns:
+        dict: Background spec for render_wavy_line
+    """
+    rng = python_rng(rng)
+    width, height = size
+
+    # Coordinates are planned at the supersampled resolution
+    scale_factor = LINE_SCALE_FACTOR
     high_res_width = width * scale_factor
     high_res_height = height * scale_factor
-    high_res = Image.new("RGBA", (high_res_width, high_res_height), colors[0] + (255,))
-    draw = ImageDraw.Draw(high_res)
 
-    wave_count = random.randint(10, 20)
-    amplitude = random.randint(10, height // 5) * scale_factor
-    frequency = random.uniform(0.005, 0.05) / scale_factor
+    wave_count = rng.randint(10, 20)
+    amplitude = rng.randint(10, height // 5) * scale_factor
+    frequency = rng.uniform(0.005, 0.05) / scale_factor
 
-    phase_shift = random.uniform(0, 2 * math.pi)
-    angle = random.uniform(0, 2 * math.pi)  # Random angle in radians
+    phase_shift = rng.uniform(0, 2 * math.pi)
+    angle = rng.uniform(0, 2 * math.pi)  # Random angle in radians
 
     # Generate wave paths
+    waves = []
+    starts = []
     for _ in range(wave_count):
-        start_x = random.randint(0, high_res_width)
-        start_y = random.randint(0, high_res_height)
+        start_x = rng.randint(0, high_res_width)
+        start_y = rng.randint(0, high_res_height)
+        starts.append((start_x, start_y))
 
         points = []
         for i in range(-high_res_width, high_res_width, 2 * scale_factor):
@@ -109,16 +177,39 @@ def apply_wavy_line_background(image, colors):
             points.append((x, y))
 
         # Random width between 2 to 5 pixels (scaled)
-        line_width = random.randint(2, 5) * scale_factor
-        draw.line(points, fill=colors[1] + (200,), width=line_width)
+        line_width = rng.randint(2, 5) * scale_factor
+        waves.append((points, line_width))
 
-    # Downscale to original size for anti-aliasing
-    background = high_res.resize((width, height), Image.LANCZOS)
+    return {
+        "mode": "wavy_line",
+        "size": size,
+        # Waves are drawn with partial alpha over the base color
+        "opaque": False,
+        "colors": [tuple(c) for c in colors[:2]],
+        "waves": waves,
+        # Shared wave shape and the start of each wave, from which
+        # animation.py recomputes the paths for other phases
+        "wave_shape": (amplitude, frequency, phase_shift, angle),
+        "starts": starts,
+    }
 
-    # Apply slight blur for additional smoothing
-    background = background.filter(ImageFilter.SMOOTH_MORE)
 
-    # Restore the original foreground using the alpha channel
-    final_image = Image.composite(image, background, alpha)
+def render_wavy_line(spec, box):
+    """Render a (left, top, right, bottom) region of a wavy line background."""
+    fill = spec["colors"][1] + (200,)
+
+    def draw_lines(draw, offset):
+        for points, line_width in spec["waves"]:
+            draw.line(shift_points(points, offset), fill=fill, width=line_width)
 
-    return final_image
+    return _render_supersampled(spec, box, draw_lines)
+
+
+def apply_wavy_line_background(image, colors, rng=None):
+    """Creates a wave pattern where waves move in a random direction."""
+    width, height = image.size
+    spec = plan_wavy_line(image.size, colors, rng=rng)
+    background = Image.fromarray(render_wavy_line(spec, (0, 0, width, height)))
+
+    # Restore the original foreground using the alpha channel
+    return compose_images(background, image)
@@ -0,0 +1,199 @@
+# src/rbgen/backgrounds/regions.py
+import contextvars
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from rbgen.backgrounds.registry import MODES
+
+# Each background mode has a planner and a region renderer (see registry.py).
+# A planner makes every random choice up front and returns a spec dict;
+# the renderer then draws any (left, top, right, bottom) region of that
+# background as an RGBA uint8 array, identical to the same pixels of a
+# full-frame render, so regions can be rendered independently as tiles.
+
+# Threaded renders split a region into this many bands per thread, so that
+# threads finishing cheap bands (e.g. outside the Mandelbrot set) pick up
+# more work instead of waiting on the slowest band
+BANDS_PER_THREAD = 4
+
+# Regions are not split into bands smaller than this
+MIN_BAND_PIXELS = 2**16
+
+# Batch renders are split into chunks of at most this many pixels (and at
+# least one background): larger chunks outgrow the CPU caches and render
+# slower than the backgrounds would one by one
+BATCH_PIXELS = 2**17
+
+# Shared band thread pools, by thread count
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def band_executor(threads):
+    """Return the shared pool of `threads` threads used to render bands."""
+    with _executors_lock:
+        if threads not in _executors:
+            _executors[threads] = ThreadPoolExecutor(
+                max_workers=threads, thread_name_prefix="rbgen-band"
+            )
+        return _executors[threads]
+
+
+def plan_background(mode, size, colors, rng=None, **params):
+    """
+    Plan a background of the given mode and size.
+
+    Args:
+        mode (str): Background mode
+        size (tuple): (width, height) of the background
+        colors (list): Colors to use
+        rng (optional): Random source the planner draws from (None for
+            the global random states)
+        **params: Mode-specific parameters, as for the apply_* functions
+
+    Returns:
+        dict: Background spec for render_region
+    """
+    plan, _ = MODES.region_renderer(mode)
+    if rng is not None:
+        params["rng"] = rng
+    return plan(size, colors, **params)
+
+
+def render_region(spec, box, threads=1):
+    """
+    Render a (left, top, right, bottom) region of a planned background.
+
+    With several threads, modes whose renderers spend their time in NumPy
+    (which releases the GIL) render the region as bands on a shared thread
+    pool. Regions render identically however they are split, so the
+    result does not depend on the thread count.
+
+    Args:
+        spec (dict): Background spec from plan_background
+        box (tuple): (left, top, right, bottom) region to render
+        threads (int): Number of threads to render with
+
+    Returns:
+        np.array: RGBA uint8 array of shape (bottom - top, right - left, 4)
+    """
+    _, render = MODES.region_renderer(spec["mode"])
+    if threads <= 1 or not MODES.threaded_regions(spec["mode"]):
+        return render(spec, box)
+    bands = split_box(box, threads * BANDS_PER_THREAD, MIN_BAND_PIXELS)
+    if len(bands) == 1:
+        return render(spec, box)
+
+    executor = band_executor(threads)
+    # Each band runs in a copy of this context, so its spans nest under
+    # the caller's
+    futures = [
+        executor.submit(contextvars.copy_context().run, render, spec, band)
+        for band in bands
+    ]
+    left, top, right, bottom = box
+    result = np.empty((bottom - top, right - left, 4), dtype=np.uint8)
+    for band, future in zip(bands, futures):
+        result[band[1] - top : band[3] - top] = future.result()
+    return result
+
+
+def render_background(spec, threads=1):
+    """Render a planned background in full (see render_region for threads)."""
+    width, height = spec["size"]
+    return render_region(spec, (0, 0, width, height), threads)
+
+
+def render_backgrounds(specs, threads=1):
+    """
+    Render planned backgrounds of one size as a batch.
+
+    Specs of a mode with a batch renderer (see MODES.batch_renderer) are
+    rendered together, sharing the work that does not depend on the
+    spec, in chunks of up to BATCH_PIXELS; the others are rendered one by
+    one. With several threads, the chunks are rendered on the shared band
+    pool. Either way every background is identical to render_background.
+
+    Args:
+        specs (list): Background specs from plan_background, all of the
+            same size
+        threads (int): Number of threads to render with
+
+    Returns:
+        np.array: RGBA uint8 array of shape (len(specs), height, width, 4)
+    """
+    width, height = specs[0]["size"]
+    if any(tuple(spec["size"]) != (width, height) for spec in specs):
+        raise ValueError("Batched backgrounds must all have the same size")
+    batch = np.empty((len(specs), height, width, 4), dtype=np.uint8)
+    by_mode = {}
+    for i, spec in enumerate(specs):
+        by_mode.setdefault(spec["mode"], []).append(i)
+
+    jobs = []
+    for mode, members in by_mode.items():
+        render_batch = MODES.batch_renderer(mode)
+        if render_batch is None:
+            for i in members:
+                batch[i] = render_background(specs[i], threads)
+            continue
+        step = max(1, BATCH_PIXELS // max(width * height, 1))
+        for c in range(0, len(members), step):
+            jobs.append((render_batch, members[c : c + step]))
+
+    def run(render_batch, members):
+        batch[members] = render_batch([specs[i] for i in members])
+
+    if threads <= 1 or len(jobs) <= 1:
+        for job in jobs:
+            run(*job)
+    else:
+        executor = band_executor(threads)
+        futures = [
+            executor.submit(contextvars.copy_context().run, run, *job) for job in jobs
+        ]
+        for future in futures:
+            future.result()
+    return batch
+
+
+def split_box(box, count, min_pixels=0):
+    """
+    Split a region into at most `count` full-width bands of equal height.
+
+    Args:
+        box (tuple): (left, top, right, bottom) region
+        count (int): Maximum number of bands
+        min_pixels (int): Minimum pixels per band
+
+    Returns:
+        list: (left, top, right, bottom) box of each band, top to bottom
+    """
+    left, top, right, bottom = box
+    height = bottom - top
+    rows = max(
+        math.ceil(height / max(count, 1)),
+        math.ceil(min_pixels / max(right - left, 1)),
+        1,
+    )
+    return [
+        (left, y, right, min(bottom, y + rows)) for y in range(top, bottom, rows)
+    ]
+
+
+def iter_bands(size, tile_size):
+    """
+    Split an image into full-width bands of roughly tile_size**2 pixels.
+
+    Args:
+        size (tuple): (width, height) of the image
+        tile_size (int): Side of the square tile whose area bounds each band
+
+    Yields:
+        tuple: (left, top, right, bottom) box of each band, top to bottom
+    """
+    width, height = size
+    rows = max(1, tile_size * tile_size // max(width, 1))
+    for top in range(0, height, rows):
+        yield (0, top, width, min(height, top + rows))
@@ -0,0 +1,244 @@
+# src/rbgen/backgrounds/registry.py
+import importlib
+import inspect
+from collections.abc import Mapping
+
+# Entry point group for background modes provided by other packages.
+# Each entry point names a mode and points to its apply function, e.g.
+#   [project.entry-points."rbgen.backgrounds"]
+#   my_mode = "my_package.backgrounds:apply_my_background"
+# An apply function may carry `plan` and `render` attributes (a planner
+# and region renderer, as for the built-in modes) to support tiled
+# rendering, background caching and pools, and a true `threaded` attribute
+# if its renderer releases the GIL, so regions can be rendered as bands in
+# parallel threads. A `render_batch` attribute (as for BATCH_RENDERERS)
+# lets same-size backgrounds of the mode be rendered together. Apply
+# functions and planners that take an `rng` keyword argument draw all
+# their random choices from it; others are run with the global random
+# states seeded instead.
+ENTRY_POINT_GROUP = "rbgen.backgrounds"
+
+# Built-in background modes, in listing order:
+#   mode: (module in rbgen.backgrounds, apply function, planner, region renderer)
+# Modules are only imported when one of their modes is first used.
+BUILTIN_MODES = {
+    "solid": ("solid", "apply_solid_background", "plan_solid", "render_solid"),
+    "striped": (
+        "striped",
+        "apply_striped_background",
+        "plan_striped",
+        "render_striped",
+    ),
+    "checkered": (
+        "checkered",
+        "apply_checkered_background",
+        "plan_checkered",
+        "render_checkered",
+    ),
+    "perspective_checkered": (
+        "checkered",
+        "apply_perspective_checkered_background",
+        "plan_perspective_checkered",
+        "render_perspective_checkered",
+    ),
+    "mandelbrot": (
+        "fractal",
+        "apply_mandelbrot_background",
+        "plan_mandelbrot",
+        "render_mandelbrot",
+    ),
+    "nested_polygons": (
+        "fractal",
+        "apply_nested_polygons_background",
+        "plan_nested_polygons",
+        "render_nested_polygons",
+    ),
+    "geometric_shapes": (
+        "shapes",
+        "apply_geometric_shapes_background",
+        "plan_geometric_shapes",
+        "render_geometric_shapes",
+    ),
+    "concentric_shapes": (
+        "shapes",
+        "apply_concentric_shapes_background",
+        "plan_concentric_shapes",
+        "render_concentric_shapes",
+    ),
+    "line": ("line", "apply_line_background", "plan_line", "render_line"),
+    "wavy_line": (
+        "line",
+        "apply_wavy_line_background",
+        "plan_wavy_line",
+        "render_wavy_line",
+    ),
+    "perlin_noise": (
+        "textures",
+        "apply_perlin_noise_background",
+        "plan_perlin_noise",
+        "render_perlin_noise",
+    ),
+    "gradient": (
+        "textures",
+        "apply_gradient_background",
+        "plan_gradient",
+        "render_gradient",
+    ),
+    "radial_pattern": (
+        "textures",
+        "apply_radial_pattern_background",
+        "plan_radial_pattern",
+        "render_radial_pattern",
+    ),
+    "marble": (
+        "textures",
+        "apply_marble_texture_background",
+        "plan_marble",
+        "render_marble",
+    ),
+    "cloud": ("textures", "apply_cloud_background", "plan_cloud", "render_cloud"),
+    "waves": ("waves", "apply_waves_background", "plan_waves", "render_waves"),
+}
+
+# Built-in modes whose region renderers spend their time in NumPy, which
+# releases the GIL, so rendering bands in threads uses several cores.
+# Modes drawn with ImageDraw hold the GIL and are left out.
+THREADED_MODES = frozenset(
+    {
+        "striped",
+        "checkered",
+        "perspective_checkered",
+        "mandelbrot",
+        "concentric_shapes",
+        "perlin_noise",
+        "radial_pattern",
+        "marble",
+        "cloud",
+    }
+)
+
+
+# Built-in batch renderers: mode: (module, function). A batch renderer
+# takes a list of same-size specs of its mode and returns their
+# backgrounds as one (B, H, W, 4) uint8 array, identical to rendering each
+# spec in full, with the work shared across the batch.
+BATCH_RENDERERS = {
+    "gradient": ("textures", "render_gradient_batch"),
+    "radial_pattern": ("textures", "render_radial_pattern_batch"),
+    "mandelbrot": ("fractal", "render_mandelbrot_batch"),
+}
+
+
+def _load(module, name):
+    """Import a built-in background module and return one of its functions."""
+    return getattr(importlib.import_module(f"rbgen.backgrounds.{module}"), name)
+
+
+def _find_entry_points():
+    """Return the background entry points installed by other packages."""
+    from importlib.metadata import entry_points
+
+    try:
+        found = entry_points(group=ENTRY_POINT_GROUP)
+    except TypeError:
+        # Python < 3.10
+        found = entry_points().get(ENTRY_POINT_GROUP, [])
+    return {ep.name: ep for ep in found if ep.name not in BUILTIN_MODES}
+
+
+class ModeRegistry(Mapping):
+    """
+    Mapping of background mode names to apply functions, loaded on demand.
+
+    Listing or checking built-in modes imports nothing; a background
+    module is imported the first time one of its modes is looked up.
+    Installed entry points are only scanned when a name is not built in,
+    or when all modes are listed.
+    """
+
+    def __init__(self):
+        self._plugins = None
+
+    def _entry_points(self):
+        if self._plugins is None:
+            self._plugins = _find_entry_points()
+        return self._plugins
+
+    def __contains__(self, mode):
+        return mode in BUILTIN_MODES or mode in self._entry_points()
+
+    def __getitem__(self, mode):
+        if mode in BUILTIN_MODES:
+            module, apply, _, _ = BUILTIN_MODES[mode]
+            return _load(module, apply)
+        if mode in self._entry_points():
+            return self._entry_points()[mode].load()
+        raise KeyError(mode)
+
+    def __iter__(self):
+        yield from BUILTIN_MODES
+        yield from self._entry_points()
+
+    def __len__(self):
+        return len(BUILTIN_MODES) + len(self._entry_points())
+
+    def supports_regions(self, mode):
+        """Return True if a mode has a planner and region renderer."""
+        if mode in BUILTIN_MODES:
+            return True
+        if mode not in self:
+            return False
+        apply = self[mode]
+        return hasattr(apply, "plan") and hasattr(apply, "render")
+
+    def accepts_rng(self, mode):
+        """Return True if a mode's functions take an `rng` keyword argument."""
+        if mode in BUILTIN_MODES:
+            return True
+        parameters = inspect.signature(self[mode]).parameters.values()
+        return any(p.name == "rng" or p.kind is p.VAR_KEYWORD for p in parameters)
+
+    def threaded_regions(self, mode):
+        """Return True if a mode's regions are worth rendering in threads."""
+        if mode in BUILTIN_MODES:
+            return mode in THREADED_MODES
+        return self.supports_regions(mode) and getattr(self[mode], "threaded", False)
+
+    def batch_renderer(self, mode):
+        """Return a mode's batch renderer, or None if it has none."""
+        if mode in BUILTIN_MODES:
+            if mode not in BATCH_RENDERERS:
+                return None
+            return _load(*BATCH_RENDERERS[mode])
+        if not self.supports_regions(mode):
+            return None
+        return getattr(self[mode], "render_batch", None)
+
+    def region_renderer(self, mode):
+        """
+        Return the planner and region renderer of a mode.
+
+        Returns:
+            tuple: (plan, render) functions
+        """
+        if mode in BUILTIN_MODES:
+            module, _, plan, render = BUILTIN_MODES[mode]
+            return _load(module, plan), _load(module, render)
+        if mode not in self:
+            raise ValueError(f"Unknown background mode: {mode}")
+        apply = self[mode]
+        plan, render = getattr(apply, "plan", None), getattr(apply, "render", None)
+        if plan is None or render is None:
+            raise ValueError(
+                f"Background mode '{mode}' does not support region rendering"
+            )
+        return plan, render
+
+
+# Shared registry of all background modes
+MODES = ModeRegistry()
+
+
+def available_modes():
+    """Return the names of all background modes, built-in ones first."""
+    return list(MODES)
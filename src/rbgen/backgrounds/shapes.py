@@ -1,130 +1,214 @@
 # src/rbgen/backgrounds/shapes.py
-import random
 import math
-from PIL import Image, ImageDraw
-from rbgen.backgrounds.utils import interpolate_color, compose_images
-
-
-def apply_geometric_shapes_background(
-    image, colors, num_shapes=50, max_size=100, shape_types=None
+import numpy as np
+from PIL import Image
+from rbgen.backgrounds.grids import distance_field
+from rbgen.backgrounds.utils import (
+    interpolate_color,
+    compose_images,
+    crop_padded,
+    draw_region,
+    full_width,
+    python_rng,
+    shift_points,
+)
+
+
+def plan_geometric_shapes(
+    size, colors, num_shapes=50, max_size=100, shape_types=None, rng=None
 ):
     """
-    Generates a background with random overlapping geometric shapes.
+    Plan a background with random overlapping geometric shapes.
 
     Args:
-        image (PIL.Image): Base image to overlay the background.
+        size (tuple): (width, height) of the background
         colors (list): List of two colors to interpolate.
         num_shapes (int): Number of shapes to generate.
         max_size (int): Maximum size of each shape.
         shape_types (list, optional): List of shape types to use.
                                      Defaults to ["circle", "triangle", "polygon"].
+        rng (optional): Random source (None for the global random state)
 
     Returns:
-        PIL.Image: Image with geometric shapes background.
+        dict: Background spec for render_geometric_shapes
     """
-    width, height = image.size
-    background = Image.new("RGBA", (width, height), (0, 0, 0, 255))
-    draw = ImageDraw.Draw(background)
+    rng = python_rng(rng)
+    width, height = size
 
     if shape_types is None:
         shape_types = ["circle", "triangle", "polygon"]
 
+    shapes = []
     for _ in range(num_shapes):
-        shape_type = random.choice(shape_types)
-        x, y = random.randint(0, width), random.randint(0, height)
-        size = random.randint(20, max_size)
-        t = random.random()
+        shape_type = rng.choice(shape_types)
+        x, y = rng.randint(0, width), rng.randint(0, height)
+        shape_size = rng.randint(20, max_size)
+        t = rng.random()
         color = interpolate_color(colors[0], colors[1], t)
+        bounds = [(x - shape_size, y - shape_size), (x + shape_size, y + shape_size)]
 
         if shape_type == "circle":
-            draw.ellipse(
-                [x - size, y - size, x + size, y + size], fill=color, outline=None
-            )
+            shapes.append(("ellipse", bounds, color))
         elif shape_type == "rectangle":
-            draw.rectangle(
-                [x - size, y - size, x + size, y + size], fill=color, outline=None
-            )
+            shapes.append(("rectangle", bounds, color))
         elif shape_type == "triangle":
-            angle = random.uniform(0, 2 * math.pi)
-            p1 = (x + size * math.cos(angle), y + size * math.sin(angle))
+            angle = rng.uniform(0, 2 * math.pi)
+            p1 = (x + shape_size * math.cos(angle), y + shape_size * math.sin(angle))
             p2 = (
-                x + size * math.cos(angle + 2 * math.pi / 3),
-                y + size * math.sin(angle + 2 * math.pi / 3),
+                x + shape_size * math.cos(angle + 2 * math.pi / 3),
+                y + shape_size * math.sin(angle + 2 * math.pi / 3),
             )
             p3 = (
-                x + size * math.cos(angle + 4 * math.pi / 3),
-                y + size * math.sin(angle + 4 * math.pi / 3),
+                x + shape_size * math.cos(angle + 4 * math.pi / 3),
+                y + shape_size * math.sin(angle + 4 * math.pi / 3),
             )
-            draw.polygon([p1, p2, p3], fill=color, outline=None)
+            shapes.append(("polygon", [p1, p2, p3], color))
         elif shape_type == "polygon":
-            num_sides = random.randint(4, 8)
+            num_sides = rng.randint(4, 8)
             points = [
                 (
-                    x + size * math.cos(2 * math.pi * i / num_sides),
-                    y + size * math.sin(2 * math.pi * i / num_sides),
+                    x + shape_size * math.cos(2 * math.pi * i / num_sides),
+                    y + shape_size * math.sin(2 * math.pi * i / num_sides),
                 )
                 for i in range(num_sides)
             ]
-            draw.polygon(points, fill=color, outline=None)
+            shapes.append(("polygon", points, color))
 
-    return compose_images(background, image)
+    return {"mode": "geometric_shapes", "size": size, "opaque": True, "shapes": shapes}
 
 
-def apply_concentric_shapes_background(
-    image, colors, num_rings=10, center=None, shape_type=None
+def render_geometric_shapes(spec, box):
+    """Render a (left, top, right, bottom) region of a geometric shapes background."""
+    # Polygons are drawn across whole rows (see full_width)
+    rows = full_width(box, spec["size"])
+    background, draw, offset = draw_region(rows, (0, 0, 0, 255))
+
+    for kind, coords, color in spec["shapes"]:
+        if kind == "polygon":
+            draw.polygon(shift_points(coords, offset), fill=color, outline=None)
+        else:
+            bounds = [c for point in shift_points(coords, offset) for c in point]
+            if kind == "ellipse":
+                draw.ellipse(bounds, fill=color, outline=None)
+            else:
+                draw.rectangle(bounds, fill=color, outline=None)
+
+    return crop_padded(np.asarray(background), rows, box)
+
+
+def apply_geometric_shapes_background(
+    image, colors, num_shapes=50, max_size=100, shape_types=None, rng=None
 ):
     """
-    Generates a background with concentric shapes radiating from a center point.
+    Generates a background with random overlapping geometric shapes.
 
     Args:
         image (PIL.Image): Base image to overlay the background.
         colors (list): List of two colors to interpolate.
+        num_shapes (int): Number of shapes to generate.
+        max_size (int): Maximum size of each shape.
+        shape_types (list, optional): List of shape types to use.
+                                     Defaults to ["circle", "triangle", "polygon"].
+        rng (optional): Random source (None for the global random state)
+
+    Returns:
+        PIL.Image: Image with geometric shapes background.
+    """
+    width, height = image.size
+    spec = plan_geometric_shapes(
+        image.size, colors, num_shapes, max_size, shape_types, rng=rng
+    )
+    background = Image.fromarray(render_geometric_shapes(spec, (0, 0, width, height)))
+    return compose_images(background, image)
+
+
+def plan_concentric_shapes(
+    size, colors, num_rings=10, center=None, shape_type=None, rng=None
+):
+    """
+    Plan a background with concentric shapes radiating from a center point.
+
+    Args:
+        size (tuple): (width, height) of the background
+        colors (list): List of two colors to interpolate.
         num_rings (int): Number of concentric shapes to draw.
         center (tuple, optional): Center position (x, y). If None, uses image center.
         shape_type (str): Type of shape to use ("circle", "square").
+        rng (optional): Random source (None for the global random state)
 
     Returns:
-        PIL.Image: Image with concentric shapes background.
+        dict: Background spec for render_concentric_shapes
     """
-    width, height = image.size
-    background = Image.new("RGBA", (width, height), (0, 0, 0, 255))
-    draw = ImageDraw.Draw(background)
+    rng = python_rng(rng)
+    width, height = size
 
     if shape_type is None:
         shape_types = ["circle", "square"]
-        shape_type = random.choice(shape_types)
+        shape_type = rng.choice(shape_types)
 
     if center is None:
         center = (width // 2, height // 2)
 
+    return {
+        "mode": "concentric_shapes",
+        "size": size,
+        "opaque": True,
+        "colors": [tuple(c) for c in colors[:2]],
+        "num_rings": num_rings,
+        "center": tuple(center),
+        "shape_type": shape_type,
+    }
+
+
+def render_concentric_shapes(spec, box):
+    """Render a (left, top, right, bottom) region of a concentric shapes background."""
+    width, height = spec["size"]
+    left, top, right, bottom = box
+    num_rings = spec["num_rings"]
+    colors = spec["colors"]
+    center = spec["center"]
+
     max_radius = max(width, height) * 0.75
 
-    for i in range(num_rings, 0, -1):
-        radius = (i / num_rings) * max_radius
-        t = i / num_rings
-        color = interpolate_color(colors[0], colors[1], t)
+    if spec["shape_type"] == "circle":
+        distance = distance_field(box, center)
+    else:  # "square"
+        dx = np.abs(np.arange(left, right, dtype=np.float64)[None, :] - center[0])
+        dy = np.abs(np.arange(top, bottom, dtype=np.float64)[:, None] - center[1])
+        distance = np.maximum(dx, dy)
 
-        if shape_type == "circle":
-            draw.ellipse(
-                [
-                    center[0] - radius,
-                    center[1] - radius,
-                    center[0] + radius,
-                    center[1] + radius,
-                ],
-                fill=color,
-                outline=None,
-            )
-        elif shape_type == "square":
-            draw.rectangle(
-                [
-                    center[0] - radius,
-                    center[1] - radius,
-                    center[0] + radius,
-                    center[1] + radius,
-                ],
-                fill=color,
-                outline=None,
-            )
+    # Rings are drawn from the outside in, so each pixel takes the color of
+    # the smallest ring containing it; pixels outside all rings stay black
+    ring = np.ceil(distance / max_radius * num_rings)
+    ring = np.clip(ring, 1, num_rings + 1).astype(np.intp)
+
+    lut = np.zeros((num_rings + 2, 4), dtype=np.uint8)
+    lut[:, 3] = 255
+    for i in range(1, num_rings + 1):
+        lut[i] = interpolate_color(colors[0], colors[1], i / num_rings)
+    return lut[ring]
+
+
+def apply_concentric_shapes_background(
+    image, colors, num_rings=10, center=None, shape_type=None, rng=None
+):
+    """
+    Generates a background with concentric shapes radiating from a center point.
 
+    Args:
+        image (PIL.Image): Base image to overlay the background.
+        colors (list): List of two colors to interpolate.
+        num_rings (int): Number of concentric shapes to draw.
+        center (tuple, optional): Center position (x, y). If None, uses image center.
+        shape_type (str): Type of shape to use ("circle", "square").
+        rng (optional): Random source (None for the global random state)
+
+    Returns:
+        PIL.Image: Image with concentric shapes background.
+    """
+    width, height = image.size
+    spec = plan_concentric_shapes(
+        image.size, colors, num_rings, center, shape_type, rng=rng
+    )
+    background = Image.fromarray(render_concentric_shapes(spec, (0, 0, width, height)))
     return compose_images(background, image)
@@ -1,18 +1,39 @@
 # src/rbgen/backgrounds/solid.py
 from PIL import Image
+from rbgen.backgrounds.utils import compose_images, new_region
 
 
-def apply_solid_background(image, color):
+def plan_solid(size, colors, rng=None):
+    """
+    Plan a solid background using the first of the given colors.
+
+    Args:
+        size (tuple): (width, height) of the background
+        colors (list): Colors to use; only the first one is used
+        rng (optional): Unused; solid backgrounds have no random choices
+
+    Returns:
+        dict: Background spec for render_solid
+    """
+    return {"mode": "solid", "size": size, "opaque": True, "color": tuple(colors[0])}
+
+
+def render_solid(spec, box):
+    """Render a (left, top, right, bottom) region of a solid background."""
+    return new_region(box, spec["color"] + (255,))
+
+
+def apply_solid_background(image, color, rng=None):
     """
     Applies a solid color background to an image with transparency.
 
     Args:
         image (PIL.Image): The image with transparency
         color (tuple): RGB color tuple (r, g, b)
+        rng (optional): Unused; solid backgrounds have no random choices
 
     Returns:
         PIL.Image: Image with solid background
     """
-    background = Image.new("RGBA", image.size, color + (255,))
-    background.paste(image, (0, 0), image)
-    return background
+    background = Image.new("RGBA", image.size, tuple(color) + (255,))
+    return compose_images(background, image)
@@ -1,48 +1,93 @@
 # src/rbgen/backgrounds/striped.py
 import math
-import random
-from PIL import Image, ImageDraw
+import numpy as np
+from PIL import Image
+from rbgen.backgrounds.utils import (
+    compose_images,
+    lerp_colors,
+    python_rng,
+    rotated_pattern_coverage,
+)
 
 
-def apply_striped_background(image, colors, min_stripe_width=10, max_stripe_width=30):
+def plan_striped(size, colors, min_stripe_width=10, max_stripe_width=30, rng=None):
     """
-    Applies a randomly rotated striped background with variable stripe widths
-    while keeping the foreground intact.
+    Plan a randomly rotated striped background with variable stripe widths.
 
     Parameters:
-        image (PIL.Image): The foreground image with transparency.
+        size (tuple): (width, height) of the background
         colors (tuple): A tuple of two RGB color tuples, (background_color, stripe_color).
         min_stripe_width (int, optional): Minimum width of stripes.
         max_stripe_width (int, optional): Maximum width of stripes.
+        rng (optional): Random source (None for the global random state)
 
     Returns:
-        PIL.Image: The image with applied striped background.
+        dict: Background spec for render_striped
     """
-    width, height = image.size
+    rng = python_rng(rng)
+    width, height = size
 
-    # Expand canvas to avoid cutoff during rotation
+    # Pattern canvas large enough to avoid cutoff during rotation
     diag = int(math.sqrt(width**2 + height**2))
     expanded_size = diag * 2
-    striped = Image.new("RGBA", (expanded_size, expanded_size), colors[0] + (255,))
-    draw = ImageDraw.Draw(striped)
 
-    # Draw vertical stripes with random widths
+    # Vertical stripes with random widths
+    starts, ends = [], []
     x = 0
     while x < expanded_size:
-        stripe_width = random.randint(min_stripe_width, max_stripe_width)
-        draw.rectangle([x, 0, x + stripe_width, expanded_size], fill=colors[1] + (255,))
+        stripe_width = rng.randint(min_stripe_width, max_stripe_width)
+        starts.append(x)
+        ends.append(x + stripe_width)
         x += stripe_width * 2  # Maintain spacing
 
-    # Random rotation
-    angle = random.uniform(0, 360)
-    rotated = striped.rotate(angle, resample=Image.BICUBIC, expand=True)
+    return {
+        "mode": "striped",
+        "size": size,
+        "opaque": True,
+        "colors": [tuple(c) for c in colors[:2]],
+        "canvas_size": expanded_size,
+        "stripes": (np.array(starts), np.array(ends)),
+        # Random rotation
+        "angle": rng.uniform(0, 360),
+    }
 
-    # Crop center to match original size
-    left = (rotated.width - width) // 2
-    top = (rotated.height - height) // 2
-    cropped = rotated.crop((left, top, left + width, top + height))
 
-    # Composite with the original image
-    cropped.paste(image, (0, 0), image)
+def render_striped(spec, box):
+    """Render a (left, top, right, bottom) region of a striped background."""
+    starts, ends = spec["stripes"]
+
+    def inside(u, v):
+        index = np.searchsorted(starts, u, side="right") - 1
+        return (index >= 0) & (u <= ends[np.maximum(index, 0)])
+
+    coverage = rotated_pattern_coverage(
+        box, spec["size"], spec["angle"], spec["canvas_size"], inside
+    )
+    return lerp_colors(spec["colors"][0], spec["colors"][1], coverage)
+
+
+def apply_striped_background(
+    image, colors, min_stripe_width=10, max_stripe_width=30, rng=None
+):
+    """
+    Applies a randomly rotated striped background with variable stripe widths
+    while keeping the foreground intact.
 
-    return cropped
+    Parameters:
+        image (PIL.Image): The foreground image with transparency.
+        colors (tuple): A tuple of two RGB color tuples, (background_color, stripe_color).
+        min_stripe_width (int, optional): Minimum width of stripes.
+        max_stripe_width (int, optional): Maximum width of stripes.
+        rng (optional): Random source (None for the global random state)
+
+    Returns:
+        PIL.Image: The image with applied striped background.
+    """
+    width, height = image.size
+    spec = plan_striped(
+        image.size, colors, min_stripe_width, max_stripe_width, rng=rng
+    )
+    background = Image.fromarray(render_striped(spec, (0, 0, width, height)))
+
+    # Composite with the original image
+    return compose_images(background, image)
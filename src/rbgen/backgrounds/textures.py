@@ -1,49 +1,179 @@
 # src/rbgen/backgrounds/textures.py
-import random
 import math
 import numpy as np
-from PIL import Image, ImageDraw, ImageFilter
+from PIL import Image, ImageFilter
+from rbgen.backgrounds.grids import (
+    angle_field,
+    cached_field,
+    distance_field,
+    squared_distance_field,
+)
 from rbgen.backgrounds.utils import (
-    generate_perlin_noise,
+    blur_margin,
+    compose_images,
+    crop_padded,
+    generate_perlin_lattices,
+    hash_noise,
+    lerp_colors,
+    lerp_colors_batch,
+    new_region,
+    numpy_rng,
+    pad_box,
+    python_rng,
+    randint_below,
+    sample_perlin_noise,
+    sample_perlin_points,
 )
+from rbgen.profiling import span
+
+GRADIENT_DIRECTIONS = ["horizontal", "vertical", "diagonal", "radial"]
+
+
+def plan_perlin_noise(size, colors, scale=0.1, octaves=6, rng=None):
+    """
+    Plan a Perlin noise background.
+
+    Args:
+        size (tuple): (width, height) of the background
+        colors: Tuple of two RGB colors to interpolate between
+        scale: Scale of the noise (smaller = more zoomed out)
+        octaves: Number of detail levels in the noise
+        rng (optional): Random source of the noise (None for np.random)
+
+    Returns:
+        dict: Background spec for render_perlin_noise
+    """
+    width, height = size
+    return {
+        "mode": "perlin_noise",
+        "size": size,
+        "opaque": True,
+        "colors": [tuple(c) for c in colors[:2]],
+        "noise": generate_perlin_lattices(width, height, scale, octaves, rng=rng),
+    }
+
+
+def render_perlin_noise(spec, box):
+    """Render a (left, top, right, bottom) region of a Perlin noise background."""
+    noise = sample_perlin_noise(spec["noise"], box)
+    return lerp_colors(spec["colors"][0], spec["colors"][1], noise)
 
 
-def apply_perlin_noise_background(image, colors, scale=0.1, octaves=6):
+def apply_perlin_noise_background(image, colors, scale=0.1, octaves=6, rng=None):
     """
     Creates a Perlin noise background with smooth transitions between colors.
-    Uses RegularGridInterpolator instead of deprecated interp2d.
 
     Args:
         image: PIL Image with transparency
         colors: Tuple of two RGB colors to interpolate between
         scale: Scale of the noise (smaller = more zoomed out)
         octaves: Number of detail levels in the noise
+        rng: Random source of the noise (None for np.random)
 
     Returns:
         PIL.Image: Image with applied Perlin noise background.
     """
     width, height = image.size
-    background = Image.new("RGBA", (width, height))
-    pixels = background.load()
+    spec = plan_perlin_noise(image.size, colors, scale, octaves, rng=rng)
+    background = Image.fromarray(render_perlin_noise(spec, (0, 0, width, height)))
 
-    # Generate the noise
-    noise = generate_perlin_noise(width, height, scale, octaves)
+    # Apply the original image with transparency
+    return compose_images(background, image)
 
-    # Convert to image with color interpolation
-    for y in range(height):
-        for x in range(width):
-            t = noise[y, x]
-            r = int(colors[0][0] * (1 - t) + colors[1][0] * t)
-            g = int(colors[0][1] * (1 - t) + colors[1][1] * t)
-            b = int(colors[0][2] * (1 - t) + colors[1][2] * t)
-            pixels[x, y] = (r, g, b, 255)
 
-    # Apply the original image with transparency
-    background.paste(image, (0, 0), image)
-    return background
+def plan_gradient(size, colors, direction="horizontal", rng=None):
+    """
+    Plan a gradient background.
 
+    Args:
+        size (tuple): (width, height) of the background
+        colors: Tuple of two RGB colors for gradient start and end
+        direction: Direction of gradient
+            ("horizontal", "vertical", "diagonal", "radial" or "random")
+        rng (optional): Random source (None for the global random state)
 
-def apply_gradient_background(image, colors, direction="horizontal"):
+    Returns:
+        dict: Background spec for render_gradient
+    """
+    rng = python_rng(rng)
+    # Choose a random direction if not specified
+    if direction == "random":
+        direction = rng.choice(GRADIENT_DIRECTIONS)
+    if direction not in GRADIENT_DIRECTIONS:
+        raise ValueError(f"Unknown gradient direction: {direction}")
+
+    return {
+        "mode": "gradient",
+        "size": size,
+        "opaque": True,
+        "colors": [tuple(c) for c in colors[:2]],
+        "direction": direction,
+    }
+
+
+def _gradient_factors(spec, box):
+    """Blend factors of a gradient over a region (broadcastable to it)."""
+    width, height = spec["size"]
+    left, top, right, bottom = box
+    direction = spec["direction"]
+
+    if direction == "horizontal":
+        t = np.arange(left, right, dtype=np.float64)[None, :] / width
+    elif direction == "vertical":
+        t = np.arange(top, bottom, dtype=np.float64)[:, None] / height
+    elif direction == "diagonal":
+        # Distance from the top-left corner
+        t = cached_field(
+            ("gradient", direction, tuple(spec["size"])),
+            box,
+            lambda: distance_field(box, (0, 0)) / math.sqrt(width**2 + height**2),
+            cheap=True,
+        )
+    else:  # "radial"
+        center = (width // 2, height // 2)
+        max_radius = max(width, height) // 2
+        t = cached_field(
+            ("gradient", direction, tuple(spec["size"])),
+            box,
+            lambda: np.minimum(1.0, distance_field(box, center) / max_radius),
+            cheap=True,
+        )
+    return t
+
+
+def render_gradient(spec, box):
+    """Render a (left, top, right, bottom) region of a gradient background."""
+    left, top, right, bottom = box
+    t = _gradient_factors(spec, box)
+    region = np.empty((bottom - top, right - left, 4), dtype=np.uint8)
+    region[...] = lerp_colors(spec["colors"][0], spec["colors"][1], t)
+    return region
+
+
+def render_gradient_batch(specs):
+    """
+    Render same-size gradients as one (B, H, W, 4) array.
+
+    The blend factors are computed once per direction and shared by every
+    gradient in that direction; each item equals render_gradient.
+    """
+    width, height = specs[0]["size"]
+    box = (0, 0, width, height)
+    batch = np.empty((len(specs), height, width, 4), dtype=np.uint8)
+    directions = {}
+    for i, spec in enumerate(specs):
+        directions.setdefault(spec["direction"], []).append(i)
+    for members in directions.values():
+        t = _gradient_factors(specs[members[0]], box)
+        batch[members] = lerp_colors_batch(
+            [specs[i]["colors"][0] for i in members],
+            [specs[i]["colors"][1] for i in members],
+            t[None],
+        )
+    return batch
+
+
+def apply_gradient_background(image, colors, direction="horizontal", rng=None):
     """
     Creates a smooth gradient background.
 
@@ -52,64 +182,85 @@ def apply_gradient_background(image, colors, direction="horizontal"):
         colors: Tuple of two RGB colors for gradient start and end
         direction: Direction of gradient
             ("horizontal", "vertical", "diagonal", "radial")
+        rng: Random source (None for the global random state)
 
     Returns:
         PIL.Image: Image with applied gradient background.
     """
     width, height = image.size
-    background = Image.new("RGBA", (width, height))
-    draw = ImageDraw.Draw(background)
+    spec = plan_gradient(image.size, colors, direction, rng=rng)
+    background = Image.fromarray(render_gradient(spec, (0, 0, width, height)))
+    return compose_images(background, image)
 
-    # Choose a random direction if not specified
-    if direction == "random":
-        direction = random.choice(["horizontal", "vertical", "diagonal", "radial"])
 
-    if direction == "horizontal":
-        for x in range(width):
-            t = x / width
-            r = int(colors[0][0] * (1 - t) + colors[1][0] * t)
-            g = int(colors[0][1] * (1 - t) + colors[1][1] * t)
-            b = int(colors[0][2] * (1 - t) + colors[1][2] * t)
-            draw.line([(x, 0), (x, height)], fill=(r, g, b, 255))
+def plan_radial_pattern(size, colors, num_rays=24, rng=None):
+    """
+    Plan a radial pattern with rays emanating from the center.
 
-    elif direction == "vertical":
-        for y in range(height):
-            t = y / height
-            r = int(colors[0][0] * (1 - t) + colors[1][0] * t)
-            g = int(colors[0][1] * (1 - t) + colors[1][1] * t)
-            b = int(colors[0][2] * (1 - t) + colors[1][2] * t)
-            draw.line([(0, y), (width, y)], fill=(r, g, b, 255))
+    Args:
+        size (tuple): (width, height) of the background
+        colors: Tuple of two RGB colors for alternating rays
+        num_rays: Number of rays in the pattern
+        rng (optional): Random source (None for the global random state)
 
-    elif direction == "diagonal":
-        max_distance = math.sqrt(width**2 + height**2)
-        for y in range(height):
-            for x in range(width):
-                # Calculate distance from top-left corner
-                dist = math.sqrt(x**2 + y**2)
-                t = dist / max_distance
-                r = int(colors[0][0] * (1 - t) + colors[1][0] * t)
-                g = int(colors[0][1] * (1 - t) + colors[1][1] * t)
-                b = int(colors[0][2] * (1 - t) + colors[1][2] * t)
-                draw.point((x, y), fill=(r, g, b, 255))
-
-    elif direction == "radial":
-        center_x, center_y = width // 2, height // 2
-        max_radius = max(width, height) // 2
+    Returns:
+        dict: Background spec for render_radial_pattern
+    """
+    return {
+        "mode": "radial_pattern",
+        "size": size,
+        "opaque": True,
+        "colors": [tuple(c) for c in colors[:2]],
+        "num_rays": num_rays,
+    }
+
+
+def render_radial_pattern(spec, box):
+    """Render a (left, top, right, bottom) region of a radial pattern."""
+    width, height = spec["size"]
+    left, top, right, bottom = box
+    colors = spec["colors"]
+
+    center = (width // 2, height // 2)
+    ray_angle = 360 / spec["num_rays"]
+    max_radius = math.sqrt((width // 2) ** 2 + (height // 2) ** 2)
+
+    # Only every other ray is drawn (alternate colors)
+    in_ray = (angle_field(box, center) // ray_angle) % 2 == 1
+    in_ray &= squared_distance_field(box, center) <= max_radius * max_radius
+
+    region = new_region(box, colors[0] + (255,))
+    region[in_ray] = colors[1] + (255,)
+    return region
+
+
+def render_radial_pattern_batch(specs):
+    """
+    Render same-size radial patterns as one (B, H, W, 4) array.
+
+    Pixel angles and radii are looked up once for the batch; each item
+    equals render_radial_pattern.
+    """
+    width, height = specs[0]["size"]
+    box = (0, 0, width, height)
+    center = (width // 2, height // 2)
+    max_radius = math.sqrt((width // 2) ** 2 + (height // 2) ** 2)
 
-        for y in range(height):
-            for x in range(width):
-                distance = math.sqrt((x - center_x) ** 2 + (y - center_y) ** 2)
-                t = min(1.0, distance / max_radius)
-                r = int(colors[0][0] * (1 - t) + colors[1][0] * t)
-                g = int(colors[0][1] * (1 - t) + colors[1][1] * t)
-                b = int(colors[0][2] * (1 - t) + colors[1][2] * t)
-                draw.point((x, y), fill=(r, g, b, 255))
+    angle = angle_field(box, center)
+    within = squared_distance_field(box, center) <= max_radius * max_radius
 
-    background.paste(image, (0, 0), image)
-    return background
+    ray_angles = np.array([360 / spec["num_rays"] for spec in specs])
+    in_ray = (angle[None] // ray_angles[:, None, None]) % 2 == 1
+    in_ray &= within[None]
+
+    first = np.array([spec["colors"][0] + (255,) for spec in specs], np.uint8)
+    second = np.array([spec["colors"][1] + (255,) for spec in specs], np.uint8)
+    return np.where(
+        in_ray[..., None], second[:, None, None], first[:, None, None]
+    )
 
 
-def apply_radial_pattern_background(image, colors, num_rays=24):
+def apply_radial_pattern_background(image, colors, num_rays=24, rng=None):
     """
     Creates a radial pattern with rays emanating from the center.
 
@@ -119,149 +270,222 @@ def apply_radial_pattern_background(image, colors, num_rays=24):
         num_rays: Number of rays in the pattern
     """
     width, height = image.size
-    background = Image.new("RGBA", (width, height), colors[0] + (255,))
-    draw = ImageDraw.Draw(background)
-
-    center_x, center_y = width // 2, height // 2
-    ray_angle = 360 / num_rays
-    max_radius = math.sqrt((width // 2) ** 2 + (height // 2) ** 2)
+    spec = plan_radial_pattern(image.size, colors, num_rays, rng=rng)
+    background = Image.fromarray(render_radial_pattern(spec, (0, 0, width, height)))
+    return compose_images(background, image)
 
-    for i in range(num_rays):
-        if i % 2 == 1:  # Only draw every other ray (alternate colors)
-            start_angle = i * ray_angle
-            end_angle = (i + 1) * ray_angle
 
-            # Draw a filled ray/segment
-            draw.pieslice(
-                (
-                    center_x - max_radius,
-                    center_y - max_radius,
-                    center_x + max_radius,
-                    center_y + max_radius,
-                ),
-                start_angle,
-                end_angle,
-                fill=colors[1] + (255,),
-            )
+# Blur applied to the colored marble texture
+MARBLE_BLUR_RADIUS = 1.2
 
-    background.paste(image, (0, 0), image)
-    return background
 
-
-def apply_marble_texture_background(
-    image, colors, turbulence=5.0, scale=0.05, octaves=5, vein_scale=25.0
+def plan_marble(
+    size, colors, turbulence=5.0, scale=0.05, octaves=5, vein_scale=25.0, rng=None
 ):
     """
-    Creates a realistic marble texture using Perlin noise with non-linear
-    transformations.
+    Plan a marble texture background.
+
+    The texture is computed on a canvas expanded by 20%, whose
+    bottom-right section is kept to avoid heavy banding artifacts.
 
     Args:
-        image: PIL Image with transparency
+        size (tuple): (width, height) of the background
         colors: List of RGB colors for marble veins (can be more than two)
         turbulence: Amount of turbulence in the marble pattern
         scale: Base scale for the noise (lower = larger features)
         octaves: Number of noise layers to combine
         vein_scale: Scale factor for vein width variation
+        rng (optional): Random source of the noise (None for np.random)
 
     Returns:
-        PIL.Image: Image with applied realistic marble texture background.
+        dict: Background spec for render_marble
     """
-    width, height = image.size
+    width, height = size
+    rng = numpy_rng(rng)
 
     # Expand canvas by 20%
     new_width = int(width * 1.2)
     new_height = int(height * 1.2)
 
-    # Generate direction field for vein orientation
-    direction_noise_x = generate_perlin_noise(new_width, new_height, scale / 3, 2)
-    direction_noise_y = generate_perlin_noise(
-        new_width, new_height, scale / 3, 2, seed=42
-    )
+    def lattices(scale, octaves, seed=None):
+        return generate_perlin_lattices(
+            new_width, new_height, scale, octaves, seed, rng
+        )
+
+    spec = {
+        "mode": "marble",
+        "size": size,
+        "opaque": True,
+        "colors": [tuple(c) for c in colors],
+        "expanded_size": (new_width, new_height),
+        "turbulence": turbulence,
+        "vein_scale": vein_scale,
+        # Direction field for vein orientation
+        "direction_x": lattices(scale / 3, 2),
+        "direction_y": lattices(scale / 3, 2, seed=42),
+        # Base Perlin noise textures
+        "base": lattices(scale, octaves),
+        "vein_width": lattices(scale * 2, 2),
+        "detail": lattices(scale * 4, 3),
+        # Surface variation and dithering
+        "surface": lattices(scale * 8, 2),
+        "dither_seed": int(randint_below(rng, 2**31)),
+    }
+    return spec
+
+
+def render_marble(spec, box):
+    """Render a (left, top, right, bottom) region of a marble background."""
+    width, height = spec["size"]
+    new_width, new_height = spec["expanded_size"]
+
+    # Position of the region on the expanded canvas (bottom-right section)
+    offset_x = new_width - width
+    offset_y = new_height - height
+    canvas_box = (box[0] + offset_x, box[1] + offset_y, box[2] + offset_x, box[3] + offset_y)
+    padded = pad_box(canvas_box, blur_margin(MARBLE_BLUR_RADIUS), (new_width, new_height))
+    xs = np.arange(padded[0], padded[2])[None, :]
+    ys = np.arange(padded[1], padded[3])[:, None]
+
+    with span("marble.noise"):
+        # Create direction vectors from noise
+        angle = (
+            sample_perlin_noise(spec["direction_x"], padded).astype(np.float64)
+            + sample_perlin_noise(spec["direction_y"], padded)
+        ) * math.pi
+        base_noise = sample_perlin_noise(spec["base"], padded)
+        vein_freq = 1.0 + sample_perlin_noise(spec["vein_width"], padded) * 0.5
+        detail_noise = sample_perlin_noise(spec["detail"], padded)
+
+    with span("marble.warp"):
+        # Warp the sampling positions along the direction field
+        distortion = spec["turbulence"] * base_noise
+        sample_x = xs + np.cos(angle) * distortion
+        sample_y = ys + np.sin(angle) * distortion
+        wrapped_x = np.trunc(sample_x).astype(np.intp) % new_width
+        wrapped_y = np.trunc(sample_y).astype(np.intp) % new_height
+        warped_noise = sample_perlin_points(spec["base"], wrapped_x, wrapped_y)
+
+    with span("marble.colorize"):
+        result = _colorize_marble(spec, xs, ys, warped_noise, vein_freq, detail_noise)
+
+    # Apply subtle blur
+    with span("marble.blur"):
+        marble_image = Image.fromarray(result, "RGBA").filter(
+            ImageFilter.GaussianBlur(radius=MARBLE_BLUR_RADIUS)
+        )
+        result = np.array(marble_image)
+
+    # Add subtle surface variation and dithering
+    with span("marble.surface"):
+        surface_noise = sample_perlin_noise(spec["surface"], padded)
+        dither_noise = hash_noise(spec["dither_seed"], xs, ys) * 3 - 1.5
+        detail = np.trunc((surface_noise - 0.5) * 6 + dither_noise).astype(np.int16)
+        result[..., :3] = np.clip(result[..., :3] + detail[..., None], 0, 255)
+
+    return crop_padded(result, padded, canvas_box)
 
-    # Create direction vectors from noise
-    direction_field = np.zeros((new_height, new_width, 2))
-    for y in range(new_height):
-        for x in range(new_width):
-            angle = (direction_noise_x[y, x] + direction_noise_y[y, x]) * math.pi
-            direction_field[y, x] = [math.cos(angle), math.sin(angle)]
 
-    # Generate base Perlin noise textures
-    base_noise = generate_perlin_noise(new_width, new_height, scale, octaves)
-    vein_width_noise = generate_perlin_noise(new_width, new_height, scale * 2, 2)
-    detail_noise = generate_perlin_noise(new_width, new_height, scale * 4, 3)
+def _colorize_marble(spec, xs, ys, warped_noise, vein_freq, detail_noise):
+    """Map the warped marble noise to colors, as an RGBA uint8 array."""
+    colors = spec["colors"]
 
     # Create marble texture
-    marble_texture = np.zeros((new_height, new_width))
-    for y in range(new_height):
-        for x in range(new_width):
-            dx, dy = direction_field[y, x]
-            distortion = turbulence * base_noise[y, x]
-            sample_x = x + dx * distortion
-            sample_y = y + dy * distortion
-            wrapped_x = int(sample_x) % new_width
-            wrapped_y = int(sample_y) % new_height
-            vein_freq = 1.0 + vein_width_noise[y, x] * 0.5
-            value = math.sin(
-                ((x + y * 0.5) / vein_scale + base_noise[wrapped_y, wrapped_x] * 2)
-                * vein_freq
-            )
-            marble_texture[y, x] = (value * 0.7 + 0.7 + detail_noise[y, x] * 0.3) * 0.5
+    value = np.sin(((xs + ys * 0.5) / spec["vein_scale"] + warped_noise * 2) * vein_freq)
+    marble_texture = (value * 0.7 + 0.7 + detail_noise * 0.3) * 0.5
 
     # Normalize contrast
-    marble_texture = np.clip(marble_texture, 0, 1)
+    t = np.power(np.clip(marble_texture, 0, 1), 1.2)
 
     # Create the background RGBA array
-    result = np.zeros((new_height, new_width, 4), dtype=np.uint8)
-    for y in range(new_height):
-        for x in range(new_width):
-            t = math.pow(marble_texture[y, x], 1.2)
-            if len(colors) == 2:
-                r = int(colors[0][0] * (1 - t) + colors[1][0] * t)
-                g = int(colors[0][1] * (1 - t) + colors[1][1] * t)
-                b = int(colors[0][2] * (1 - t) + colors[1][2] * t)
-            else:
-                idx = min(int(t * (len(colors) - 1) * 0.9999), len(colors) - 2)
-                blend = (t * (len(colors) - 1)) - idx
-                blend += (detail_noise[y, x] - 0.5) * 0.1
-                blend = max(0, min(1, blend))
-                c1 = colors[idx]
-                c2 = colors[idx + 1]
-                r = int(c1[0] * (1 - blend) + c2[0] * blend)
-                g = int(c1[1] * (1 - blend) + c2[1] * blend)
-                b = int(c1[2] * (1 - blend) + c2[2] * blend)
-            result[y, x] = [r, g, b, 255]
-
-    # Convert to PIL Image
-    marble_image = Image.fromarray(result, "RGBA")
+    if len(colors) == 2:
+        result = lerp_colors(colors[0], colors[1], t)
+    else:
+        palette = np.array(colors, dtype=np.float64)
+        idx = np.minimum((t * (len(colors) - 1) * 0.9999).astype(np.intp), len(colors) - 2)
+        blend = (t * (len(colors) - 1)) - idx
+        blend += (detail_noise - 0.5) * 0.1
+        blend = np.clip(blend, 0, 1)[..., None]
+        result = np.empty(t.shape + (4,), dtype=np.uint8)
+        result[..., :3] = palette[idx] * (1 - blend) + palette[idx + 1] * blend
+        result[..., 3] = 255
+    return result
 
-    # Apply subtle blur
-    marble_image = marble_image.filter(ImageFilter.GaussianBlur(radius=1.2))
 
-    # Add subtle surface variation and dithering
-    surface_noise = generate_perlin_noise(new_width, new_height, scale * 8, 2)
-    dither_noise = np.random.rand(new_height, new_width) * 3 - 1.5
-    for y in range(new_height):
-        for x in range(new_width):
-            r, g, b, a = marble_image.getpixel((x, y))
-            detail = int((surface_noise[y, x] - 0.5) * 6 + dither_noise[y, x])
-            r = max(0, min(255, r + detail))
-            g = max(0, min(255, g + detail))
-            b = max(0, min(255, b + detail))
-            marble_image.putpixel((x, y), (r, g, b, a))
-
-    # Crop the bottom-right section to avoid heavy banding artifacts
-    # Reduce vein_scale or expansion factor if desired.
-    left = new_width - width
-    top = new_height - height
-    marble_image = marble_image.crop((left, top, left + width, top + height))
+def apply_marble_texture_background(
+    image, colors, turbulence=5.0, scale=0.05, octaves=5, vein_scale=25.0, rng=None
+):
+    """
+    Creates a realistic marble texture using Perlin noise with non-linear
+    transformations.
+
+    Args:
+        image: PIL Image with transparency
+        colors: List of RGB colors for marble veins (can be more than two)
+        turbulence: Amount of turbulence in the marble pattern
+        scale: Base scale for the noise (lower = larger features)
+        octaves: Number of noise layers to combine
+        vein_scale: Scale factor for vein width variation
+        rng: Random source of the noise (None for np.random)
+
+    Returns:
+        PIL.Image: Image with applied realistic marble texture background.
+    """
+    width, height = image.size
+    spec = plan_marble(
+        image.size, colors, turbulence, scale, octaves, vein_scale, rng=rng
+    )
+    marble_image = Image.fromarray(render_marble(spec, (0, 0, width, height)))
 
     # Blend with the original image
-    marble_image.paste(image, (0, 0), image)
+    return compose_images(marble_image, image)
 
-    return marble_image
 
+def plan_cloud(size, colors, scale=0.5, octaves=4, seed=None, rng=None):
+    """
+    Plan a light cloud-like texture using Perlin noise with multiple octaves.
+
+    Args:
+        size (tuple): (width, height) of the background
+        colors: Tuple of two RGB colors for the cloud texture.
+        scale: Base scale of the noise.
+        octaves: Number of noise layers combined.
+        seed: Random seed for noise generation (optional).
+        rng (optional): Random source of the noise (None for np.random)
 
-def apply_cloud_background(image, colors, scale=0.5, octaves=4, seed=None):
+    Returns:
+        dict: Background spec for render_cloud
+    """
+    width, height = size
+    return {
+        "mode": "cloud",
+        "size": size,
+        "opaque": True,
+        "colors": [tuple(c) for c in colors[:2]],
+        # Apply stronger blur for larger images
+        "blur_radius": 2.0 if max(width, height) > 512 else 1.5,
+        "noise": generate_perlin_lattices(width, height, scale, octaves, seed, rng),
+    }
+
+
+def render_cloud(spec, box):
+    """Render a (left, top, right, bottom) region of a cloud background."""
+    blur_radius = spec["blur_radius"]
+    padded = pad_box(box, blur_margin(blur_radius), spec["size"])
+    with span("cloud.noise"):
+        noise_map = sample_perlin_noise(spec["noise"], padded)
+
+    # Apply cloud-like transform
+    # t = noise_map ** 1.5  # less contrast
+    t = np.clip(noise_map**2.2, 0, 1)  # more contrast
+
+    background = Image.fromarray(lerp_colors(spec["colors"][0], spec["colors"][1], t))
+    with span("cloud.blur"):
+        background = background.filter(ImageFilter.GaussianBlur(radius=blur_radius))
+    return crop_padded(np.array(background), padded, box)
+
+
+def apply_cloud_background(image, colors, scale=0.5, octaves=4, seed=None, rng=None):
     """
     Creates a light cloud-like texture using Perlin noise with multiple octaves.
 
@@ -271,34 +495,14 @@ def apply_cloud_background(image, colors, scale=0.5, octaves=4, seed=None):
         scale: Base scale of the noise.
         octaves: Number of noise layers combined.
         seed: Random seed for noise generation (optional).
+        rng: Random source of the noise (None for np.random)
 
     Returns:
         PIL.Image: Image with an applied cloud-like texture background.
     """
     width, height = image.size
-    background = Image.new("RGBA", (width, height))
-    pixels = background.load()
-
-    # Generate Perlin noise
-    noise_map = generate_perlin_noise(width, height, scale, octaves, seed)
-
-    for y in range(height):
-        for x in range(width):
-            # Apply cloud-like transform
-            # t = noise_map[y, x] ** 1.5  # less contrast
-            t = np.clip(noise_map[y, x] ** 2.2, 0, 1)  # more contrast
-
-            # Interpolate between colors
-            r = int(colors[0][0] * (1 - t) + colors[1][0] * t)
-            g = int(colors[0][1] * (1 - t) + colors[1][1] * t)
-            b = int(colors[0][2] * (1 - t) + colors[1][2] * t)
-
-            pixels[x, y] = (r, g, b, 255)
-
-    # Apply stronger blur for larger images
-    blur_radius = 2.0 if max(width, height) > 512 else 1.5
-    background = background.filter(ImageFilter.GaussianBlur(radius=blur_radius))
+    spec = plan_cloud(image.size, colors, scale, octaves, seed, rng=rng)
+    background = Image.fromarray(render_cloud(spec, (0, 0, width, height)))
 
     # Paste original image with transparency
-    background.paste(image, (0, 0), image)
-    return background
+    return compose_images(background, image)
@@ -1,6 +1,80 @@
 # src/rbgen/backgrounds/utils.py
+import math
+import random
 import numpy as np
-from scipy.interpolate import RegularGridInterpolator
+from PIL import Image, ImageDraw
+
+
+class ImageRandom(random.Random):
+    """
+    Random streams for one background.
+
+    A random.Random for Python-level choices, carrying a NumPy
+    RandomState as `numpy` for modes that draw arrays. Seeded from one
+    integer, it draws exactly what the global states would after
+    random.seed(seed) and np.random.seed(numpy_seed), without touching
+    them, so backgrounds can be planned concurrently in threads.
+    """
+
+    def __init__(self, seed, numpy_seed=None):
+        """
+        Args:
+            seed (int): Seed of the Python stream
+            numpy_seed (optional): Seed of the NumPy stream (default: the
+                low and high 32 bits of seed)
+        """
+        super().__init__(seed)
+        if numpy_seed is None:
+            numpy_seed = [seed & 0xFFFFFFFF, seed >> 32]
+        self.numpy = np.random.RandomState(numpy_seed)
+
+
+def python_rng(rng):
+    """
+    Return the source of a mode's Python-level random draws.
+
+    Args:
+        rng: random.Random, NumPy generator, or None for the global
+            `random` state
+
+    Returns:
+        Object with the random.Random API (possibly the random module)
+    """
+    if rng is None:
+        return random
+    if isinstance(rng, random.Random):
+        return rng
+    return random.Random(int(randint_below(rng, 2**63)))
+
+
+def numpy_rng(rng):
+    """
+    Return the source of a mode's NumPy random draws.
+
+    Args:
+        rng: NumPy Generator or RandomState, random.Random (its `numpy`
+            stream if it is an ImageRandom), or None for the global
+            np.random state
+
+    Returns:
+        Object with a random(size) method
+    """
+    if rng is None:
+        return np.random
+    if isinstance(rng, random.Random):
+        numpy = getattr(rng, "numpy", None)
+        if numpy is None:
+            numpy = np.random.default_rng(rng.getrandbits(64))
+        return numpy
+    return rng
+
+
+def randint_below(np_rng, high):
+    """Draw an integer in [0, high) from a NumPy Generator or RandomState."""
+    integers = getattr(np_rng, "integers", None)
+    if integers is None:
+        return np_rng.randint(0, high)
+    return integers(0, high)
 
 
 def find_perspective_coeffs(src, dst):
@@ -52,42 +126,299 @@ def compose_images(background, foreground):
     """
     if background.size != foreground.size:
         background = background.resize(foreground.size)
+    if background.mode != "RGBA":
+        background = background.convert("RGBA")
+    if foreground.mode != "RGBA":
+        foreground = foreground.convert("RGBA")
+
+    # Alpha compositing (rather than a masked paste, which also blends the
+    # alpha channel) keeps the result opaque wherever the background is
+    return Image.alpha_composite(background, foreground)
+
+
+class PreparedForeground:
+    """
+    A foreground converted once for compositing onto several backgrounds.
+
+    The bounding box of its visible pixels is found up front; only that
+    part of each background is blended, the rest is copied as is. Results
+    are identical to compose_images.
+    """
+
+    def __init__(self, image):
+        """
+        Args:
+            image (PIL.Image): Foreground with transparency
+        """
+        self.image = image if image.mode == "RGBA" else image.convert("RGBA")
+        self.size = self.image.size
+        self.box = self.image.getchannel("A").getbbox()
+        full = (0, 0) + self.size
+        self._cutout = None
+        if self.box is not None and self.box != full:
+            self._cutout = self.image.crop(self.box)
+
+    def composite(self, background):
+        """
+        Composite the foreground over a background.
+
+        Args:
+            background (PIL.Image): Background of any mode and size
+
+        Returns:
+            PIL.Image: RGBA result
+        """
+        if background.size != self.size:
+            background = background.resize(self.size)
+        if background.mode != "RGBA":
+            background = background.convert("RGBA")
+        if self.box is None:
+            return background.copy()
+        if self._cutout is None:
+            return Image.alpha_composite(background, self.image)
+        result = background.copy()
+        blended = Image.alpha_composite(background.crop(self.box), self._cutout)
+        result.paste(blended, self.box[:2])
+        return result
+
+
+def region_size(box):
+    """Return the (width, height) of a (left, top, right, bottom) box."""
+    return box[2] - box[0], box[3] - box[1]
+
+
+def pad_box(box, margin, size):
+    """
+    Grow a box by a margin on every side, clipped to the image bounds.
+
+    Region renderers that filter their output (blur, resampling) render
+    the padded box and crop it back, so tiles join without seams.
+
+    Args:
+        box (tuple): (left, top, right, bottom) region
+        margin (int): Padding in pixels
+        size (tuple): (width, height) of the full background
 
-    result = background.copy()
-    result.paste(foreground, (0, 0), foreground)
+    Returns:
+        tuple: Padded (left, top, right, bottom) box
+    """
+    return (
+        max(0, box[0] - margin),
+        max(0, box[1] - margin),
+        min(size[0], box[2] + margin),
+        min(size[1], box[3] + margin),
+    )
+
+
+def full_width(box, size):
+    """
+    Return the full-width box spanning the rows of a region.
+
+    Pillow rasterizes the edges of polygons and wide lines slightly
+    differently depending on where the canvas cuts them off on the left
+    and right, so renderers drawing those render whole rows and crop.
+    """
+    return (0, box[1], size[0], box[3])
+
+
+def crop_padded(array, padded, box):
+    """Crop an array rendered for a padded box back to the requested box."""
+    left = box[0] - padded[0]
+    top = box[1] - padded[1]
+    return array[top : top + box[3] - box[1], left : left + box[2] - box[0]]
+
+
+def blur_margin(radius):
+    """Padding needed so that a Gaussian blur does not see a tile edge."""
+    return int(math.ceil(radius * 4)) + 2
+
+
+def new_region(box, color=(0, 0, 0, 0)):
+    """Create an RGBA array for a box, filled with a single color."""
+    width, height = region_size(box)
+    region = np.empty((height, width, 4), dtype=np.uint8)
+    region[...] = color
+    return region
+
+
+def lerp_colors(c1, c2, t):
+    """
+    Blend two colors over an array of factors, like interpolate_color.
+
+    Args:
+        c1 (tuple): First RGB color tuple
+        c2 (tuple): Second RGB color tuple
+        t (np.array): Interpolation factors (0.0 to 1.0)
+
+    Returns:
+        np.array: uint8 RGBA array with shape t.shape + (4,)
+    """
+    t = np.asarray(t, dtype=np.float64)[..., None]
+    c1 = np.asarray(c1[:3], dtype=np.float64)
+    c2 = np.asarray(c2[:3], dtype=np.float64)
+    result = np.empty(t.shape[:-1] + (4,), dtype=np.uint8)
+    result[..., :3] = c1 * (1 - t) + c2 * t
+    result[..., 3] = 255
     return result
 
 
-def generate_perlin_noise(width, height, scale, octaves, seed=None):
+def lerp_colors_batch(firsts, seconds, t):
     """
-    Generate Perlin noise with a specified seed for reproducibility.
-    Lacks an implementation of persistence and lacunarity.
+    Blend a batch of color pairs, like lerp_colors for each pair.
 
     Args:
-        width: Width of the output noise array
-        height: Height of the output noise array
+        firsts (list): First RGB color of each of B pairs
+        seconds (list): Second RGB color of each pair
+        t (np.array): Interpolation factors with a leading axis of size B,
+            or 1 to share them across the batch
+
+    Returns:
+        np.array: uint8 RGBA array with shape (B,) + t.shape[1:] + (4,)
+    """
+    t = np.asarray(t, dtype=np.float64)[..., None]
+    shape = (len(firsts),) + (1,) * (t.ndim - 2) + (3,)
+    c1 = np.asarray([c[:3] for c in firsts], dtype=np.float64).reshape(shape)
+    c2 = np.asarray([c[:3] for c in seconds], dtype=np.float64).reshape(shape)
+    result = np.empty((len(firsts),) + t.shape[1:-1] + (4,), dtype=np.uint8)
+    result[..., :3] = c1 * (1 - t) + c2 * t
+    result[..., 3] = 255
+    return result
+
+
+def subpixel_offsets(samples):
+    """Return the sample offsets inside a pixel for samples x samples supersampling."""
+    return [(i + 0.5) / samples for i in range(samples)]
+
+
+def rotated_pattern_coverage(box, size, angle, canvas_size, inside, samples=3):
+    """
+    Supersampled coverage of a pattern canvas rotated about the image center.
+
+    Equivalent to drawing the pattern on a square canvas, rotating it by
+    `angle` degrees and cropping the center, without allocating either
+    canvas.
+
+    Args:
+        box (tuple): (left, top, right, bottom) region
+        size (tuple): (width, height) of the full background
+        angle (float): Rotation in degrees (counter-clockwise, as Image.rotate)
+        canvas_size (int): Side of the square pattern canvas
+        inside (callable): Maps canvas coordinate arrays (u, v) to a
+            boolean array that is True where the pattern is drawn
+        samples (int): Samples per pixel along each axis
+
+    Returns:
+        np.array: float32 coverage in the 0-1 range for each pixel
+    """
+    width, height = size
+    left, top, right, bottom = box
+    theta = -math.radians(angle)
+    cos_a, sin_a = math.cos(theta), math.sin(theta)
+
+    coverage = np.zeros((bottom - top, right - left), dtype=np.float32)
+    for oy in subpixel_offsets(samples):
+        dy = np.arange(top, bottom, dtype=np.float64)[:, None] + (oy - height / 2)
+        for ox in subpixel_offsets(samples):
+            dx = np.arange(left, right, dtype=np.float64)[None, :] + (ox - width / 2)
+            u = cos_a * dx + sin_a * dy + canvas_size / 2
+            v = -sin_a * dx + cos_a * dy + canvas_size / 2
+            coverage += inside(u, v)
+    return coverage / (samples * samples)
+
+
+def draw_region(box, fill, scale=1):
+    """
+    Create a PIL canvas for a region of a drawn background.
+
+    Shapes are planned in full-image coordinates; drawing them through
+    the returned offset places them correctly inside the region.
+
+    Args:
+        box (tuple): (left, top, right, bottom) region
+        fill (tuple): RGBA fill color
+        scale (int): Supersampling factor of the canvas
+
+    Returns:
+        tuple: (image, draw, offset) where offset is subtracted from
+            (scaled) full-image coordinates
+    """
+    width, height = region_size(box)
+    canvas = Image.new("RGBA", (width * scale, height * scale), fill)
+    return canvas, ImageDraw.Draw(canvas), (box[0] * scale, box[1] * scale)
+
+
+def shift_points(points, offset):
+    """
+    Translate a list of (x, y) points by minus an integer offset.
+
+    ImageDraw truncates coordinates toward zero, which is not translation
+    invariant for shapes crossing the image edge. Flooring first makes a
+    region render match the same pixels of the full image.
+    """
+    ox, oy = offset
+    return [(math.floor(x) - ox, math.floor(y) - oy) for x, y in points]
+
+
+def hash_noise(seed, xs, ys):
+    """
+    Position-based uniform noise in [0, 1).
+
+    Unlike np.random.rand, the value of a pixel only depends on the seed
+    and its coordinates, so any region can be rendered on its own.
+
+    Args:
+        seed (int): Noise seed
+        xs (np.array): Column coordinates (broadcast against ys)
+        ys (np.array): Row coordinates
+
+    Returns:
+        np.array: float64 noise array
+    """
+    with np.errstate(over="ignore"):
+        z = (
+            np.asarray(ys, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+            + np.asarray(xs, dtype=np.uint64) * np.uint64(0xC2B2AE3D27D4EB4F)
+            + np.uint64(seed & 0xFFFFFFFFFFFFFFFF)
+        )
+        # splitmix64 finalizer
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        z = z ^ (z >> np.uint64(31))
+    return (z >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+
+MAX_GRID_SIZE = 2048  # Prevent extreme memory usage
+
+
+def generate_perlin_lattices(width, height, scale, octaves, seed=None, rng=None):
+    """
+    Generate the random lattices behind a Perlin noise field.
+
+    The lattices fully determine the noise, so any region of it can be
+    sampled later with sample_perlin_noise.
+
+    Args:
+        width: Width of the noise field
+        height: Height of the noise field
         scale: Base scale factor for the noise
         octaves: Number of noise layers to combine
-        seed: Random seed for reproducibility.
-            Default: None, which uses a random seed
+        seed: Random seed for a fixed lattice, independent of rng.
+            Default: None, which draws from rng
+        rng: Random source, as for numpy_rng (None for the global
+            NumPy random state)
 
     Returns:
-        np.array: 2D array of Perlin noise values normalized to 0-1 range
+        dict: Noise description with the field size and the
+            (grid, amplitude) pair for each octave
     """
-    MAX_GRID_SIZE = 2048  # Prevent extreme memory usage
+    random_state = np.random.RandomState(seed) if seed is not None else numpy_rng(rng)
 
-    # Set the random seed if provided
-    if seed is not None:
-        np.random.seed(seed)
-
-    noise = np.zeros((height, width), dtype=np.float32)
     # Parameters for different noise frequencies
     persistence = 0.5
     amplitude = 1.0
     frequency = scale
-    max_value = 0
 
-    # Generate multiple noise octaves and combine them
+    layers = []
     for i in range(octaves):
         if i > 0:
             frequency *= 2
@@ -98,33 +429,113 @@ def generate_perlin_noise(width, height, scale, octaves, seed=None):
         grid_height = min(int(height * frequency) + 2, MAX_GRID_SIZE)
 
         # Random gradients grid
-        grid = np.random.rand(grid_height, grid_width) * 2 - 1
-
-        # Create interpolator
-        y_coords = np.linspace(0, grid_height - 1, grid_height)
-        x_coords = np.linspace(0, grid_width - 1, grid_width)
-        interpolator = RegularGridInterpolator(
-            (y_coords, x_coords),
-            grid,
-            method="linear",
-            bounds_error=False,
-            fill_value=None,
-        )
+        grid = random_state.random((grid_height, grid_width)) * 2 - 1
+        layers.append((grid, amplitude))
+
+    return {"size": (width, height), "layers": layers}
+
+
+def _lattice_coords(grid_size, size, start, stop):
+    """Lattice coordinates of pixels start..stop, as np.linspace(0, grid_size - 1, size)."""
+    if size == 1:
+        return np.zeros(stop - start)
+    coords = np.arange(start, stop) * ((grid_size - 1) / (size - 1))
+    if stop == size:
+        coords[-1] = grid_size - 1
+    return coords
 
-        # Sample at pixel locations
-        y_sample = np.linspace(0, grid_height - 1, height)
-        x_sample = np.linspace(0, grid_width - 1, width)
-        pts = np.array(np.meshgrid(y_sample, x_sample, indexing="ij")).T.reshape(-1, 2)
-        noise_layer = interpolator(pts).reshape(height, width)
+
+def _split_coords(coords, grid_size):
+    """Split lattice coordinates into cell indices and fractional weights."""
+    index = np.minimum(np.floor(coords).astype(np.intp), grid_size - 2)
+    return index, coords - index
+
+
+def _normalize_noise(noise, noise_spec):
+    max_value = sum(amplitude for _, amplitude in noise_spec["layers"])
+    noise = (noise + max_value) / (max_value * 2)
+    return np.clip(noise, 0, 1)
+
+
+def sample_perlin_noise(noise_spec, box):
+    """
+    Sample a rectangular region of a Perlin noise field.
+
+    Args:
+        noise_spec (dict): Noise from generate_perlin_lattices
+        box (tuple): (left, top, right, bottom) region in pixels
+
+    Returns:
+        np.array: 2D float32 array of noise values in the 0-1 range
+    """
+    width, height = noise_spec["size"]
+    left, top, right, bottom = box
+    noise = np.zeros((bottom - top, right - left), dtype=np.float32)
+
+    for grid, amplitude in noise_spec["layers"]:
+        grid_height, grid_width = grid.shape
+        y0, fy = _split_coords(_lattice_coords(grid_height, height, top, bottom), grid_height)
+        x0, fx = _split_coords(_lattice_coords(grid_width, width, left, right), grid_width)
+
+        # Bilinear interpolation, first along x for the lattice rows in use
+        row_start, row_stop = y0.min(), y0.max() + 2
+        rows = grid[row_start:row_stop]
+        rows = rows[:, x0] * (1 - fx) + rows[:, x0 + 1] * fx
+        y0 = y0 - row_start
+        noise_layer = rows[y0] * (1 - fy)[:, None] + rows[y0 + 1] * fy[:, None]
 
         # Add this octave to the total noise
         noise += noise_layer * amplitude
-        max_value += amplitude
 
-    # Reset the random seed if it was set
-    if seed is not None:
-        np.random.seed(None)
+    return _normalize_noise(noise, noise_spec)
 
-    # Normalize noise to 0-1 range
-    noise = (noise + max_value) / (max_value * 2)
-    return np.clip(noise, 0, 1)
\ No newline at end of file
+
+def sample_perlin_points(noise_spec, xs, ys):
+    """
+    Sample a Perlin noise field at arbitrary integer pixel positions.
+
+    Args:
+        noise_spec (dict): Noise from generate_perlin_lattices
+        xs (np.array): Column of each point
+        ys (np.array): Row of each point (same shape as xs)
+
+    Returns:
+        np.array: float32 array of noise values in the 0-1 range
+    """
+    width, height = noise_spec["size"]
+    noise = np.zeros(np.shape(xs), dtype=np.float32)
+
+    for grid, amplitude in noise_spec["layers"]:
+        grid_height, grid_width = grid.shape
+        y_scale = (grid_height - 1) / (height - 1) if height > 1 else 0.0
+        x_scale = (grid_width - 1) / (width - 1) if width > 1 else 0.0
+        y0, fy = _split_coords(ys * y_scale, grid_height)
+        x0, fx = _split_coords(xs * x_scale, grid_width)
+        noise_layer = (grid[y0, x0] * (1 - fx) + grid[y0, x0 + 1] * fx) * (1 - fy) + (
+            grid[y0 + 1, x0] * (1 - fx) + grid[y0 + 1, x0 + 1] * fx
+        ) * fy
+        noise += noise_layer * amplitude
+
+    return _normalize_noise(noise, noise_spec)
+
+
+def generate_perlin_noise(width, height, scale, octaves, seed=None, rng=None):
+    """
+    Generate Perlin noise with a specified seed for reproducibility.
+    Lacks an implementation of persistence and lacunarity.
+
+    Args:
+        width: Width of the output noise array
+        height: Height of the output noise array
+        scale: Base scale factor for the noise
+        octaves: Number of noise layers to combine
+        seed: Random seed for reproducibility.
+            Default: None, which draws from rng
+        rng: Random source, as for numpy_rng (None for the global
+            NumPy random state)
+
+    Returns:
+        np.array: 2D array of Perlin noise values normalized to 0-1 range
+    """
+    noise_spec = generate_perlin_lattices(width, height, scale, octaves, seed, rng)
+    return sample_perlin_noise(noise_spec, (0, 0, width, height))
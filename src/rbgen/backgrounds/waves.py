@@ -1,34 +1,48 @@
 # src/rbgen/backgrounds/waves.py
-import random
 import math
-from PIL import Image, ImageDraw
-from rbgen.backgrounds.utils import interpolate_color, compose_images
-
-
-def apply_waves_background(
-    image,
+import numpy as np
+from PIL import Image
+from rbgen.backgrounds.utils import (
+    interpolate_color,
+    compose_images,
+    crop_padded,
+    draw_region,
+    full_width,
+    python_rng,
+    shift_points,
+)
+
+
+def plan_waves(
+    size,
     colors,
     num_waves=10,
     wave_height_range=(10, 50),
     wave_types=None,
     direction="horizontal",
+    rng=None,
 ):
     """
-    Generates a background with wave patterns.
+    Plan a background with wave patterns.
+
+    The waves are laid out on a canvas 15% larger on each side to help
+    avoid edge artifacts; only its center is ever rendered.
 
     Args:
-        image (PIL.Image): Base image to overlay the background.
+        size (tuple): (width, height) of the background
         colors (list): List of two colors to interpolate.
         num_waves (int): Number of wave layers to generate.
         wave_height_range (tuple): Range for wave height (min, max).
         wave_types (list, optional): List of wave types to use.
             Defaults to ["sine", "triangle", "ripple"].
         direction (str): Direction of waves - "horizontal" or "vertical".
+        rng (optional): Random source (None for the global random state)
 
     Returns:
-        PIL.Image: Image with wave background.
+        dict: Background spec for render_waves
     """
-    width, height = image.size
+    rng = python_rng(rng)
+    width, height = size
 
     # Increase background size by 15% to help avoid edge artifacts
     extra_margin_w = int(0.15 * width)
@@ -37,11 +51,7 @@ def apply_waves_background(
     expanded_height = height + 2 * extra_margin_h
 
     # Randomly pick background color
-    base_color = random.choice(colors) + (255,)  # Ensure full opacity
-
-    # Create a larger background filled with the base color
-    background = Image.new("RGBA", (expanded_width, expanded_height), base_color)
-    draw = ImageDraw.Draw(background)
+    base_color = tuple(rng.choice(colors)) + (255,)  # Ensure full opacity
 
     if wave_types is None:
         wave_types = ["sine", "triangle", "ripple"]
@@ -52,16 +62,18 @@ def apply_waves_background(
     thickness = expanded_height if is_horizontal else expanded_width
 
     # Create multiple wave layers
+    polygons = []
+    layers = []
     for layer in range(num_waves):
         # Randomize wave parameters
-        wave_type = random.choice(wave_types)
-        wave_height = random.uniform(*wave_height_range)
-        frequency = random.uniform(1, 5) / span  # Waves per pixel
-        phase = random.uniform(0, 2 * math.pi)  # Random starting phase
+        wave_type = rng.choice(wave_types)
+        wave_height = rng.uniform(*wave_height_range)
+        frequency = rng.uniform(1, 5) / span  # Waves per pixel
+        phase = rng.uniform(0, 2 * math.pi)  # Random starting phase
 
         # Layer position - distribute evenly but with some randomness
         layer_position = thickness * (layer / num_waves) + (
-            random.uniform(-thickness / num_waves / 4, thickness / num_waves / 4)
+            rng.uniform(-thickness / num_waves / 4, thickness / num_waves / 4)
         )
 
         # Color based on layer position
@@ -102,17 +114,79 @@ def apply_waves_background(
             points.append((thickness, span))
             points.append((thickness, 0))
 
+        polygons.append((points, color))
+        layers.append((wave_type, wave_height, frequency, phase, layer_position, color))
+
+    return {
+        "mode": "waves",
+        "size": size,
+        "opaque": True,
+        "base_color": base_color,
+        "margin": (extra_margin_w, extra_margin_h),
+        "polygons": polygons,
+        # Wave parameters of each polygon, from which animation.py
+        # recomputes the curves for other phases
+        "horizontal": is_horizontal,
+        "layers": layers,
+    }
+
+
+def render_waves(spec, box):
+    """Render a (left, top, right, bottom) region of a waves background."""
+    # Polygons are drawn across whole rows (see full_width), placed on
+    # the expanded canvas
+    rows = full_width(box, spec["size"])
+    margin_x, margin_y = spec["margin"]
+    canvas_box = (
+        rows[0] + margin_x,
+        rows[1] + margin_y,
+        rows[2] + margin_x,
+        rows[3] + margin_y,
+    )
+
+    background, draw, offset = draw_region(canvas_box, spec["base_color"])
+    for points, color in spec["polygons"]:
         # Draw the wave as a filled polygon
-        draw.polygon(points, fill=color, outline=None)
-
-    # Crop back to the original size
-    cropped_background = background.crop(
-        (
-            extra_margin_w,
-            extra_margin_h,
-            extra_margin_w + width,
-            extra_margin_h + height,
-        )
+        draw.polygon(shift_points(points, offset), fill=color, outline=None)
+
+    return crop_padded(np.asarray(background), rows, box)
+
+
+def apply_waves_background(
+    image,
+    colors,
+    num_waves=10,
+    wave_height_range=(10, 50),
+    wave_types=None,
+    direction="horizontal",
+    rng=None,
+):
+    """
+    Generates a background with wave patterns.
+
+    Args:
+        image (PIL.Image): Base image to overlay the background.
+        colors (list): List of two colors to interpolate.
+        num_waves (int): Number of wave layers to generate.
+        wave_height_range (tuple): Range for wave height (min, max).
+        wave_types (list, optional): List of wave types to use.
+            Defaults to ["sine", "triangle", "ripple"].
+        direction (str): Direction of waves - "horizontal" or "vertical".
+        rng (optional): Random source (None for the global random state)
+
+    Returns:
+        PIL.Image: Image with wave background.
+    """
+    width, height = image.size
+    spec = plan_waves(
+        image.size,
+        colors,
+        num_waves,
+        wave_height_range,
+        wave_types,
+        direction,
+        rng=rng,
     )
+    background = Image.fromarray(render_waves(spec, (0, 0, width, height)))
 
-    return compose_images(cropped_background, image)
+    return compose_images(background, image)
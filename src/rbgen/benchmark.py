@@ -0,0 +1,290 @@
+# src/rbgen/benchmark.py
+"""
+Benchmarks for background rendering.
+
+Each case plans one background with a fixed seed and times its render.
+Results record wall time, megapixels per second, peak traced memory and
+a small thumbnail of the render, so a later run can be compared with a
+stored baseline both for speed and for perceptual equivalence.
+"""
+import json
+import platform
+import time
+import tracemalloc
+import numpy as np
+from PIL import Image
+from rbgen.backgrounds.regions import plan_background, render_background
+from rbgen.backgrounds.registry import available_modes
+from rbgen.backgrounds.utils import ImageRandom
+
+# Square sizes every mode is timed at
+BENCH_SIZES = [(256, 256), (512, 512), (1024, 1024), (2048, 2048), (4096, 4096)]
+
+# Key parameters at the ends of their useful range, timed at PARAM_SIZE
+PARAM_EXTREMES = {
+    "mandelbrot": [{"max_iter": 20}, {"max_iter": 500}],
+    "perlin_noise": [{"octaves": 1}, {"octaves": 10}],
+    "cloud": [{"octaves": 1}, {"octaves": 8}],
+    "marble": [{"octaves": 1}, {"octaves": 8}],
+    "geometric_shapes": [{"num_shapes": 5}, {"num_shapes": 500}],
+    "nested_polygons": [{"depth": 1}, {"depth": 5}],
+}
+PARAM_SIZE = (1024, 1024)
+
+# Side of the thumbnail used for perceptual comparison
+THUMBNAIL_SIZE = 32
+
+# A case is a regression when it is this much slower than the baseline
+DEFAULT_THRESHOLD = 0.10
+
+# Largest mean absolute thumbnail difference (0-255 levels) at which two
+# renders still count as perceptually equivalent
+DEFAULT_PERCEPTUAL_THRESHOLD = 2.0
+
+
+def case_name(mode, size, params=None):
+    """Return the name of a case, e.g. "mandelbrot-1024x1024-max_iter=500"."""
+    name = f"{mode}-{size[0]}x{size[1]}"
+    for key, value in sorted((params or {}).items()):
+        name += f"-{key}={value}"
+    return name
+
+
+def bench_cases(modes=None, sizes=None, with_params=True):
+    """
+    List the benchmark cases for a grid of modes, sizes and parameters.
+
+    Args:
+        modes (list, optional): Modes to benchmark (default: all registered)
+        sizes (list, optional): (width, height) sizes (default: BENCH_SIZES)
+        with_params (bool): Also time the PARAM_EXTREMES of each mode
+
+    Returns:
+        list: Case dicts with name, mode, size and params
+    """
+    cases = []
+    for mode in modes or available_modes():
+        for size in sizes or BENCH_SIZES:
+            cases.append(
+                {
+                    "name": case_name(mode, size),
+                    "mode": mode,
+                    "size": size,
+                    "params": {},
+                }
+            )
+        if with_params:
+            for params in PARAM_EXTREMES.get(mode, []):
+                cases.append(
+                    {
+                        "name": case_name(mode, PARAM_SIZE, params),
+                        "mode": mode,
+                        "size": PARAM_SIZE,
+                        "params": params,
+                    }
+                )
+    return cases
+
+
+def plan_case(case, seed=0):
+    """Plan the background of a case with a fixed seed."""
+    from rbgen.color_schemes.color_utils import generate_color_pair
+
+    rng = ImageRandom(seed, numpy_seed=seed)
+    colors = generate_color_pair(rng)
+    return plan_background(
+        case["mode"], case["size"], colors, rng=rng, **case["params"]
+    )
+
+
+def thumbnail(pixels, size=THUMBNAIL_SIZE):
+    """
+    Reduce a render to a small box-filtered RGB thumbnail.
+
+    Args:
+        pixels (np.array): RGBA uint8 render
+        size (int): Side of the (square) thumbnail
+
+    Returns:
+        np.array: float array of shape (size, size, 3)
+    """
+    image = Image.fromarray(np.ascontiguousarray(pixels)).convert("RGB")
+    image = image.resize((size, size), Image.BOX)
+    return np.asarray(image, dtype=np.float64)
+
+
+def perceptual_distance(a, b):
+    """
+    Mean absolute difference of two renders' thumbnails, in 0-255 levels.
+
+    Box filtering first makes the measure insensitive to sub-pixel shifts
+    and anti-aliasing differences, while changes in layout or color
+    still show up.
+
+    Args:
+        a, b: RGBA uint8 renders, or thumbnails as returned by thumbnail()
+
+    Returns:
+        float: Distance (0 for identical images)
+    """
+    if a.shape[-1] == 4:
+        a = thumbnail(a)
+    if b.shape[-1] == 4:
+        b = thumbnail(b)
+    return float(np.abs(np.asarray(a) - np.asarray(b)).mean())
+
+
+def run_case(case, repeat=3, seed=0, measure_memory=True):
+    """
+    Time one benchmark case.
+
+    Args:
+        case (dict): Case from bench_cases
+        repeat (int): Number of timed renders; the fastest one is reported
+        seed (int): Seed the background is planned with
+        measure_memory (bool): Render once more under tracemalloc to record
+            the peak memory allocated (Pillow's internal buffers are not
+            traced)
+
+    Returns:
+        dict: Result with name, mode, size, params, seconds,
+            megapixels_per_second, peak_bytes and thumbnail
+    """
+    spec = plan_case(case, seed)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        pixels = render_background(spec)
+        times.append(time.perf_counter() - start)
+
+    peak_bytes = None
+    if measure_memory:
+        tracemalloc.start()
+        render_background(spec)
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    seconds = min(times)
+    megapixels = case["size"][0] * case["size"][1] / 1e6
+    return {
+        "name": case["name"],
+        "mode": case["mode"],
+        "size": list(case["size"]),
+        "params": case["params"],
+        "seconds": seconds,
+        "megapixels_per_second": megapixels / seconds if seconds else None,
+        "peak_bytes": peak_bytes,
+        "thumbnail": thumbnail(pixels).round(2).tolist(),
+    }
+
+
+def run_benchmarks(cases, repeat=3, seed=0, measure_memory=True):
+    """
+    Run benchmark cases, printing one line per case.
+
+    Returns:
+        dict: Results document with machine information and the results
+    """
+    results = []
+    for case in cases:
+        result = run_case(case, repeat, seed, measure_memory)
+        peak = result["peak_bytes"]
+        peak_text = f"{peak / 2**20:9.1f} MiB" if peak is not None else ""
+        print(
+            f"{result['name']:<48} {result['seconds'] * 1000:10.2f} ms "
+            f"{result['megapixels_per_second']:9.2f} MP/s {peak_text}"
+        )
+        results.append(result)
+    return {
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "seed": seed,
+        "results": results,
+    }
+
+
+def save_results(results, path):
+    """Save a results document as JSON."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=1)
+
+
+def load_results(path):
+    """Load a results document saved with save_results()."""
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_thumbnails(results, path):
+    """
+    Save the thumbnails of a results document as reference renders.
+
+    Thumbnails are stored rounded to uint8 in a compressed .npz keyed by
+    case name, small enough to commit next to a benchmark suite.
+    """
+    np.savez_compressed(
+        path,
+        **{
+            result["name"]: np.asarray(result["thumbnail"]).round().astype(np.uint8)
+            for result in results["results"]
+        },
+    )
+
+
+def load_thumbnails(path):
+    """
+    Load reference thumbnails saved with save_thumbnails().
+
+    Returns:
+        dict: float thumbnail (see thumbnail()) by case name
+    """
+    with np.load(path) as references:
+        return {name: references[name].astype(np.float64) for name in references}
+
+
+def compare_results(
+    current,
+    baseline,
+    threshold=DEFAULT_THRESHOLD,
+    perceptual_threshold=DEFAULT_PERCEPTUAL_THRESHOLD,
+):
+    """
+    Compare benchmark results with a baseline.
+
+    Cases missing from either side are ignored.
+
+    Args:
+        current (dict): Results document of this run
+        baseline (dict): Results document to compare against
+        threshold (float): Allowed relative slowdown (0.1 = 10%)
+        perceptual_threshold (float): Allowed perceptual distance
+
+    Returns:
+        tuple: (regressions, mismatches), lists of dicts describing the
+            cases that got slower and those that no longer look the same
+    """
+    previous = {result["name"]: result for result in baseline["results"]}
+    regressions = []
+    mismatches = []
+    for result in current["results"]:
+        old = previous.get(result["name"])
+        if old is None:
+            continue
+        ratio = result["seconds"] / old["seconds"] if old["seconds"] else 1.0
+        if ratio > 1 + threshold:
+            regressions.append(
+                {
+                    "name": result["name"],
+                    "baseline_seconds": old["seconds"],
+                    "seconds": result["seconds"],
+                    "ratio": ratio,
+                }
+            )
+        distance = perceptual_distance(
+            np.asarray(result["thumbnail"]), np.asarray(old["thumbnail"])
+        )
+        if distance > perceptual_threshold:
+            mismatches.append({"name": result["name"], "distance": distance})
+    return regressions, mismatches
@@ -1,4 +1,5 @@
 # src/rbgen/color_schemes/__init__.py
+import importlib
 from rbgen.color_schemes.color_utils import (
     get_complementary,
     get_analogous,
@@ -23,8 +24,24 @@ __all__ = [
     "get_split_complementary",
     "get_tetradic",
     "generate_color_pair",
+    "generate_color_pairs",
+    "AliasSampler",
     # Predefined palettes and themes
     "BASE_COLOR_OPTIONS",
     "THEME_COLOR_SCHEMES",
     "get_themed_color_scheme",
 ]
+
+# Names loaded on first access, as their module imports NumPy
+_LAZY_EXPORTS = {
+    "generate_color_pairs": "rbgen.color_schemes.sampling",
+    "AliasSampler": "rbgen.color_schemes.sampling",
+}
+
+
+def __getattr__(name):
+    if name not in _LAZY_EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
@@ -1,9 +1,10 @@
 # src/rbgen/color_schemes/color_utils.py
-import random
 import colorsys
-import numpy as np
 from rbgen.color_schemes.palettes import BASE_COLOR_OPTIONS
 
+# Base palette colors and their weights, unzipped once
+BASE_COLORS, BASE_WEIGHTS = zip(*BASE_COLOR_OPTIONS)
+
 
 def get_complementary(base_color):
     """Generate a complementary color."""
@@ -62,19 +63,28 @@ def get_tetradic(base_color):
     return (int(rgb1[0] * 255), int(rgb1[1] * 255), int(rgb1[2] * 255))
 
 
-def generate_color_pair():
+def generate_color_pair(rng=None):
     """Generate a pair of colors using various color theory strategies.
 
     The function occasionally swaps the colors for variation.
 
+    Args:
+        rng (optional): random.Random, NumPy Generator or RandomState
+            (None for the global random state)
+
     Returns:
         list: A list containing two RGB color tuples.
+
+    See generate_color_pairs (rbgen.color_schemes.sampling) for drawing
+    many pairs at once.
     """
-    # Extract colors and weights
-    base_colors, base_weights = zip(*BASE_COLOR_OPTIONS)
+    from rbgen.backgrounds.utils import python_rng
+
+    rng = python_rng(rng)
+    base_colors, base_weights = BASE_COLORS, BASE_WEIGHTS
 
     # Choose color generation strategy
-    color_strategy = random.choice(
+    color_strategy = rng.choice(
         [
             "base_palette",   # Weight: 3
             "base_palette",
@@ -94,14 +104,14 @@ def generate_color_pair():
     if color_strategy == "base_palette":
         # Sample two different colors from the base palette
         while True:
-            colors = random.sample(
-                random.choices(base_colors, weights=base_weights, k=10), 2
+            colors = rng.sample(
+                rng.choices(base_colors, weights=base_weights, k=10), 2
             )
             if colors[0] != colors[1]:  # Avoid duplicate color pairs
                 break
     else:
         # Use color theory to generate pairs
-        base_color = random.choices(base_colors, weights=base_weights, k=1)[0]
+        base_color = rng.choices(base_colors, weights=base_weights, k=1)[0]
 
         if color_strategy == "complementary":
             colors = [base_color, get_complementary(base_color)]
@@ -111,7 +121,7 @@ def generate_color_pair():
             colors = [base_color, get_triadic(base_color)]
         elif color_strategy == "monochromatic":
             # Randomly choose brighter or darker
-            shift = random.choice([0.2, -0.2])
+            shift = rng.choice([0.2, -0.2])
             colors = [base_color, get_monochromatic(base_color, shift)]
         elif color_strategy == "split_comp":
             colors = [base_color, get_split_complementary(base_color)]
@@ -119,7 +129,7 @@ def generate_color_pair():
             colors = [base_color, get_tetradic(base_color)]
 
         # Occasionally swap the order
-        if random.random() < 0.5:
+        if rng.random() < 0.5:
             colors = colors[::-1]
 
     return colors
@@ -1,5 +1,4 @@
 # src/rbgen/color_schemes/palettes.py
-import random
 
 # Define base colors with assigned weights
 BASE_COLOR_OPTIONS = [
@@ -91,13 +90,23 @@ THEME_COLOR_SCHEMES = {
     ]
 }
 
-def get_themed_color_scheme(theme=None):
-    """Get a color scheme from a specific theme, or random if none specified."""
+def get_themed_color_scheme(theme=None, rng=None):
+    """
+    Get a color scheme from a specific theme, or random if none specified.
+
+    Args:
+        theme (str, optional): Theme name (None picks a random theme)
+        rng (optional): random.Random, NumPy Generator or RandomState
+            (None for the global random state)
+    """
+    from rbgen.backgrounds.utils import python_rng
+
+    rng = python_rng(rng)
     if theme is None:
-        theme = random.choice(list(THEME_COLOR_SCHEMES.keys()))
+        theme = rng.choice(list(THEME_COLOR_SCHEMES.keys()))
         
     if theme not in THEME_COLOR_SCHEMES:
         raise ValueError(f"Unknown theme: {theme}")
         
     # Return a random color pair from the selected theme
-    return random.choice(THEME_COLOR_SCHEMES[theme])
+    return rng.choice(THEME_COLOR_SCHEMES[theme])
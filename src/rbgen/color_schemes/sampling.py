@@ -0,0 +1,184 @@
+# src/rbgen/color_schemes/sampling.py
+"""
+Vectorized color-pair sampling for large batches.
+
+generate_color_pairs draws from the same distribution as
+generate_color_pair, but every derived color (complementary, analogous,
+...) of the base palette is computed once, and strategies and base colors
+are drawn through alias tables, so a batch costs a few NumPy operations
+rather than a Python loop with HSV conversions per pair.
+"""
+from functools import lru_cache
+import numpy as np
+from rbgen.color_schemes.color_utils import (
+    get_analogous,
+    get_complementary,
+    get_monochromatic,
+    get_split_complementary,
+    get_tetradic,
+    get_triadic,
+)
+from rbgen.color_schemes.palettes import BASE_COLOR_OPTIONS, THEME_COLOR_SCHEMES
+
+# Color strategies and their weights, as used by generate_color_pair.
+# "monochromatic" shifts brightness up or down with equal probability, so
+# it is split into its two variants.
+STRATEGY_WEIGHTS = {
+    "base_palette": 3,
+    "complementary": 2,
+    "analogous": 2,
+    "triadic": 1,
+    "monochromatic_up": 1,
+    "monochromatic_down": 1,
+    "split_comp": 1,
+    "tetradic": 1,
+}
+
+# Derived color of each strategy (other than base_palette)
+HARMONIES = {
+    "complementary": get_complementary,
+    "analogous": get_analogous,
+    "triadic": get_triadic,
+    "monochromatic_up": lambda color: get_monochromatic(color, 0.2),
+    "monochromatic_down": lambda color: get_monochromatic(color, -0.2),
+    "split_comp": get_split_complementary,
+    "tetradic": get_tetradic,
+}
+
+
+class AliasSampler:
+    """
+    Walker alias table for drawing indices with given weights in O(1).
+
+    Built once in O(n) with Vose's method; each draw then takes one
+    uniform index and one uniform threshold.
+    """
+
+    def __init__(self, weights):
+        """
+        Build the alias table.
+
+        Args:
+            weights (sequence): Non-negative weights, not all zero
+        """
+        weights = np.asarray(weights, dtype=np.float64)
+        if weights.ndim != 1 or len(weights) == 0:
+            raise ValueError("weights must be a non-empty 1-D sequence")
+        if (weights < 0).any() or weights.sum() <= 0:
+            raise ValueError("weights must be non-negative with a positive sum")
+
+        n = len(weights)
+        scaled = weights * n / weights.sum()
+        self.probability = np.ones(n)
+        self.alias = np.arange(n)
+        small = [i for i in range(n) if scaled[i] < 1]
+        large = [i for i in range(n) if scaled[i] >= 1]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.probability[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= 1 - scaled[less]
+            (small if scaled[more] < 1 else large).append(more)
+        # Whatever is left is 1 up to rounding error
+
+    def __len__(self):
+        return len(self.alias)
+
+    def sample(self, rng, size):
+        """
+        Draw indices.
+
+        Args:
+            rng (np.random.Generator): Random generator
+            size (int or tuple): Shape of the result
+
+        Returns:
+            np.array: int64 indices in range(len(self))
+        """
+        columns = rng.integers(0, len(self.alias), size=size)
+        keep = rng.random(size=size) < self.probability[columns]
+        return np.where(keep, columns, self.alias[columns])
+
+
+@lru_cache(maxsize=None)
+def harmony_tables():
+    """
+    Precompute the base palette and its derived colors.
+
+    Returns:
+        tuple: (base colors as an (n, 3) uint8 array, base color
+            AliasSampler, {strategy: (n, 3) uint8 array of derived colors})
+    """
+    base_colors, base_weights = zip(*BASE_COLOR_OPTIONS)
+    derived = {
+        strategy: np.array([harmony(color) for color in base_colors], dtype=np.uint8)
+        for strategy, harmony in HARMONIES.items()
+    }
+    return (
+        np.array(base_colors, dtype=np.uint8),
+        AliasSampler(base_weights),
+        derived,
+    )
+
+
+@lru_cache(maxsize=None)
+def _strategy_sampler():
+    return AliasSampler(list(STRATEGY_WEIGHTS.values()))
+
+
+def _theme_pairs(theme):
+    """Return a theme's color pairs as an (n, 2, 3) uint8 array."""
+    if theme not in THEME_COLOR_SCHEMES:
+        raise ValueError(f"Unknown theme: {theme}")
+    return np.array(THEME_COLOR_SCHEMES[theme], dtype=np.uint8)
+
+
+def generate_color_pairs(n, rng=None, theme=None):
+    """
+    Generate many color pairs at once.
+
+    Pairs follow the distribution of generate_color_pair (or of
+    get_themed_color_scheme when a theme is given), but are drawn from a
+    NumPy generator, so the sequence differs from that of n calls to the
+    single-pair functions.
+
+    Args:
+        n (int): Number of pairs
+        rng (np.random.Generator or int, optional): Random generator or
+            seed (None for fresh entropy)
+        theme (str, optional): Draw uniformly from this theme's schemes
+
+    Returns:
+        np.array: uint8 array of shape (n, 2, 3)
+    """
+    rng = np.random.default_rng(rng)
+    if theme is not None:
+        pairs = _theme_pairs(theme)
+        return pairs[rng.integers(0, len(pairs), size=n)]
+
+    base_colors, base_sampler, derived = harmony_tables()
+    strategies = list(STRATEGY_WEIGHTS)
+    strategy = _strategy_sampler().sample(rng, n)
+    first = base_sampler.sample(rng, n)
+    result = np.empty((n, 2, 3), dtype=np.uint8)
+    result[:, 0] = base_colors[first]
+
+    # Base palette pairs: a second weighted draw, redrawn until the two
+    # colors differ (some palette entries share a color)
+    rows = np.flatnonzero(strategy == strategies.index("base_palette"))
+    second = base_sampler.sample(rng, len(rows))
+    while True:
+        same = (base_colors[second] == base_colors[first[rows]]).all(axis=1)
+        if not same.any():
+            break
+        second[same] = base_sampler.sample(rng, int(same.sum()))
+    result[rows, 1] = base_colors[second]
+
+    # Harmony pairs: the precomputed derived color, in random order
+    for index, name in enumerate(strategies):
+        if name in derived:
+            rows = np.flatnonzero(strategy == index)
+            result[rows, 1] = derived[name][first[rows]]
+    swap = (strategy != strategies.index("base_palette")) & (rng.random(n) < 0.5)
+    result[swap] = result[swap, ::-1]
+    return result
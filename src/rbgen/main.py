@@ -1,16 +1,390 @@
 # src/rbgen/main.py
 import argparse
-from rbgen.processing.image_processor import ImageProcessor
+import contextlib
+import sys
+from rbgen.backgrounds.registry import available_modes
 from rbgen.color_schemes.color_utils import generate_color_pair
 from rbgen.color_schemes.palettes import get_themed_color_scheme
+from rbgen.processing.seeding import parse_shard
 
+# NumPy, Pillow and the background modules are imported only once there is
+# work to do, so listing modes or themes and --help start quickly.
 
-def main():
+
+def pool_main(argv):
+    """Entry point for the `rbgen pool` commands."""
+    from rbgen.processing.image_processor import ImageProcessor
+    from rbgen.processing.pool import build_pool, parse_size
+
+    parser = argparse.ArgumentParser(
+        prog="rbgen pool", description="Manage pre-rendered background pools"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser(
+        "build", help="Pre-render backgrounds per mode and size bucket"
+    )
+    build.add_argument("-o", "--output", required=True, help="Pool directory")
+    build.add_argument(
+        "-s",
+        "--sizes",
+        nargs="+",
+        required=True,
+        help="Size buckets as WxH (e.g. 1024x1024 800x600)",
+    )
+    build.add_argument(
+        "-m", "--modes", nargs="+", help="Background modes to render (default: all)"
+    )
+    build.add_argument(
+        "-n",
+        "--count",
+        type=int,
+        default=8,
+        help="Backgrounds per mode and size bucket (default: 8)",
+    )
+    build.add_argument("--seed", type=int, help="Pool seed (omit for a random one)")
+
+    args = parser.parse_args(argv)
+
+    available = available_modes()
+    modes = args.modes or available
+    unknown = sorted(set(modes) - set(available))
+    if unknown:
+        print(f"Unknown background mode(s): {', '.join(unknown)}")
+        return
+
+    try:
+        sizes = [parse_size(size) for size in args.sizes]
+    except ValueError as e:
+        print(str(e))
+        return
+
+    processor = ImageProcessor(cache_bytes=0)
+    index = build_pool(args.output, sizes, modes, args.count, args.seed, processor)
+    print(f"Pool of {len(index['entries'])} backgrounds saved to '{args.output}'")
+
+
+def calibrate_main(argv):
+    """Entry point for `rbgen calibrate`: measure per-mode render costs."""
+    from rbgen.processing.pool import parse_size
+    from rbgen.processing.scheduling import CostModel
+
+    parser = argparse.ArgumentParser(
+        prog="rbgen calibrate",
+        description="Measure the render cost of each background mode on this "
+        "machine, for use with --cost-model",
+    )
+    parser.add_argument("-o", "--output", required=True, help="Cost model JSON file")
+    parser.add_argument(
+        "-m", "--modes", nargs="+", help="Background modes to measure (default: all)"
+    )
+    parser.add_argument(
+        "-s", "--size", default="512x512", help="Test render size (default: 512x512)"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Renders per mode (default: 3)"
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        size = parse_size(args.size)
+    except ValueError as e:
+        print(str(e))
+        return
+
+    model = CostModel.calibrate(args.modes, size, args.repeat)
+    for mode in args.modes or available_modes():
+        print(f"  {mode:<24} {model.mode_costs[mode]:8.4f} s/megapixel")
+    model.save(args.output)
+    print(f"Cost model saved to '{args.output}'")
+
+
+def bench_main(argv):
+    """
+    Entry point for `rbgen bench`: time background rendering.
+
+    Returns:
+        int: 1 if a baseline was given and a case regressed or no longer
+            matches it perceptually, otherwise 0
+    """
+    from rbgen import benchmark
+    from rbgen.processing.pool import parse_size
+
+    parser = argparse.ArgumentParser(
+        prog="rbgen bench",
+        description="Time each background mode across sizes and parameter "
+        "extremes, optionally comparing with a baseline",
+    )
+    parser.add_argument(
+        "-m", "--modes", nargs="+", help="Background modes to time (default: all)"
+    )
+    parser.add_argument(
+        "-s",
+        "--sizes",
+        nargs="+",
+        help="Sizes as WxH (default: 256x256 up to 4096x4096)",
+    )
+    parser.add_argument(
+        "--no-params",
+        action="store_true",
+        help="Skip the parameter extremes (max_iter, octaves, num_shapes, depth)",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Timed renders per case (default: 3)"
+    )
+    parser.add_argument(
+        "--no-memory", action="store_true", help="Skip peak memory measurement"
+    )
+    parser.add_argument("-o", "--output", help="Save the results as JSON")
+    parser.add_argument(
+        "--save-thumbnails",
+        metavar="PATH",
+        help="Save the renders' thumbnails as reference renders (.npz), as "
+        "checked by benchmarks/bench_backgrounds.py",
+    )
+    parser.add_argument("--baseline", help="Results JSON to compare against")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=benchmark.DEFAULT_THRESHOLD,
+        help="Allowed slowdown against the baseline (default: 0.10 = 10%%)",
+    )
+    parser.add_argument(
+        "--perceptual-threshold",
+        type=float,
+        default=benchmark.DEFAULT_PERCEPTUAL_THRESHOLD,
+        help="Allowed mean thumbnail difference in 0-255 levels (default: 2.0)",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        sizes = [parse_size(size) for size in args.sizes] if args.sizes else None
+    except ValueError as e:
+        print(str(e))
+        return 1
+
+    cases = benchmark.bench_cases(args.modes, sizes, with_params=not args.no_params)
+    results = benchmark.run_benchmarks(
+        cases, repeat=args.repeat, measure_memory=not args.no_memory
+    )
+    if args.output:
+        benchmark.save_results(results, args.output)
+        print(f"Results saved to '{args.output}'")
+    if args.save_thumbnails:
+        benchmark.save_thumbnails(results, args.save_thumbnails)
+        print(f"Reference thumbnails saved to '{args.save_thumbnails}'")
+
+    if not args.baseline:
+        return 0
+    regressions, mismatches = benchmark.compare_results(
+        results,
+        benchmark.load_results(args.baseline),
+        args.threshold,
+        args.perceptual_threshold,
+    )
+    for regression in regressions:
+        print(
+            f"Regression: {regression['name']} {regression['ratio']:.2f}x slower "
+            f"({regression['baseline_seconds'] * 1000:.2f} ms -> "
+            f"{regression['seconds'] * 1000:.2f} ms)"
+        )
+    for mismatch in mismatches:
+        print(
+            f"Perceptual mismatch: {mismatch['name']} "
+            f"(distance {mismatch['distance']:.2f})"
+        )
+    if regressions or mismatches:
+        return 1
+    print("No regressions against the baseline")
+    return 0
+
+
+def add_result_cache_arguments(parser):
+    """Add the options of the on-disk result cache to a parser."""
+    parser.add_argument(
+        "--result-cache",
+        metavar="DIR",
+        help="Directory of a persistent cache of results, keyed by input "
+        "pixels and settings: repeated work is copied from it instead of "
+        "rendered",
+    )
+    parser.add_argument(
+        "--result-cache-size",
+        type=int,
+        default=4096,
+        help="Size (MiB) of the result cache beyond which the least recently "
+        "used results are evicted (default: 4096)",
+    )
+    parser.add_argument(
+        "--link-results",
+        action="store_true",
+        help="Hardlink results from the cache instead of copying them (the "
+        "cache and outputs must be on the same file system)",
+    )
+
+
+def open_result_cache(args):
+    """Return the ResultCache selected by the arguments, or None."""
+    if not args.result_cache:
+        return None
+    from rbgen.processing.results import ResultCache
+
+    if args.result_cache_size <= 0:
+        raise ValueError("--result-cache-size must be a positive number of MiB")
+    return ResultCache(
+        args.result_cache, args.result_cache_size * 1024 * 1024, link=args.link_results
+    )
+
+
+def serve_main(argv):
+    """Entry point for `rbgen serve`: run the local render service."""
+    from rbgen.processing.scheduling import threads_per_worker
+    from rbgen.service import RenderService
+
+    parser = argparse.ArgumentParser(
+        prog="rbgen serve",
+        description="Serve background rendering over HTTP on localhost, from "
+        "a pool of warm worker processes",
+    )
+    parser.add_argument(
+        "-p", "--port", type=int, default=8765, help="Port (default: 8765)"
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=1,
+        help="Worker processes, i.e. requests rendered at once (default: 1)",
+    )
+    parser.add_argument(
+        "--max-queue",
+        type=int,
+        default=16,
+        help="Requests that may wait for a worker before new ones are "
+        "answered with 503 (default: 16)",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        help="Threads each worker renders heavy backgrounds with (default: "
+        "the CPUs divided among the workers)",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=256,
+        help="Memory (MiB) per worker for reusing deterministic backgrounds "
+        "(default: 256)",
+    )
+    add_result_cache_arguments(parser)
+    args = parser.parse_args(argv)
+
+    try:
+        service = RenderService(
+            port=args.port,
+            workers=args.workers,
+            max_queue=args.max_queue,
+            threads=threads_per_worker(args.workers, args.threads),
+            cache_bytes=args.cache_size * 1024 * 1024,
+            result_cache=open_result_cache(args),
+        )
+    except (ValueError, OSError) as e:
+        print(str(e))
+        return 1
+    host, port = service.address
+    print(f"Serving on http://{host}:{port} (POST /render, GET /metrics)")
+    try:
+        service.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.shutdown()
+    return 0
+
+
+# Subcommands, dispatched on the first argument
+COMMANDS = {
+    "pool": pool_main,
+    "calibrate": calibrate_main,
+    "bench": bench_main,
+    "serve": serve_main,
+}
+
+
+def directory_options(args):
+    """
+    Return the given options that only apply to a directory of images.
+
+    The manifest (--force, --only-changed), scheduling (--cost-model,
+    --memory-budget) and content seeding are only implemented by
+    process_directory.
+    """
+    options = []
+    if args.seed_by != "name":
+        options.append("--seed-by")
+    if args.cost_model:
+        options.append("--cost-model")
+    if args.memory_budget is not None:
+        options.append("--memory-budget")
+    if args.force:
+        options.append("--force")
+    if args.only_changed:
+        options.append("--only-changed")
+    return options
+
+
+def process_shard(
+    processor, args, encoder, stdout=None, result_cache=None, resize=None, shard=None
+):
+    """Process a tar shard, or a tar stream on stdin, into another one."""
+    from rbgen.processing.shards import STREAM_PATH
+
+    source = sys.stdin.buffer if args.input == STREAM_PATH else open(args.input, "rb")
+    destination = stdout if stdout is not None else open(args.output, "wb")
+    try:
+        processor.process_tar(
+            source,
+            destination,
+            mode=args.mode,
+            randomize=args.random,
+            seed=args.seed,
+            encoder=encoder,
+            workers=args.workers,
+            threads=args.threads,
+            output_name=args.output,
+            result_cache=result_cache,
+            resize=resize,
+            shard=shard,
+        )
+    finally:
+        if source is not sys.stdin.buffer:
+            source.close()
+        if destination is stdout:
+            destination.flush()
+        else:
+            destination.close()
+
+
+def main(argv=None):
     """Main entry point for the rbgen application."""
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv[:1] and argv[0] in COMMANDS:
+        return COMMANDS[argv[0]](argv[1:])
+
     parser = argparse.ArgumentParser(description="rbgen - random background generator")
 
-    parser.add_argument("-i", "--input", help="Input directory with transparent images")
-    parser.add_argument("-o", "--output", help="Output directory for processed images")
+    parser.add_argument(
+        "-i",
+        "--input",
+        help="Input directory with transparent images, or a tar shard of them "
+        "(.tar, .tar.gz, .tgz, or - for stdin)",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="Output directory for processed images, or a tar shard when the "
+        "input is one (- for stdout)",
+    )
     parser.add_argument("-m", "--mode", help="Background mode to use (omit for random)")
     parser.add_argument("-t", "--theme", help="Color theme to use (omit for random)")
     parser.add_argument(
@@ -20,6 +394,164 @@ def main():
         default=False,
         help="Use random background mode and colors for each image",
     )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        help="Run-level seed; each image's seed is derived from it and the "
+        "image's path (omit for a random run seed)",
+    )
+    parser.add_argument(
+        "--seed-by",
+        choices=["name", "content"],
+        default="name",
+        help="Derive each image's seed from its name, or from a hash of its "
+        "contents so identical inputs get identical backgrounds (default: "
+        "name)",
+    )
+    parser.add_argument(
+        "--shard",
+        help="Process only shard i of N (e.g. 0/4), selected by a hash of each "
+        "input's path",
+    )
+    parser.add_argument(
+        "--format",
+        type=str.lower,
+        default="png",
+        help="Output image format: png, webp, jpeg or qoi, or npy to export "
+        "one memory-mapped array per image size (default: png)",
+    )
+    parser.add_argument(
+        "--compress-level",
+        type=int,
+        help="PNG zlib level (0-9) or WebP effort (0-6); lower is faster",
+    )
+    parser.add_argument(
+        "--quality", type=int, help="Quality (0-100) for JPEG and lossy WebP"
+    )
+    parser.add_argument(
+        "--lossless", action="store_true", help="Use lossless WebP compression"
+    )
+    parser.add_argument(
+        "--optimize",
+        action="store_true",
+        help="Spend extra encoding time on smaller PNG/JPEG files (PNGs "
+        "streamed in bands, see --tile-size, only use zlib level 9)",
+    )
+    parser.add_argument(
+        "--keep-alpha",
+        action="store_true",
+        help="Keep the alpha channel even when the output is fully opaque",
+    )
+    parser.add_argument(
+        "--tile-size",
+        type=int,
+        help="Render in bands of about N*N pixels and stream PNG output, "
+        "bounding memory for very large images",
+    )
+    parser.add_argument(
+        "--max-size",
+        type=int,
+        metavar="N",
+        help="Scale images whose longest side is over N pixels down to N as "
+        "they are decoded, and render backgrounds at that size",
+    )
+    parser.add_argument(
+        "--target-size",
+        metavar="WxH",
+        help="Scale every image, up or down, to fit within WxH (keeping its "
+        "aspect ratio) and render backgrounds at that size",
+    )
+    parser.add_argument(
+        "--animate",
+        type=int,
+        metavar="FRAMES",
+        help="Save an animated background of FRAMES frames behind each image "
+        "(modes: perlin_noise, cloud, waves, wavy_line, mandelbrot, striped, "
+        "checkered)",
+    )
+    parser.add_argument(
+        "--fps", type=float, default=12, help="Animation frame rate (default: 12)"
+    )
+    parser.add_argument(
+        "--animation-format",
+        choices=["apng", "gif", "frames"],
+        default="apng",
+        help="Animated PNG, GIF, or a folder of numbered frames in --format "
+        "(default: apng)",
+    )
+    parser.add_argument(
+        "--variants",
+        type=int,
+        default=1,
+        metavar="K",
+        help="Give each image K backgrounds, saved as name_v0 ... name_v<K-1>, "
+        "decoding it only once (default: 1)",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=256,
+        help="Memory (MiB) for reusing rendered backgrounds of deterministic "
+        "modes across images of the same size and colors; 0 disables "
+        "(default: 256)",
+    )
+    parser.add_argument(
+        "--pool",
+        help="Take backgrounds from a pool made by `rbgen pool build` instead "
+        "of rendering them",
+    )
+    add_result_cache_arguments(parser)
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes; images are dispatched most "
+        "expensive first (default: 1)",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        help="Threads each worker renders heavy backgrounds (mandelbrot, "
+        "marble, noise, ...) with, in bands (default: the CPUs divided "
+        "among the workers)",
+    )
+    parser.add_argument(
+        "--cost-model",
+        help="Per-mode cost model from `rbgen calibrate`, used to order jobs "
+        "and estimate the time remaining",
+    )
+    parser.add_argument(
+        "--memory-budget",
+        type=int,
+        help="Memory (MiB) the run may use for images: larger images are "
+        "rendered in bands and fewer run at once to stay within it",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print a per-mode, per-stage timing breakdown after the run",
+    )
+    parser.add_argument(
+        "--profile-output",
+        help="Also run under cProfile and dump its stats to this file (only "
+        "the main process is profiled when using --workers)",
+    )
+    parser.add_argument(
+        "--profile-log", help="Append every timed stage to this file as JSON lines"
+    )
+    rerun = parser.add_mutually_exclusive_group()
+    rerun.add_argument(
+        "--force",
+        action="store_true",
+        help="Reprocess all images, ignoring the manifest in the output directory",
+    )
+    rerun.add_argument(
+        "--only-changed",
+        action="store_true",
+        help="Only reprocess new or modified images, keeping existing outputs "
+        "even if they were made with another mode, seed or encoder settings",
+    )
     parser.add_argument(
         "--list-modes", action="store_true", help="List all available background modes"
     )
@@ -27,13 +559,12 @@ def main():
         "--list-themes", action="store_true", help="List all available color themes"
     )
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     # Handle listing modes and themes before checking required args
     if args.list_modes:
-        processor = ImageProcessor()
         print("Available background modes:")
-        for mode in processor.get_available_background_modes():
+        for mode in available_modes():
             print(f"  - {mode}")
         return
 
@@ -52,8 +583,131 @@ def main():
         )
         return
 
+    from rbgen.processing.shards import STREAM_PATH, is_shard_path
+
+    streaming = is_shard_path(args.input)
+    if streaming != is_shard_path(args.output):
+        parser.error("input and output must both be tar shards (- for stdin/stdout)")
+    if streaming and (
+        args.animate is not None or args.variants > 1 or args.pool or args.tile_size
+    ):
+        parser.error(
+            "--animate, --variants, --pool and --tile-size do not apply to shards"
+        )
+    if streaming and directory_options(args):
+        parser.error(f"{', '.join(directory_options(args))} do not apply to shards")
+    exporting = args.format == "npy"
+    if exporting and (
+        streaming
+        or args.animate is not None
+        or args.variants > 1
+        or args.pool
+        or args.tile_size
+    ):
+        parser.error(
+            "--format npy cannot be used with shards, --animate, --variants, "
+            "--pool or --tile-size"
+        )
+    if exporting:
+        # Arrays are written in place, with no encoded results to cache
+        unsupported = directory_options(args)
+        if args.result_cache:
+            unsupported.append("--result-cache")
+        if args.link_results:
+            unsupported.append("--link-results")
+        if unsupported:
+            parser.error(f"--format npy cannot be used with {', '.join(unsupported)}")
+
+    shard = None
+    if args.shard:
+        try:
+            shard = parse_shard(args.shard)
+        except ValueError as e:
+            print(str(e))
+            return
+
+    from rbgen.processing.encoding import Encoder
+    from rbgen.processing.image_processor import ImageProcessor
+
+    # .npy exports are written as raw arrays, with no encoder
+    encoder = None
+    if not exporting:
+        try:
+            encoder = Encoder(
+                args.format,
+                compress_level=args.compress_level,
+                quality=args.quality,
+                lossless=args.lossless,
+                optimize=args.optimize,
+                flatten=not args.keep_alpha,
+            )
+        except ValueError as e:
+            print(str(e))
+            return
+
+    pool = None
+    if args.pool:
+        from rbgen.processing.pool import BackgroundPool
+
+        pool = BackgroundPool(args.pool)
+        if args.mode and not args.random and args.mode not in pool.modes:
+            print(f"Background mode '{args.mode}' is not in the pool")
+            return
+
+    animation = None
+    if args.animate is not None:
+        from rbgen.backgrounds.animation import animated_modes
+        from rbgen.processing.animation import Animation
+
+        if pool is not None:
+            print("--animate cannot be used with --pool")
+            return
+        if not args.random and args.mode not in animated_modes():
+            print(f"Background mode '{args.mode}' cannot be animated")
+            return
+        try:
+            animation = Animation(args.animate, args.fps, args.animation_format)
+        except ValueError as e:
+            print(str(e))
+            return
+
+    if args.variants < 1:
+        print("--variants must be at least 1")
+        return
+
+    cost_model = None
+    if args.cost_model:
+        from rbgen.processing.scheduling import CostModel
+
+        cost_model = CostModel.load(args.cost_model)
+
+    memory_budget = None
+    if args.memory_budget is not None:
+        if args.memory_budget <= 0:
+            print("--memory-budget must be a positive number of MiB")
+            return
+        memory_budget = args.memory_budget * 1024 * 1024
+
+    try:
+        result_cache = open_result_cache(args)
+    except (ValueError, OSError) as e:
+        print(str(e))
+        return
+
+    resize = None
+    if args.max_size is not None or args.target_size:
+        from rbgen.processing.pool import parse_size
+        from rbgen.processing.resizing import Resize
+
+        try:
+            target_size = parse_size(args.target_size) if args.target_size else None
+            resize = Resize(args.max_size, target_size)
+        except ValueError as e:
+            print(str(e))
+            return
+
     # Initialize processor and process images
-    processor = ImageProcessor()
+    processor = ImageProcessor(cache_bytes=args.cache_size * 1024 * 1024)
 
     # Generate colors based on theme if provided
     colors = None
@@ -66,12 +720,90 @@ def main():
     elif not args.random:
         colors = generate_color_pair()
 
-    processor.process_directory(
-        args.input, args.output, mode=args.mode, colors=colors, randomize=args.random
-    )
+    from rbgen.profiling import JSONLinesSink, StageTimer, profiling
+
+    sinks = []
+    timer = None
+    if args.profile or args.profile_output:
+        timer = StageTimer()
+        sinks.append(timer)
+    if args.profile_log:
+        sinks.append(JSONLinesSink(args.profile_log))
+    profiler = None
+    if args.profile_output:
+        import cProfile
+
+        profiler = cProfile.Profile()
+
+    # With the shard written to stdout, messages go to stderr instead
+    stdout = sys.stdout.buffer if args.output == STREAM_PATH else None
+    log = contextlib.nullcontext()
+    if stdout is not None:
+        log = contextlib.redirect_stdout(sys.stderr)
+
+    with log:
+        with profiling(*sinks):
+            if profiler is not None:
+                profiler.enable()
+            try:
+                if streaming:
+                    process_shard(
+                        processor, args, encoder, stdout, result_cache, resize, shard
+                    )
+                elif exporting:
+                    processor.export_arrays(
+                        args.input,
+                        args.output,
+                        mode=args.mode,
+                        randomize=args.random,
+                        seed=args.seed,
+                        shard=shard,
+                        workers=args.workers,
+                        threads=args.threads,
+                        channels="RGBA" if args.keep_alpha else "RGB",
+                        resize=resize,
+                    )
+                else:
+                    processor.process_directory(
+                        args.input,
+                        args.output,
+                        mode=args.mode,
+                        colors=colors,
+                        randomize=args.random,
+                        force=args.force,
+                        only_changed=args.only_changed,
+                        seed=args.seed,
+                        shard=shard,
+                        encoder=encoder,
+                        tile_size=args.tile_size,
+                        pool=pool,
+                        workers=args.workers,
+                        cost_model=cost_model,
+                        memory_budget=memory_budget,
+                        threads=args.threads,
+                        animation=animation,
+                        variants=args.variants,
+                        result_cache=result_cache,
+                        seed_by=args.seed_by,
+                        resize=resize,
+                    )
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+                for sink in sinks:
+                    if hasattr(sink, "close"):
+                        sink.close()
 
-    print(f"Processing complete. Images saved to '{args.output}'")
+        if timer is not None:
+            print(timer.report())
+        if profiler is not None:
+            profiler.dump_stats(args.profile_output)
+            print(f"cProfile stats saved to '{args.profile_output}'")
+        if streaming:
+            print(f"Processing complete. Shard saved to '{args.output}'")
+        else:
+            print(f"Processing complete. Images saved to '{args.output}'")
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -1,4 +1,30 @@
 # src/rbgen/processing/__init__.py
-from rbgen.processing.image_processor import ImageProcessor
+import importlib
 
-__all__ = [ImageProcessor]
+# Public name: module it is loaded from (on first access)
+_EXPORTS = {
+    "ImageProcessor": "rbgen.processing.image_processor",
+    "Encoder": "rbgen.processing.encoding",
+    "Manifest": "rbgen.processing.manifest",
+    "BackgroundCache": "rbgen.processing.cache",
+    "ResultCache": "rbgen.processing.results",
+    "BackgroundPool": "rbgen.processing.pool",
+    "build_pool": "rbgen.processing.pool",
+    "FrameRing": "rbgen.processing.transport",
+    "Animation": "rbgen.processing.animation",
+    "Resize": "rbgen.processing.resizing",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
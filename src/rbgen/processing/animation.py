@@ -0,0 +1,118 @@
+# src/rbgen/processing/animation.py
+import os
+from PIL import Image
+from rbgen.processing.encoding import APNGStreamWriter
+
+# Animation formats and the extension of their output ("" for a folder)
+ANIMATION_FORMATS = {
+    "apng": ".png",
+    "gif": ".gif",
+    "frames": "",
+}
+
+
+class GIFWriter:
+    """
+    Write an animated GIF.
+
+    Pillow writes a GIF's frames in one go, so frames are kept until
+    close(), each reduced to a palette image (one byte per pixel) as it
+    arrives.
+    """
+
+    def __init__(self, path, fps):
+        self.path = path
+        self.duration = max(10, round(1000 / fps))
+        self._frames = []
+
+    def write(self, frame):
+        """Append an RGB(A) uint8 frame (transparency is dropped)."""
+        self._frames.append(Image.fromarray(frame[..., :3]).quantize(256))
+
+    def close(self):
+        """Save the collected frames, looping forever."""
+        first, *rest = self._frames
+        first.save(
+            self.path,
+            format="GIF",
+            save_all=True,
+            append_images=rest,
+            duration=self.duration,
+            loop=0,
+        )
+        self._frames = []
+
+
+class FrameSequenceWriter:
+    """Write each frame as a numbered image in a folder, as it arrives."""
+
+    def __init__(self, folder, encoder):
+        self.folder = folder
+        self.encoder = encoder
+        self.frames_written = 0
+        os.makedirs(folder, exist_ok=True)
+
+    def write(self, frame):
+        """Save an RGB(A) uint8 frame with the encoder's settings."""
+        name = f"frame_{self.frames_written:04d}{self.encoder.extension}"
+        self.encoder.save(Image.fromarray(frame), os.path.join(self.folder, name))
+        self.frames_written += 1
+
+    def close(self):
+        pass
+
+
+class Animation:
+    """
+    Settings for animated output: frame count, speed and format.
+    """
+
+    def __init__(self, frames=24, fps=12, output_format="apng", **options):
+        """
+        Configure animated output.
+
+        Args:
+            frames (int): Number of frames
+            fps (float): Frames per second
+            output_format (str): "apng", "gif", or "frames" for a folder
+                of numbered images in the encoder's format
+            **options: Mode-specific animation options passed to
+                animate_background (e.g. zoom_factor, degrees, cycles)
+        """
+        if output_format not in ANIMATION_FORMATS:
+            raise ValueError(f"Unknown animation format: {output_format}")
+        if frames < 1:
+            raise ValueError("An animation needs at least one frame")
+        if fps <= 0:
+            raise ValueError("fps must be positive")
+        self.frames = frames
+        self.fps = fps
+        self.output_format = output_format
+        self.options = options
+
+    def output_name(self, filename):
+        """Return the output file (or folder) name for an input file name."""
+        return os.path.splitext(filename)[0] + ANIMATION_FORMATS[self.output_format]
+
+    def open(self, path, size, opaque, encoder):
+        """
+        Open a writer that takes the frames one at a time.
+
+        Args:
+            path (str): Output path, as from output_name
+            size (tuple): (width, height) of the frames
+            opaque (bool): Whether the frames are RGB rather than RGBA
+            encoder (Encoder): Settings for PNG compression and for the
+                images of a frame folder
+
+        Returns:
+            Writer with write(frame) and close() methods
+        """
+        if self.output_format == "gif":
+            return GIFWriter(path, self.fps)
+        if self.output_format == "frames":
+            return FrameSequenceWriter(path, encoder)
+        mode = "RGB" if opaque else "RGBA"
+        return APNGStreamWriter(
+            path, size, self.frames, self.fps, mode, encoder.compress_level
+        )
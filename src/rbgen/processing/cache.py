@@ -0,0 +1,110 @@
+# src/rbgen/processing/cache.py
+import threading
+from collections import OrderedDict
+
+# Modes whose background is fully determined by the planned spec
+# (mode, size, colors and parameters), with no per-image randomness
+CACHEABLE_MODES = {"solid", "gradient", "concentric_shapes", "radial_pattern"}
+
+# Default cache budget: 256 MiB of RGBA pixels
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+
+
+def _freeze(value):
+    """Convert lists in a spec value to tuples so it can be hashed."""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def spec_key(spec):
+    """Return a hashable cache key for a background spec."""
+    return tuple(sorted((name, _freeze(value)) for name, value in spec.items()))
+
+
+class BackgroundCache:
+    """
+    Least-recently-used cache of rendered backgrounds, bounded by bytes.
+
+    Backgrounds are keyed by their planned spec, so only modes listed in
+    CACHEABLE_MODES should be cached. Safe to share between threads.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        """
+        Create an empty cache.
+
+        Args:
+            max_bytes (int): Upper bound on the pixel data held; backgrounds
+                larger than this are never cached
+        """
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, spec):
+        """
+        Look up the background for a spec.
+
+        Args:
+            spec (dict): Planned background spec
+
+        Returns:
+            PIL.Image: Cached RGBA background, or None on a miss
+        """
+        key = spec_key(spec)
+        with self._lock:
+            background = self._entries.get(key)
+            if background is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return background
+
+    def put(self, spec, background):
+        """
+        Store a rendered background, evicting the least recently used ones.
+
+        Args:
+            spec (dict): Planned background spec
+            background (PIL.Image): Rendered RGBA background
+        """
+        size = self._entry_bytes(background)
+        if size > self.max_bytes:
+            return
+        key = spec_key(spec)
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= self._entry_bytes(self._entries.pop(key))
+            while self._entries and self.bytes + size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= self._entry_bytes(evicted)
+            self._entries[key] = background
+            self.bytes += size
+
+    @staticmethod
+    def _entry_bytes(background):
+        return background.width * background.height * len(background.getbands())
+
+    def stats(self):
+        """
+        Return hit-rate statistics.
+
+        Returns:
+            dict: hits, misses, hit_rate, entries and bytes
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+        }
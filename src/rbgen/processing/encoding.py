@@ -0,0 +1,331 @@
+# src/rbgen/processing/encoding.py
+import os
+import struct
+import zlib
+import numpy as np
+from PIL import Image
+
+# Output formats: Pillow format name and file extension
+OUTPUT_FORMATS = {
+    "png": ("PNG", ".png"),
+    "webp": ("WEBP", ".webp"),
+    "jpeg": ("JPEG", ".jpg"),
+    "qoi": ("QOI", ".qoi"),
+}
+
+
+def is_format_available(output_format):
+    """Check whether the installed Pillow can write the given output format."""
+    Image.init()
+    return OUTPUT_FORMATS[output_format][0] in Image.SAVE
+
+
+def flatten_if_opaque(image):
+    """
+    Drop the alpha channel of an RGBA image with no remaining transparency.
+
+    Args:
+        image (PIL.Image): Image to check
+
+    Returns:
+        PIL.Image: RGB image if every pixel is opaque, otherwise the input
+    """
+    if image.mode == "RGBA" and image.getchannel("A").getextrema() == (255, 255):
+        return image.convert("RGB")
+    return image
+
+
+def _sub_filter(rows, channels):
+    """
+    Sub-filter rows of pixels for PNG compression.
+
+    Args:
+        rows (np.array): uint8 array of shape (rows, width, >= channels)
+        channels (int): Channels to keep (3 or 4)
+
+    Returns:
+        bytes: Filtered scanlines, each prefixed with its filter type
+    """
+    height = rows.shape[0]
+    flat = np.ascontiguousarray(rows[..., :channels]).reshape(height, -1)
+
+    # Sub filter: each byte minus the same channel of the pixel to its left
+    filtered = np.empty((height, flat.shape[1] + 1), dtype=np.uint8)
+    filtered[:, 0] = 1
+    filtered[:, 1 : 1 + channels] = flat[:, :channels]
+    filtered[:, 1 + channels :] = flat[:, channels:] - flat[:, :-channels]
+    return filtered.tobytes()
+
+
+def _write_chunk(file, chunk_type, data):
+    """Write a PNG chunk with its length and CRC."""
+    file.write(struct.pack(">I", len(data)))
+    file.write(chunk_type)
+    file.write(data)
+    file.write(struct.pack(">I", zlib.crc32(chunk_type + data) & 0xFFFFFFFF))
+
+
+class PNGStreamWriter:
+    """
+    Write a PNG file band by band, so the full image is never held in memory.
+
+    Rows are Sub-filtered and fed to a single zlib stream; compressed data
+    is written out as IDAT chunks as soon as zlib produces it.
+    """
+
+    def __init__(self, path, size, mode="RGBA", compress_level=None):
+        """
+        Open the output file and write the PNG header.
+
+        Args:
+            path (str): Output path
+            size (tuple): (width, height) of the image
+            mode (str): "RGB" or "RGBA"
+            compress_level (int, optional): zlib level (0-9), default 6
+        """
+        self.size = size
+        self.mode = mode
+        self.channels = len(mode)
+        self.rows_written = 0
+        self._compressor = zlib.compressobj(
+            6 if compress_level is None else compress_level
+        )
+        self._file = open(path, "wb")
+        self._file.write(b"\x89PNG\r\n\x1a\n")
+        color_type = 6 if mode == "RGBA" else 2
+        header = struct.pack(">IIBBBBB", size[0], size[1], 8, color_type, 0, 0, 0)
+        self._chunk(b"IHDR", header)
+
+    def _chunk(self, chunk_type, data):
+        _write_chunk(self._file, chunk_type, data)
+
+    def write(self, rows):
+        """
+        Append a band of rows.
+
+        Args:
+            rows (np.array): uint8 array of shape (rows, width, channels)
+                in the writer's mode
+        """
+        data = self._compressor.compress(_sub_filter(rows, self.channels))
+        if data:
+            self._chunk(b"IDAT", data)
+        self.rows_written += rows.shape[0]
+
+    def close(self):
+        """Flush the compressed stream and finish the file."""
+        if self.rows_written != self.size[1]:
+            self._file.close()
+            raise ValueError(f"Expected {self.size[1]} rows, got {self.rows_written}")
+        self._chunk(b"IDAT", self._compressor.flush())
+        self._chunk(b"IEND", b"")
+        self._file.close()
+
+
+class APNGStreamWriter:
+    """
+    Write an animated PNG frame by frame, as the frames are produced.
+
+    Every frame is a full-size frame replacing the previous one; the
+    first one is also the image shown by viewers without APNG support.
+    """
+
+    def __init__(self, path, size, frames, fps, mode="RGBA", compress_level=None):
+        """
+        Open the output file and write the PNG and animation headers.
+
+        Args:
+            path (str): Output path
+            size (tuple): (width, height) of the frames
+            frames (int): Number of frames that will be written
+            fps (float): Frames per second
+            mode (str): "RGB" or "RGBA"
+            compress_level (int, optional): zlib level (0-9), default 6
+        """
+        self.size = size
+        self.frames = frames
+        self.channels = len(mode)
+        self.compress_level = 6 if compress_level is None else compress_level
+        self.frames_written = 0
+        self._sequence = 0
+        # Frame delay as a fraction of a second, in milliseconds
+        self._delay = (max(1, round(1000 / fps)), 1000)
+        self._file = open(path, "wb")
+        self._file.write(b"\x89PNG\r\n\x1a\n")
+        color_type = 6 if mode == "RGBA" else 2
+        header = struct.pack(">IIBBBBB", size[0], size[1], 8, color_type, 0, 0, 0)
+        _write_chunk(self._file, b"IHDR", header)
+        # Loop forever
+        _write_chunk(self._file, b"acTL", struct.pack(">II", frames, 0))
+
+    def _next_sequence(self):
+        self._sequence += 1
+        return self._sequence - 1
+
+    def write(self, frame):
+        """
+        Append a frame.
+
+        Args:
+            frame (np.array): uint8 array of shape (height, width, channels)
+        """
+        if self.frames_written == self.frames:
+            raise ValueError(f"Expected {self.frames} frames")
+        width, height = self.size
+        control = struct.pack(
+            ">IIIIIHHBB",
+            self._next_sequence(),
+            width,
+            height,
+            0,
+            0,
+            *self._delay,
+            0,  # Dispose: none, the next frame covers it
+            0,  # Blend: source, replacing the previous frame
+        )
+        _write_chunk(self._file, b"fcTL", control)
+        data = zlib.compress(_sub_filter(frame, self.channels), self.compress_level)
+        if self.frames_written == 0:
+            _write_chunk(self._file, b"IDAT", data)
+        else:
+            sequence = struct.pack(">I", self._next_sequence())
+            _write_chunk(self._file, b"fdAT", sequence + data)
+        self.frames_written += 1
+
+    def close(self):
+        """Finish the file."""
+        if self.frames_written != self.frames:
+            self._file.close()
+            raise ValueError(
+                f"Expected {self.frames} frames, got {self.frames_written}"
+            )
+        _write_chunk(self._file, b"IEND", b"")
+        self._file.close()
+
+
+class Encoder:
+    """
+    Output encoder settings used when saving processed images.
+    """
+
+    def __init__(
+        self,
+        output_format="png",
+        compress_level=None,
+        quality=None,
+        lossless=False,
+        optimize=False,
+        flatten=True,
+    ):
+        """
+        Configure the output encoder.
+
+        Args:
+            output_format (str): One of "png", "webp", "jpeg" or "qoi"
+            compress_level (int, optional): zlib level (0-9) for PNG, or
+                compression effort (0-6) for WebP. Lower is faster.
+                Defaults to Pillow's setting.
+            quality (int, optional): Quality (0-100) for JPEG and lossy
+                WebP. Defaults to Pillow's setting.
+            lossless (bool): Use lossless WebP compression
+            optimize (bool): Spend extra time on smaller PNG/JPEG files
+                (streamed PNGs only use the best zlib level, see
+                open_stream)
+            flatten (bool): Save as RGB when the result has no remaining
+                transparency (JPEG output is always RGB)
+        """
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format: {output_format}")
+        if not is_format_available(output_format):
+            raise ValueError(
+                f"Output format '{output_format}' is not supported by this "
+                "Pillow installation"
+            )
+        self.output_format = output_format
+        self.compress_level = compress_level
+        self.quality = quality
+        self.lossless = lossless
+        self.optimize = optimize
+        self.flatten = flatten
+
+    @property
+    def extension(self):
+        """File extension (with the leading dot) for the output format."""
+        return OUTPUT_FORMATS[self.output_format][1]
+
+    def output_name(self, filename):
+        """Return the output file name for an input file name."""
+        return os.path.splitext(filename)[0] + self.extension
+
+    def describe(self):
+        """Return the settings as a dict, as recorded in the manifest."""
+        settings = self.save_options()
+        settings["flatten"] = self.flatten
+        return settings
+
+    def save_options(self):
+        """Return the keyword arguments passed to PIL.Image.save."""
+        options = {"format": OUTPUT_FORMATS[self.output_format][0]}
+        if self.output_format == "png":
+            if self.compress_level is not None:
+                options["compress_level"] = self.compress_level
+            options["optimize"] = self.optimize
+        elif self.output_format == "webp":
+            options["lossless"] = self.lossless
+            if self.compress_level is not None:
+                options["method"] = self.compress_level
+            if self.quality is not None:
+                options["quality"] = self.quality
+        elif self.output_format == "jpeg":
+            if self.quality is not None:
+                options["quality"] = self.quality
+            options["optimize"] = self.optimize
+        return options
+
+    def prepare(self, image):
+        """Convert an image to the mode that will be written."""
+        if self.output_format == "jpeg":
+            return image.convert("RGB")
+        if self.flatten:
+            return flatten_if_opaque(image)
+        return image
+
+    @property
+    def streaming(self):
+        """Whether tiled output can be streamed to disk band by band."""
+        return self.output_format == "png"
+
+    def open_stream(self, path, size, opaque):
+        """
+        Open a streaming writer for band-by-band output, if the format allows.
+
+        Streamed PNGs are written with one filter and zlib stream, so
+        `optimize` cannot search encoder settings as Pillow does: it falls
+        back to the best zlib level (9) unless compress_level is given.
+
+        Args:
+            path (str): Output path, including the extension
+            size (tuple): (width, height) of the image
+            opaque (bool): Whether the result is known to be fully opaque
+
+        Returns:
+            PNGStreamWriter: Writer for PNG output, or None for formats
+                that must be saved from a complete image
+        """
+        if not self.streaming:
+            return None
+        mode = "RGB" if (self.flatten and opaque) else "RGBA"
+        compress_level = self.compress_level
+        if compress_level is None and self.optimize:
+            compress_level = 9
+        return PNGStreamWriter(path, size, mode, compress_level)
+
+    def save(self, image, path):
+        """
+        Save an image with the configured format and options.
+
+        Args:
+            image (PIL.Image): Processed image
+            path (str): Output path, including the extension
+        """
+        self.prepare(image).save(path, **self.save_options())
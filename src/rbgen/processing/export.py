@@ -0,0 +1,88 @@
+# src/rbgen/processing/export.py
+"""
+Dataset export to memory-mapped .npy arrays.
+
+Results are written straight into one preallocated N x H x W x C uint8
+.npy file per image size (bucket), which trainers can open with
+np.load(path, mmap_mode="r") without decoding anything. Every image has
+its own slot, so worker processes write disjoint slices of the same file
+concurrently. A JSON index next to each array lists, per slot, the
+source name, seed, mode, colors and parameters.
+"""
+import json
+import os
+import numpy as np
+
+# Output channels
+EXPORT_CHANNELS = {"RGB": 3, "RGBA": 4}
+
+# Arrays opened by this process, by path
+_opened = {}
+
+
+def bucket_name(size):
+    """Return the file name stem of a size bucket, e.g. "images_640x480"."""
+    return f"images_{size[0]}x{size[1]}"
+
+
+def create_array(path, count, size, channels="RGB"):
+    """
+    Preallocate the .npy array of a bucket.
+
+    Args:
+        path (str): Output path (.npy)
+        count (int): Number of images in the bucket
+        size (tuple): (width, height) of the images
+        channels (str): "RGB" or "RGBA"
+
+    Returns:
+        str: path
+    """
+    width, height = size
+    array = np.lib.format.open_memmap(
+        path,
+        mode="w+",
+        dtype=np.uint8,
+        shape=(count, height, width, EXPORT_CHANNELS[channels]),
+    )
+    del array
+    return path
+
+
+def write_slot(path, index, image):
+    """
+    Write an image into slot `index` of an exported array, in any process.
+
+    The array stays mapped for the life of the process, so later slots
+    cost no reopening.
+
+    Args:
+        path (str): Path of an array made by create_array
+        index (int): Slot to write
+        image (PIL.Image): RGBA image of the bucket's size
+    """
+    array = _opened.get(path)
+    if array is None:
+        array = _opened[path] = np.load(path, mmap_mode="r+")
+    pixels = np.asarray(image)
+    array[index] = pixels[..., : array.shape[3]]
+
+
+def close_arrays():
+    """Flush and unmap the arrays opened by this process."""
+    for array in _opened.values():
+        array.flush()
+    _opened.clear()
+
+
+def write_index(path, entries, size, channels):
+    """Write the JSON index of a bucket, replacing any previous one."""
+    index = {
+        "size": list(size),
+        "channels": channels,
+        "count": len(entries),
+        "entries": entries,
+    }
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    os.replace(path + ".tmp", path)
@@ -1,7 +1,59 @@
 # src/rbgen/processing/image_processor.py
+import contextlib
+import contextvars
+import functools
+import io
 import os
 import random
+import shutil
+import threading
+import time
+from collections import deque
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+import numpy as np
 from PIL import Image
+from rbgen.backgrounds.regions import (
+    BATCH_PIXELS,
+    iter_bands,
+    plan_background,
+    render_background,
+    render_backgrounds,
+    render_region,
+)
+from rbgen.backgrounds.registry import MODES
+from rbgen.backgrounds.utils import ImageRandom, PreparedForeground, compose_images
+from rbgen.processing.cache import CACHEABLE_MODES, DEFAULT_CACHE_BYTES, BackgroundCache
+from rbgen.processing.encoding import Encoder
+from rbgen.processing.manifest import Manifest, hash_bytes, hash_file
+from rbgen.processing.memory import estimate_memory, fit_tile_size, format_bytes
+from rbgen.processing.results import hash_pixels, result_key, unshare
+from rbgen.processing.scheduling import (
+    CostModel,
+    Progress,
+    format_duration,
+    order_jobs,
+    read_size,
+    threads_per_worker,
+)
+from rbgen.processing.seeding import derive_seed, in_shard, new_run_seed
+from rbgen.processing.transport import FrameRing, attach
+from rbgen.profiling import (
+    StageTimer,
+    annotate,
+    is_enabled,
+    merge_totals,
+    profiling,
+    span,
+)
+
+# Same-size images whose modes have batch renderers get their backgrounds
+# rendered in batches of up to this many (see _process_frames)
+BATCH_SIZE = 16
 
 
 class ImageProcessor:
@@ -9,67 +61,31 @@ class ImageProcessor:
     Main class responsible for processing images with various background effects.
     """
 
-    def __init__(self):
-        """Initialize the processor with available background functions."""
-        # These will be imported from their respective modules
-        self.background_functions = {}
+    def __init__(self, cache_bytes=DEFAULT_CACHE_BYTES):
+        """
+        Initialize the processor with available background functions.
+
+        Args:
+            cache_bytes: Byte budget of the cache of rendered backgrounds
+                for deterministic modes (0 disables the cache)
+        """
         self._register_background_functions()
+        self.background_cache = BackgroundCache(cache_bytes) if cache_bytes else None
 
     def _register_background_functions(self):
-        """Register all available background functions from the backgrounds package."""
-        # This will be populated from background modules
-        from rbgen.backgrounds.solid import apply_solid_background
-        from rbgen.backgrounds.striped import apply_striped_background
-        from rbgen.backgrounds.checkered import (
-            apply_checkered_background,
-            apply_perspective_checkered_background,
-        )
-        from rbgen.backgrounds.fractal import (
-            apply_mandelbrot_background,
-            apply_nested_polygons_background,
-        )
-        from rbgen.backgrounds.shapes import (
-            apply_geometric_shapes_background,
-            apply_concentric_shapes_background,
-        )
-        from rbgen.backgrounds.line import (
-            apply_line_background,
-            apply_wavy_line_background,
-        )
-        from rbgen.backgrounds.textures import (
-            apply_perlin_noise_background,
-            apply_gradient_background,
-            apply_radial_pattern_background,
-            apply_marble_texture_background,
-            apply_cloud_background,
-        )
-        from rbgen.backgrounds.waves import apply_waves_background
-
-        # Register all functions with their keys
-        self.background_functions = {
-            "solid": apply_solid_background,
-            "striped": apply_striped_background,
-            "checkered": apply_checkered_background,
-            "perspective_checkered": apply_perspective_checkered_background,
-            "mandelbrot": apply_mandelbrot_background,
-            "nested_polygons": apply_nested_polygons_background,
-            "geometric_shapes": apply_geometric_shapes_background,
-            "concentric_shapes": apply_concentric_shapes_background,
-            "line": apply_line_background,
-            "wavy_line": apply_wavy_line_background,
-            "perlin_noise": apply_perlin_noise_background,
-            "gradient": apply_gradient_background,
-            "radial_pattern": apply_radial_pattern_background,
-            "marble": apply_marble_texture_background,
-            "cloud": apply_cloud_background,
-            "waves": apply_waves_background,
-        }
+        """
+        Register all available background functions.
+
+        Modes are looked up through the shared lazy registry, so a
+        background module is only imported when its mode is first used.
+        """
+        self.background_functions = MODES
 
     def get_available_background_modes(self):
         """Return a list of all available background modes."""
         return list(self.background_functions.keys())
 
-    def process_image(self, image, mode, colors, **kwargs):
+    def process_image(self, image, mode, colors, rng=None, **kwargs):
         """
         Process a single image with the specified background mode and colors.
 
@@ -77,6 +93,8 @@ class ImageProcessor:
             image: PIL Image object to process
             mode: Background mode to apply
             colors: List of colors to use
+            rng: Random source for the background (None for the global
+                random states)
             **kwargs: Additional parameters for specific background modes
 
         Returns:
@@ -84,24 +102,41 @@ class ImageProcessor:
         """
         if mode not in self.background_functions:
             raise ValueError(f"Unknown background mode: {mode}")
+        if rng is not None:
+            kwargs["rng"] = rng
+        extra = {"rng": rng} if rng is not None else {}
 
         # Handle special cases with specific parameters
         # TODO: fix inconsistent handling of kwargs
         if mode == "solid":
-            return self.background_functions[mode](image, colors[0])
+            return self.background_functions[mode](image, colors[0], **extra)
         elif mode == "gradient" and "direction" in kwargs:
-            return self.background_functions[mode](image, colors, kwargs["direction"])
+            return self.background_functions[mode](
+                image, colors, kwargs["direction"], **extra
+            )
         elif mode == "radial_pattern" and "num_rays" in kwargs:
-            return self.background_functions[mode](image, colors, kwargs["num_rays"])
+            return self.background_functions[mode](
+                image, colors, kwargs["num_rays"], **extra
+            )
         elif mode == "perlin_noise" and "scale" in kwargs:
             return self.background_functions[mode](
-                image, colors, kwargs.get("scale", 0.1), kwargs.get("octaves", 6)
+                image,
+                colors,
+                kwargs.get("scale", 0.1),
+                kwargs.get("octaves", 6),
+                **extra,
             )
         elif mode == "marble" and "turbulence" in kwargs:
-            return self.background_functions[mode](image, colors, kwargs["turbulence"])
+            return self.background_functions[mode](
+                image, colors, kwargs["turbulence"], **extra
+            )
         elif mode == "cloud":
             return self.background_functions[mode](
-                image, colors, kwargs.get("scale", 0.5), kwargs.get("octaves", 4)
+                image,
+                colors,
+                kwargs.get("scale", 0.5),
+                kwargs.get("octaves", 4),
+                **extra,
             )
         elif mode == "mandelbrot":
             return self.background_functions[mode](
@@ -110,76 +145,1690 @@ class ImageProcessor:
                 kwargs.get("max_iter", 100),
                 kwargs.get("zoom", None),
                 kwargs.get("center", None),
+                **extra,
             )
         elif mode == "nested_polygons":
             return self.background_functions[mode](
-                image, colors, kwargs.get("line_width", 3), kwargs.get("depth", 4)
+                image,
+                colors,
+                kwargs.get("line_width", 3),
+                kwargs.get("depth", 4),
+                **extra,
             )
         else:
             # Default case: Pass kwargs dynamically
             return self.background_functions[mode](image, colors, **kwargs)
 
+    def _select_settings(self, mode, randomize, rng, animated=False):
+        """
+        Choose the mode, colors and extra parameters for one image.
+
+        Draws from `rng`, which process_file seeds from the image seed so
+        that the choice is reproducible. Random modes are limited to those
+        that can be animated when `animated` is set.
+
+        Returns:
+            tuple: (mode, colors, kwargs)
+        """
+        from rbgen.color_schemes.color_utils import generate_color_pair
+
+        if randomize:
+            # Get random mode
+            if animated:
+                from rbgen.backgrounds.animation import animated_modes
+
+                modes = animated_modes()
+            else:
+                modes = list(self.background_functions.keys())
+            selected_mode = rng.choice(modes)
+            # Get random color pair
+            selected_colors = generate_color_pair(rng)
+
+            # Prepare additional parameters for specific modes
+            kwargs = self._random_params(selected_mode, rng)
+        else:
+            selected_mode = mode
+            # Do `selected_colors = colors` to re-use the same colors
+            # Or to use random colors every image:
+            selected_colors = generate_color_pair(rng)
+
+            kwargs = {}  # For non-random mode, kwargs passed separately
+
+        return selected_mode, selected_colors, kwargs
+
+    @staticmethod
+    def _random_params(mode, rng):
+        """Draw random extra parameters for a background mode."""
+        kwargs = {}
+        if mode == "gradient":
+            kwargs["direction"] = rng.choice(
+                ["horizontal", "vertical", "diagonal", "radial"]
+            )
+        elif mode == "radial_pattern":
+            kwargs["num_rays"] = rng.randint(4, 32)
+        elif mode == "perlin_noise":
+            kwargs["scale"] = rng.uniform(0.05, 0.3)
+            kwargs["octaves"] = rng.randint(3, 8)
+        elif mode == "marble":
+            kwargs["turbulence"] = rng.uniform(3.0, 8.0)
+        elif mode == "cloud":
+            kwargs["scale"] = rng.uniform(10.0, 30.0)
+            kwargs["octaves"] = rng.randint(3, 6)
+        return kwargs
+
+    @staticmethod
+    def _background_rng(mode, seed, rng):
+        """
+        Return the random source to render a mode's background with.
+
+        Modes from other packages that take no `rng` argument draw from the
+        global random states instead, which are seeded here for them.
+        """
+        if MODES.accepts_rng(mode):
+            return rng
+        random.seed(seed)
+        np.random.seed([seed & 0xFFFFFFFF, seed >> 32])
+        return None
+
+    def process_file(
+        self,
+        image_path,
+        output_path,
+        mode=None,
+        randomize=True,
+        seed=None,
+        encoder=None,
+        tile_size=None,
+        pool=None,
+        threads=1,
+        animation=None,
+        variants=1,
+        result_cache=None,
+        resize=None,
+    ):
+        """
+        Process a single image file and save the result.
+
+        All random choices (mode, colors, parameters and the background
+        itself) are drawn from an ImageRandom seeded with `seed`, so calling
+        this again with the seed recorded in the manifest regenerates the
+        same output, and the global random states are left alone.
+
+        With `variants` above 1, the image is decoded and prepared for
+        compositing once and given that many backgrounds, saved with
+        variant_name suffixes. The first variant uses `seed` itself (so it
+        matches a single-output run), the others seeds derived from it.
+
+        Args:
+            image_path: Path of the input image
+            output_path: Path to save the processed image
+            mode: Background mode to apply (ignored when randomize is set)
+            randomize: Whether to randomize modes and colors
+            seed: Per-image seed (or None for a fresh random one)
+            encoder: Encoder with the output format and options
+                (or None for PNG with default settings)
+            tile_size: Render and composite in bands of about
+                tile_size**2 pixels, streaming PNG output to disk, to bound
+                memory for very large images (None renders in one piece)
+            pool: BackgroundPool to take pre-rendered backgrounds from,
+                picked by seed, instead of rendering them
+            threads: Number of threads to render the background with, in
+                bands, for modes that benefit (see render_region). Several
+                variants are rendered concurrently instead.
+            animation: Animation settings to save an animated background
+                behind the image instead (tile_size and pool are ignored)
+            variants: Number of backgrounds to give the image
+            result_cache: ResultCache to serve rendered outputs from, and
+                to add new ones to (not used with animation or pool)
+            resize: Resize giving the output size; the image is scaled to
+                it as it is decoded, and backgrounds are rendered at it
+
+        Returns:
+            dict: Manifest entry describing the input and the chosen
+                settings (of the first variant, with all of them listed
+                under "variants" when there are several), with "cached"
+                set when every output came from the result cache
+        """
+        if seed is None:
+            seed = new_run_seed()
+        if encoder is None:
+            encoder = Encoder()
+        if variants < 1:
+            raise ValueError("variants must be at least 1")
+
+        start = time.perf_counter()
+        with span("image"):
+            with span("load"):
+                stat, data, image = _read_image(image_path, resize)
+
+            # Shared by every variant
+            with span("mask"):
+                if animation is not None:
+                    from rbgen.backgrounds.animation import ForegroundMask
+
+                    foreground = ForegroundMask(image)
+                else:
+                    foreground = PreparedForeground(image)
+
+            pixels = None
+            if result_cache is not None and animation is None and pool is None:
+                with span("hash"):
+                    pixels = hash_pixels(image)
+
+            variant_seeds = [seed] + [
+                derive_seed(seed, f"variant/{k}") for k in range(1, variants)
+            ]
+            if variants == 1:
+                variant_paths = [output_path]
+            else:
+                variant_paths = [
+                    variant_name(output_path, k) for k in range(variants)
+                ]
+            tasks = [
+                functools.partial(
+                    self._make_variant,
+                    foreground,
+                    path,
+                    variant_seed,
+                    mode,
+                    randomize,
+                    encoder,
+                    tile_size,
+                    pool,
+                    animation,
+                    result_cache=result_cache,
+                    pixels=pixels,
+                )
+                for path, variant_seed in zip(variant_paths, variant_seeds)
+            ]
+            made = _run_variants(tasks, threads)
+            cached = [variant.pop("cached", False) for variant in made]
+
+        entry = _manifest_entry(
+            image_path,
+            stat,
+            data,
+            randomize,
+            encoder,
+            made[0],
+            time.perf_counter() - start,
+            resize,
+        )
+        if variants > 1:
+            entry["variants"] = made
+        if all(cached):
+            entry["cached"] = True
+        if animation is not None:
+            entry["format"] = animation.output_format
+            entry["frames"] = animation.frames
+            entry["fps"] = animation.fps
+        return entry
+
+    def _make_variant(
+        self,
+        foreground,
+        output_path,
+        seed,
+        mode,
+        randomize,
+        encoder,
+        tile_size,
+        pool,
+        animation,
+        threads,
+        result_cache=None,
+        pixels=None,
+    ):
+        """
+        Give a prepared foreground one background and save the result.
+
+        With a result cache and the hash_pixels digest of the foreground,
+        a result saved before with the same settings is placed at the
+        output path instead of being rendered again.
+
+        Returns:
+            dict: Output name, seed, mode, colors and params of the
+                variant, with "cached" set if it came from the cache
+        """
+        # Outputs hardlinked to cache entries must not be written through
+        unshare(output_path)
+        cached = False
+        if animation is not None:
+            with span("select"):
+                rng = ImageRandom(seed)
+                selected_mode, selected_colors, kwargs = self._select_settings(
+                    mode, randomize, rng, animated=True
+                )
+            annotate(mode=selected_mode)
+            self._animate_and_save(
+                foreground,
+                selected_mode,
+                selected_colors,
+                kwargs,
+                output_path,
+                encoder,
+                animation,
+                rng,
+                threads,
+            )
+        elif pool is not None:
+            # Backgrounds come pre-rendered from the pool, picked by seed
+            with span("pool"):
+                pool_mode = None if randomize else mode
+                pool_entry, background = pool.pick(foreground.size, seed, pool_mode)
+            selected_mode = pool_entry["mode"]
+            selected_colors = pool_entry["colors"]
+            kwargs = pool_entry["params"]
+            annotate(mode=selected_mode)
+            with span("compose"):
+                processed_image = foreground.composite(background)
+            with span("save"):
+                encoder.save(processed_image, output_path)
+        else:
+            with span("select"):
+                rng = ImageRandom(seed)
+                selected_mode, selected_colors, kwargs = self._select_settings(
+                    mode, randomize, rng
+                )
+            annotate(mode=selected_mode)
+            key = None
+            if pixels is not None:
+                settings = _settings(seed, selected_mode, selected_colors, kwargs)
+                key = result_key(pixels, settings, encoder)
+                with span("fetch"):
+                    cached = result_cache.fetch(key, encoder.extension, output_path)
+            if not cached:
+                with _global_random_lock(selected_mode):
+                    self._render_and_save(
+                        foreground,
+                        selected_mode,
+                        selected_colors,
+                        kwargs,
+                        output_path,
+                        encoder,
+                        tile_size,
+                        self._background_rng(selected_mode, seed, rng),
+                        threads,
+                    )
+                if key is not None:
+                    with span("store"):
+                        result_cache.store(key, encoder.extension, output_path)
+
+        made = {
+            "output": os.path.basename(output_path),
+            **_settings(seed, selected_mode, selected_colors, kwargs),
+        }
+        if cached:
+            made["cached"] = True
+        return made
+
+    def _animate_and_save(
+        self, mask, mode, colors, kwargs, output_path, encoder, animation, rng, threads
+    ):
+        """
+        Render an animated background for an image and save the frames.
+
+        Each frame is composited through the image's ForegroundMask, and
+        handed to the writer as soon as it is rendered.
+        """
+        from rbgen.backgrounds.animation import animate_background
+
+        with span("plan"):
+            spec = plan_background(mode, mask.size, colors, rng=rng, **kwargs)
+
+        opaque = spec["opaque"]
+        writer = animation.open(output_path, mask.size, opaque, encoder)
+        frames = animate_background(
+            spec, animation.frames, rng=rng, threads=threads, **animation.options
+        )
+        try:
+            while True:
+                with span("render"):
+                    background = next(frames, None)
+                if background is None:
+                    break
+                with span("compose"):
+                    frame = mask.composite(background, opaque)
+                with span("save"):
+                    writer.write(frame)
+        finally:
+            with span("save"):
+                writer.close()
+
+    def _render_and_save(
+        self,
+        foreground,
+        mode,
+        colors,
+        kwargs,
+        output_path,
+        encoder,
+        tile_size,
+        rng=None,
+        threads=1,
+    ):
+        """Render a background for an image, composite it and save the result."""
+        if tile_size:
+            with span("plan"):
+                spec = plan_background(
+                    mode, foreground.size, colors, rng=rng, **kwargs
+                )
+            self._save_tiled(
+                foreground.image, spec, output_path, encoder, tile_size, threads
+            )
+            return
+
+        processed_image = self._compose(foreground, mode, colors, kwargs, rng, threads)
+        with span("save"):
+            encoder.save(processed_image, output_path)
+
+    def _compose(self, foreground, mode, colors, kwargs, rng=None, threads=1):
+        """
+        Render a background for a PreparedForeground and composite the
+        foreground onto it.
+        """
+        if not MODES.supports_regions(mode):
+            with span("process"):
+                return self.process_image(
+                    foreground.image, mode, colors, rng=rng, **kwargs
+                )
+
+        with span("plan"):
+            spec = plan_background(mode, foreground.size, colors, rng=rng, **kwargs)
+        cacheable = self.background_cache is not None and mode in CACHEABLE_MODES
+        background = self.background_cache.get(spec) if cacheable else None
+        if background is None:
+            with span("render"):
+                background = Image.fromarray(render_background(spec, threads))
+            if cacheable:
+                self.background_cache.put(spec, background)
+
+        with span("compose"):
+            return foreground.composite(background)
+
+    def _draw_settings(self, seed, mode, randomize, colors=None, params=None):
+        """
+        Draw the mode, colors and params of an in-memory image from its seed.
+
+        Colors and params, when given, replace the ones drawn for the mode.
+
+        Returns:
+            tuple: (mode, colors, params, ImageRandom to draw the rest from)
+        """
+        with span("select"):
+            rng = ImageRandom(seed)
+            selected_mode, drawn_colors, kwargs = self._select_settings(
+                mode, randomize, rng
+            )
+        colors = drawn_colors if colors is None else colors
+        kwargs = kwargs if params is None else dict(params)
+        return selected_mode, colors, kwargs, rng
+
+    def _process_frame(
+        self, image, seed, mode, randomize, threads=1, colors=None, params=None
+    ):
+        """
+        Give one in-memory image a background drawn from its seed.
+
+        Colors and params, when given, replace the ones drawn for the mode.
+
+        Returns:
+            tuple: (RGBA result, dict of the seed, mode, colors and params)
+        """
+        selected_mode, colors, kwargs, rng = self._draw_settings(
+            seed, mode, randomize, colors, params
+        )
+        annotate(mode=selected_mode)
+        rng = self._background_rng(selected_mode, seed, rng)
+        with span("convert"):
+            foreground = PreparedForeground(image)
+        result = self._compose(foreground, selected_mode, colors, kwargs, rng, threads)
+        if result.mode != "RGBA":
+            result = result.convert("RGBA")
+        return result, _settings(seed, selected_mode, colors, kwargs)
+
+    def _process_frames(self, images, seeds, mode, randomize, threads=1):
+        """
+        Give in-memory images backgrounds drawn from their seeds, rendering
+        those of same-size images in batches where their modes allow.
+
+        Settings are drawn and backgrounds planned per image as in
+        _process_frame; backgrounds of modes with a batch renderer are
+        then rendered together by size (see render_backgrounds), and the
+        others one by one. Results are identical to _process_frame's.
+
+        Returns:
+            list: (RGBA result, settings dict) per image, in order
+        """
+        results = [None] * len(images)
+        by_size = {}
+        for i, (image, seed) in enumerate(zip(images, seeds)):
+            with span("select"):
+                rng = ImageRandom(seed)
+                selected_mode, colors, kwargs = self._select_settings(
+                    mode, randomize, rng
+                )
+            if MODES.batch_renderer(selected_mode) is None or not MODES.accepts_rng(
+                selected_mode
+            ):
+                with span("image"):
+                    results[i] = self._process_frame(
+                        image, seed, mode, randomize, threads
+                    )
+                continue
+            with span("plan"):
+                spec = plan_background(
+                    selected_mode, image.size, colors, rng=rng, **kwargs
+                )
+            settings = _settings(seed, selected_mode, colors, kwargs)
+            by_size.setdefault(image.size, []).append((i, spec, settings))
+
+        cache = self.background_cache
+        for members in by_size.values():
+            for start in range(0, len(members), BATCH_SIZE):
+                batch = members[start : start + BATCH_SIZE]
+                backgrounds = []
+                for _, spec, _ in batch:
+                    cacheable = cache is not None and spec["mode"] in CACHEABLE_MODES
+                    backgrounds.append(cache.get(spec) if cacheable else None)
+                missing = [k for k, found in enumerate(backgrounds) if found is None]
+                if missing:
+                    with span("render"):
+                        rendered = render_backgrounds(
+                            [batch[k][1] for k in missing], threads
+                        )
+                    for k, array in zip(missing, rendered):
+                        spec = batch[k][1]
+                        if cache is not None and spec["mode"] in CACHEABLE_MODES:
+                            # A copy, so the cache does not hold the batch
+                            backgrounds[k] = Image.fromarray(array.copy())
+                            cache.put(spec, backgrounds[k])
+                        else:
+                            backgrounds[k] = Image.fromarray(array)
+
+                for (i, _, settings), background in zip(batch, backgrounds):
+                    with span("image", mode=settings["mode"]):
+                        with span("convert"):
+                            foreground = PreparedForeground(images[i])
+                        with span("compose"):
+                            results[i] = (foreground.composite(background), settings)
+        return results
+
+    def process_images(
+        self,
+        images,
+        mode=None,
+        randomize=True,
+        seed=None,
+        workers=1,
+        threads=None,
+        resize=None,
+    ):
+        """
+        Give a batch of in-memory images backgrounds.
+
+        Image i is seeded from the run seed and "image/i", so results do
+        not depend on the worker count. In this process, backgrounds of
+        same-size images are rendered in batches where their modes allow
+        (see _process_frames). With several workers, frames are handed to
+        worker processes through a ring of shared memory slots (see
+        transport.py): inputs are copied in, each worker composites in
+        place, and only slot handles and settings are pickled.
+
+        Args:
+            images: Sequence of PIL images
+            mode: Background mode to apply (ignored when randomize is set)
+            randomize: Whether to randomize modes and colors
+            seed: Run-level seed (or None for a fresh random one)
+            workers: Number of worker processes (1 processes in this one)
+            threads: Threads each worker renders bands of a background
+                with (see process_directory)
+            resize: Resize to scale the images to their output size first
+
+        Returns:
+            list: (RGBA PIL image, settings dict) per input, in order
+        """
+        if seed is None:
+            seed = new_run_seed()
+        if resize is not None:
+            with span("resize"):
+                images = [resize.apply(image) for image in images]
+        threads = threads_per_worker(workers, threads)
+        seeds = [derive_seed(seed, f"image/{i}") for i in range(len(images))]
+        if workers <= 1 or len(images) <= 1:
+            return self._process_frames(images, seeds, mode, randomize, threads)
+
+        results = [None] * len(images)
+        pending = deque(range(len(images)))
+        running = {}
+        slot_bytes = max(4 * image.width * image.height for image in images)
+        cache_bytes = self.background_cache.max_bytes if self.background_cache else 0
+        # Two slots per worker, so each has its next frame ready
+        with FrameRing(2 * workers, slot_bytes) as ring, ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(type(self), cache_bytes),
+        ) as executor:
+            while pending or running:
+                while pending and ring.free:
+                    index = pending.popleft()
+                    with span("transport"):
+                        handle = ring.put(images[index].convert("RGBA"))
+                    future = executor.submit(
+                        _run_frame_job, handle, seeds[index], mode, randomize, threads
+                    )
+                    running[future] = (index, handle)
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, handle = running.pop(future)
+                    settings = future.result()
+                    with span("transport"):
+                        result = Image.fromarray(ring.get(handle).copy())
+                    ring.release(handle)
+                    results[index] = (result, settings)
+        return results
+
+    def _process_sample(
+        self,
+        data,
+        seed,
+        mode,
+        randomize,
+        encoder,
+        threads=1,
+        colors=None,
+        params=None,
+        result_cache=None,
+        resize=None,
+    ):
+        """
+        Give one encoded image a background and encode the result.
+
+        With a result cache, a result encoded before from the same pixels
+        and settings is returned from it instead of being rendered again.
+        With a Resize, the image is decoded at its output size.
+
+        Returns:
+            tuple: (encoded result, settings dict)
+        """
+        with span("image"):
+            with span("load"):
+                image = _decode(data, resize)
+            key = None
+            if result_cache is not None:
+                with span("hash"):
+                    selected_mode, colors, params, _ = self._draw_settings(
+                        seed, mode, randomize, colors, params
+                    )
+                    settings = _settings(seed, selected_mode, colors, params)
+                    key = result_key(hash_pixels(image), settings, encoder)
+                with span("fetch"):
+                    cached = result_cache.read(key, encoder.extension)
+                if cached is not None:
+                    annotate(mode=selected_mode)
+                    return cached, settings
+            result, settings = self._process_frame(
+                image, seed, mode, randomize, threads, colors, params
+            )
+            with span("save"):
+                buffer = io.BytesIO()
+                encoder.save(result, buffer)
+            if key is not None:
+                with span("store"):
+                    result_cache.write(key, encoder.extension, buffer.getvalue())
+        return buffer.getvalue(), settings
+
+    def process_tar(
+        self,
+        source,
+        destination,
+        mode=None,
+        randomize=True,
+        seed=None,
+        encoder=None,
+        workers=1,
+        threads=None,
+        output_name=None,
+        result_cache=None,
+        resize=None,
+        shard=None,
+    ):
+        """
+        Process the PNG members of a tar stream into another tar stream.
+
+        Both streams are read and written strictly in order, so either can
+        be a pipe. Each image is written back under its own name (with the
+        encoder's extension), followed by a "<name>.rbgen.json" member with
+        its seed, mode, colors and parameters; other members are copied
+        through. Members are seeded from the run seed and their names, as
+        in process_directory. With a shard, only the samples in it (an
+        image and the members sharing its key, see sample_key) are
+        processed and written, so the shards of one input are disjoint.
+
+        With several workers, at most two images per worker are buffered:
+        reading pauses until the oldest one is done and written, so output
+        order matches input order.
+
+        Args:
+            source: Binary file object to read the input tar from
+            destination: Binary file object to write the output tar to
+            mode: Background mode to apply (ignored when randomize is set)
+            randomize: Whether to randomize modes and colors
+            seed: Run-level seed (or None for a fresh random one)
+            encoder: Encoder with the output format and options
+                (or None for PNG with default settings)
+            workers: Number of worker processes (1 processes in this one)
+            threads: Threads each worker renders bands of a background
+                with (see process_directory)
+            output_name: Name of the output, to gzip it for .tar.gz/.tgz
+            result_cache: ResultCache to take encoded results from, and to
+                add new ones to
+            resize: Resize giving the output size of each image
+            shard: (index, count) tuple to process only part of the
+                samples, selected by a hash of their keys (see in_shard)
+
+        Returns:
+            int: Number of images processed
+        """
+        from rbgen.processing import shards
+
+        if seed is None:
+            seed = new_run_seed()
+        if encoder is None:
+            encoder = Encoder()
+        threads = threads_per_worker(workers, threads)
+        in_flight = max(2 * workers, 1) if workers > 1 else 0
+        processed = 0
+        # (member, contents to copy, None) or (member, None, result), where
+        # the result is (image bytes, settings) or a future of them
+        queue = deque()
+
+        def write_oldest(tar):
+            nonlocal processed
+            member, data, result = queue.popleft()
+            if result is None:
+                shards.write_member(tar, member, data)
+                return
+            image_bytes, settings = result if workers <= 1 else result.result()
+            settings["input"] = member.name
+            shards.write_sample(
+                tar, member, encoder.output_name(member.name), image_bytes, settings
+            )
+            processed += 1
+            print(f"Processed: {member.name} with {settings['mode']} background")
+
+        executor = None
+        if workers > 1:
+            cache = self.background_cache
+            cache_bytes = cache.max_bytes if cache else 0
+            executor = ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+                initargs=(type(self), cache_bytes),
+            )
+        try:
+            with shards.open_reader(source) as reader, shards.open_writer(
+                destination, output_name
+            ) as writer:
+                for member in reader:
+                    if member.isfile() and not in_shard(
+                        shards.sample_key(member.name), shard
+                    ):
+                        continue
+                    data = None
+                    if member.isfile():
+                        with span("read"):
+                            data = reader.extractfile(member).read()
+                    if not shards.is_image_member(member):
+                        queue.append((member, data, None))
+                    else:
+                        job = (
+                            data,
+                            derive_seed(seed, member.name),
+                            mode,
+                            randomize,
+                            encoder,
+                            threads,
+                        )
+                        extra = {"result_cache": result_cache, "resize": resize}
+                        if executor is None:
+                            result = self._process_sample(*job, **extra)
+                        else:
+                            result = executor.submit(_run_sample_job, *job, **extra)
+                        queue.append((member, None, result))
+                    while len(queue) > in_flight:
+                        write_oldest(writer)
+                while queue:
+                    write_oldest(writer)
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+        if result_cache is not None:
+            # Workers add to the cache through copies of it, which are
+            # not trimmed as they go
+            result_cache.trim()
+        return processed
+
+    def _export_frames(
+        self, path, indexes, image_paths, seeds, mode, randomize, threads, resize=None
+    ):
+        """
+        Give inputs of one size backgrounds and write them into slots of
+        an array, rendering the backgrounds as a batch (see
+        _process_frames).
+
+        Returns:
+            list: Settings used for each input
+        """
+        from rbgen.processing.export import write_slot
+
+        with span("batch"):
+            images = []
+            for image_path in image_paths:
+                with span("load"):
+                    if resize is not None:
+                        image = resize.open(image_path)
+                    else:
+                        image = Image.open(image_path)
+                        image.load()
+                images.append(image)
+            results = self._process_frames(images, seeds, mode, randomize, threads)
+            for index, (result, _) in zip(indexes, results):
+                with span("save"):
+                    write_slot(path, index, result)
+        return [settings for _, settings in results]
+
+    def export_arrays(
+        self,
+        input_folder,
+        output_folder,
+        mode=None,
+        randomize=True,
+        seed=None,
+        shard=None,
+        workers=1,
+        threads=None,
+        channels="RGB",
+        resize=None,
+    ):
+        """
+        Export the PNG images of a directory into memory-mapped .npy arrays.
+
+        Images are grouped by size; each size bucket gets one
+        preallocated N x H x W x C uint8 array (images_<W>x<H>.npy, see
+        export.py) and a JSON index (images_<W>x<H>.json) giving each
+        slot's source name, seed, mode, colors and parameters. Slots
+        follow the sorted input names. Images are handled in batches of
+        up to BATCH_SIZE slots, whose backgrounds are rendered together
+        where their modes allow; workers write their batches straight
+        into disjoint slots of the arrays, so nothing is encoded.
+
+        Images are seeded as in process_directory, so an export holds the
+        same pixels as the PNGs a run with the same seed would save.
+
+        Args:
+            input_folder: Path to folder containing input images
+            output_folder: Folder to write the arrays and indexes into
+            mode: Background mode to apply (ignored when randomize is set)
+            randomize: Whether to randomize modes and colors
+            seed: Run-level seed (or None for a fresh random one)
+            shard: (index, count) tuple selecting a subset of the inputs
+            workers: Number of worker processes (1 processes in this one)
+            threads: Threads each worker renders bands of a background
+                with (see process_directory)
+            channels: "RGB", or "RGBA" to keep the alpha channel
+            resize: Resize giving the output size of each image; images
+                are bucketed by their output size
+
+        Returns:
+            dict: Path of each bucket's array, by (width, height)
+        """
+        from rbgen.processing import export
+
+        if channels not in export.EXPORT_CHANNELS:
+            raise ValueError(f"Unknown channels: {channels}")
+        if seed is None:
+            seed = new_run_seed()
+        threads = threads_per_worker(workers, threads)
+        os.makedirs(output_folder, exist_ok=True)
+
+        buckets = {}
+        with span("plan_jobs"):
+            for filename in sorted(os.listdir(input_folder)):
+                if not filename.lower().endswith(".png"):
+                    continue
+                if not in_shard(filename, shard):
+                    continue
+                image_path = os.path.join(input_folder, filename)
+                size = read_size(image_path)
+                if resize is not None:
+                    size = resize.output_size(size)
+                buckets.setdefault(size, []).append(filename)
+
+        jobs = []
+        paths = {}
+        for size, filenames in sorted(buckets.items()):
+            stem = os.path.join(output_folder, export.bucket_name(size))
+            paths[size] = export.create_array(
+                stem + ".npy", len(filenames), size, channels
+            )
+            print(
+                f"Exporting {len(filenames)} image(s) of {size[0]}x{size[1]} "
+                f"to {paths[size]}"
+            )
+            for start in range(0, len(filenames), BATCH_SIZE):
+                batch = filenames[start : start + BATCH_SIZE]
+                jobs.append(
+                    (
+                        paths[size],
+                        list(range(start, start + len(batch))),
+                        [os.path.join(input_folder, filename) for filename in batch],
+                        [derive_seed(seed, filename) for filename in batch],
+                        mode,
+                        randomize,
+                        threads,
+                        resize,
+                    )
+                )
+
+        settings = {}
+        if workers <= 1:
+            for job in jobs:
+                for index, used in zip(job[1], self._export_frames(*job)):
+                    settings[(job[0], index)] = used
+            export.close_arrays()
+        else:
+            cache = self.background_cache
+            cache_bytes = cache.max_bytes if cache else 0
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+                initargs=(type(self), cache_bytes),
+            ) as executor:
+                futures = {executor.submit(_run_export_job, *job): job for job in jobs}
+                for future, job in futures.items():
+                    for index, used in zip(job[1], future.result()):
+                        settings[(job[0], index)] = used
+
+        for size, filenames in sorted(buckets.items()):
+            entries = []
+            for index, filename in enumerate(filenames):
+                entry = {"input": filename, **settings[(paths[size], index)]}
+                entry["run_seed"] = seed
+                entries.append(entry)
+            index_path = os.path.splitext(paths[size])[0] + ".json"
+            export.write_index(index_path, entries, size, channels)
+        print(f"Exported {len(settings)} image(s) in {len(buckets)} size bucket(s)")
+        return paths
+
+    @staticmethod
+    def _save_tiled(image, spec, output_path, encoder, tile_size, threads=1):
+        """
+        Render, composite and save an image band by band.
+
+        Background bands are rendered from the planned spec, so no
+        full-frame (or oversized) background canvas is ever allocated.
+        PNG output is streamed to disk; other formats are assembled at the
+        output size first.
+        """
+        writer = encoder.open_stream(output_path, image.size, spec["opaque"])
+        result = None if writer is not None else Image.new("RGBA", image.size)
+
+        for box in iter_bands(image.size, tile_size):
+            with span("render"):
+                background = Image.fromarray(render_region(spec, box, threads))
+            with span("compose"):
+                band = compose_images(background, image.crop(box))
+            with span("save"):
+                if writer is not None:
+                    writer.write(np.asarray(band))
+                else:
+                    result.paste(band, box[:2])
+
+        with span("save"):
+            if writer is not None:
+                writer.close()
+            else:
+                encoder.save(result, output_path)
+
+    def _plan_job(
+        self,
+        filename,
+        image_path,
+        output_path,
+        mode,
+        randomize,
+        seed,
+        pool,
+        cost_model,
+        animation=None,
+        variants=1,
+        resize=None,
+    ):
+        """
+        Describe one image to process, with its estimated cost.
+
+        The mode and parameters of each variant are drawn exactly as
+        process_file will draw them from the same seed; only the image
+        header is read. The job's cost covers all of its variants, and
+        its render mode is that of the most expensive one. Sizes, and so
+        costs, are those of the output when a Resize is given.
+        """
+        size = read_size(image_path)
+        if resize is not None:
+            size = resize.output_size(size)
+        variant_seeds = [seed] + [
+            derive_seed(seed, f"variant/{k}") for k in range(1, variants)
+        ]
+        estimates = []
+        for variant_seed in variant_seeds:
+            if pool is not None and animation is None:
+                # Pre-rendered backgrounds only cost compositing and encoding
+                selected_mode, kwargs = None, {}
+            else:
+                selected_mode, _, kwargs = self._select_settings(
+                    mode,
+                    randomize,
+                    ImageRandom(variant_seed),
+                    animated=animation is not None,
+                )
+            estimates.append(
+                (cost_model.estimate(selected_mode, size, kwargs), selected_mode)
+            )
+        return {
+            "filename": filename,
+            "image_path": image_path,
+            "output_path": output_path,
+            "mode": mode,
+            "seed": seed,
+            "cost": sum(cost for cost, _ in estimates),
+            "size": size,
+            "render_mode": max(estimates, key=lambda estimate: estimate[0])[1],
+        }
+
+    @staticmethod
+    def _fit_memory(jobs, tile_size, encoder, memory_budget, workers, animated=False):
+        """
+        Estimate the peak memory of each job, tiling those that need it.
+
+        With a budget, an image whose untiled working set exceeds its
+        worker's share of the budget is rendered in bands sized to fit.
+        Modes without a region renderer, and animations, cannot be tiled
+        and keep their estimate.
+
+        Sets "memory" (estimated bytes) and "tile_size" on every job.
+        """
+        from rbgen.backgrounds.registry import MODES
+
+        share = memory_budget // max(workers, 1) if memory_budget else None
+        if animated:
+            tile_size = None
+        for job in jobs:
+            mode = job["render_mode"]
+            file_bytes = os.path.getsize(job["image_path"])
+            job["tile_size"] = tile_size
+            job["memory"] = estimate_memory(
+                mode, job["size"], tile_size, encoder.streaming, file_bytes
+            )
+            tileable = not animated and (mode is None or MODES.supports_regions(mode))
+            if share is None or job["memory"] <= share or not tileable:
+                continue
+            job["tile_size"] = fit_tile_size(
+                mode, job["size"], share, encoder.streaming, file_bytes
+            )
+            if tile_size:
+                job["tile_size"] = min(job["tile_size"], tile_size)
+            job["memory"] = estimate_memory(
+                mode, job["size"], job["tile_size"], encoder.streaming, file_bytes
+            )
+            print(
+                f"Tiling {job['filename']} in bands of about "
+                f"{job['tile_size']}x{job['tile_size']} pixels to fit "
+                f"{format_bytes(share)} (estimated {format_bytes(job['memory'])})"
+            )
+
+    @staticmethod
+    def _batch_jobs(jobs, options):
+        """
+        Merge jobs whose backgrounds can be rendered together into units.
+
+        Jobs of the same size and render mode are merged when the mode has
+        a batch renderer, the image is small enough for several to share
+        a batch chunk (see BATCH_PIXELS), and nothing about the job needs
+        handling per image (tiles, pools, animations, variants). A unit
+        takes the place of its most expensive job and holds up to
+        BATCH_SIZE jobs under "batch", with their costs and memory summed.
+
+        Returns:
+            list: Jobs and units, in the order of the jobs
+        """
+        if options.get("pool") is not None or set(options) & {"animation", "variants"}:
+            return jobs
+        units = []
+        open_units = {}
+        for job in jobs:
+            mode = job["render_mode"]
+            width, height = job["size"]
+            if (
+                job["tile_size"]
+                or mode is None
+                or 2 * width * height > BATCH_PIXELS
+                or MODES.batch_renderer(mode) is None
+            ):
+                units.append(job)
+                continue
+            key = (job["size"], mode)
+            unit = open_units.get(key)
+            if unit is None or len(unit["batch"]) == BATCH_SIZE:
+                unit = open_units[key] = {
+                    "filename": job["filename"],
+                    "size": job["size"],
+                    "render_mode": mode,
+                    "cost": 0,
+                    "memory": 0,
+                    "batch": [],
+                }
+                units.append(unit)
+            unit["batch"].append(job)
+            unit["cost"] += job["cost"]
+            unit["memory"] += job["memory"]
+        # Units left with a single job run it as usual
+        return [
+            unit["batch"][0] if len(unit.get("batch", ())) == 1 else unit
+            for unit in units
+        ]
+
+    def _run_jobs(self, jobs, options, workers, memory_budget=None):
+        """
+        Process jobs in order, in this process or across worker processes.
+
+        At most two jobs per worker are submitted at a time, so each has
+        its next job queued and the order of the rest is kept. With a
+        memory budget, a job is only started once the estimated memory of
+        the jobs running alongside it leaves room for it (a job larger
+        than the whole budget runs on its own). Units made by _batch_jobs
+        are run as one job, yielding an entry per merged job.
+
+        Yields:
+            tuple: (job, manifest entry) as each job finishes
+        """
+        if workers <= 1:
+            for job in jobs:
+                yield from zip(job.get("batch", [job]), self._run_unit(job, options))
+            return
+
+        cache_bytes = self.background_cache.max_bytes if self.background_cache else 0
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(type(self), cache_bytes),
+        ) as executor:
+            # Submitted in order, so workers pick up the longest jobs first
+            # Workers collect their own spans when profiling is on
+            profile = is_enabled()
+            pending = list(reversed(jobs))
+            running = {}
+            in_flight = 2 * workers
+            in_use = 0
+            while pending or running:
+                while (
+                    pending
+                    and len(running) < in_flight
+                    and (
+                        not running
+                        or memory_budget is None
+                        or in_use + pending[-1]["memory"] <= memory_budget
+                    )
+                ):
+                    job = pending.pop()
+                    future = executor.submit(_run_worker_job, job, options, profile)
+                    running[future] = job
+                    in_use += job["memory"]
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = running.pop(future)
+                    in_use -= job["memory"]
+                    entries, totals = future.result()
+                    if totals:
+                        merge_totals(totals)
+                    yield from zip(job.get("batch", [job]), entries)
+
+    def _run_unit(self, job, options):
+        """Run a job or a unit of jobs and return their manifest entries."""
+        if "batch" in job:
+            return self._run_batch(job["batch"], options)
+        return [self._run_job(job, options)]
+
+    def _run_job(self, job, options):
+        """Process the image described by a job and return its manifest entry."""
+        return self.process_file(
+            job["image_path"],
+            job["output_path"],
+            mode=job["mode"],
+            seed=job["seed"],
+            tile_size=job["tile_size"],
+            **options,
+        )
+
+    def _run_batch(self, jobs, options):
+        """
+        Process same-size jobs together, rendering their backgrounds as a
+        batch (see _process_frames).
+
+        Outputs and manifest entries are the same as process_file would
+        make for each job, except that the time taken is shared evenly.
+        Jobs found in the result cache are served from it, and only the
+        others are rendered.
+
+        Returns:
+            list: Manifest entry per job
+        """
+        encoder = options["encoder"]
+        randomize = options["randomize"]
+        result_cache = options.get("result_cache")
+        resize = options.get("resize")
+        start = time.perf_counter()
+        made = [None] * len(jobs)
+        keys = [None] * len(jobs)
+        with span("batch"):
+            annotate(mode=jobs[0]["render_mode"])
+            loaded = []
+            for job in jobs:
+                with span("load"):
+                    loaded.append(_read_image(job["image_path"], resize))
+                unshare(job["output_path"])
+
+            if result_cache is not None:
+                for k, (job, (_, _, image)) in enumerate(zip(jobs, loaded)):
+                    with span("hash"):
+                        selected_mode, colors, kwargs, _ = self._draw_settings(
+                            job["seed"], job["mode"], randomize
+                        )
+                        settings = _settings(job["seed"], selected_mode, colors, kwargs)
+                        keys[k] = result_key(hash_pixels(image), settings, encoder)
+                    with span("fetch"):
+                        if result_cache.fetch(
+                            keys[k], encoder.extension, job["output_path"]
+                        ):
+                            made[k] = {**settings, "cached": True}
+
+            # Jobs repeating another's work in the batch copy its output
+            missing, repeats, first = [], {}, {}
+            for k in range(len(jobs)):
+                if made[k] is not None:
+                    continue
+                if keys[k] is not None and keys[k] in first:
+                    repeats[k] = first[keys[k]]
+                    continue
+                first[keys[k]] = k
+                missing.append(k)
+            results = self._process_frames(
+                [loaded[k][2] for k in missing],
+                [jobs[k]["seed"] for k in missing],
+                jobs[0]["mode"],
+                randomize,
+                options["threads"],
+            )
+            for k, (result, settings) in zip(missing, results):
+                with span("save"):
+                    encoder.save(result, jobs[k]["output_path"])
+                if keys[k] is not None:
+                    with span("store"):
+                        result_cache.store(
+                            keys[k], encoder.extension, jobs[k]["output_path"]
+                        )
+                made[k] = settings
+            for k, original in repeats.items():
+                with span("save"):
+                    shutil.copyfile(
+                        jobs[original]["output_path"], jobs[k]["output_path"]
+                    )
+                made[k] = {**made[original], "cached": True}
+
+        seconds = (time.perf_counter() - start) / len(jobs)
+        entries = []
+        for job, (stat, data, _), settings in zip(jobs, loaded, made):
+            cached = settings.pop("cached", False)
+            entry = _manifest_entry(
+                job["image_path"],
+                stat,
+                data,
+                randomize,
+                encoder,
+                {"output": os.path.basename(job["output_path"]), **settings},
+                seconds,
+                resize,
+            )
+            if cached:
+                entry["cached"] = True
+            entries.append(entry)
+        return entries
+
     def process_directory(
-        self, input_folder, output_folder, mode=None, colors=None, randomize=True
+        self,
+        input_folder,
+        output_folder,
+        mode=None,
+        colors=None,
+        randomize=True,
+        force=False,
+        only_changed=False,
+        seed=None,
+        shard=None,
+        encoder=None,
+        tile_size=None,
+        pool=None,
+        workers=1,
+        cost_model=None,
+        memory_budget=None,
+        threads=None,
+        animation=None,
+        variants=1,
+        result_cache=None,
+        seed_by="name",
+        resize=None,
     ):
         """
         Process all PNG images in a directory, applying backgrounds.
 
+        A manifest in the output folder records each input's size, mtime
+        and hash together with the seed, mode, colors and parameters used,
+        so reruns skip outputs that are already up to date and interrupted
+        runs resume where they stopped.
+
+        Each image is seeded from the run seed and its relative path, so
+        results do not depend on processing order and the input set can be
+        split across machines with `shard`. Seeded by content instead,
+        byte-identical inputs get identical backgrounds, so with a result
+        cache only one of them is rendered.
+
+        Before processing, each image's mode and parameters are worked out
+        from its seed and its size is read from the file header, so the
+        cost of every job can be estimated. Jobs are then run longest
+        first across `workers` processes, with a running ETA. Small images
+        of the same size and mode are run in batches when the mode has a
+        batch renderer (see _batch_jobs).
+
         Args:
             input_folder: Path to folder containing input images
             output_folder: Path to save processed images
             mode: Background mode to apply (or None for random)
             colors: Colors to use (or None for random)
             randomize: Whether to randomize modes and colors
+            force: Reprocess every image, ignoring the manifest
+            only_changed: Only reprocess new or modified inputs, even if
+                the requested mode, run seed or encoder settings differ
+                from the recorded ones
+            seed: Run-level seed (or None for a fresh random one)
+            shard: (index, count) tuple selecting a deterministic subset
+                of the inputs, or None to process all of them
+            encoder: Encoder with the output format and options
+                (or None for PNG with default settings)
+            tile_size: Render in bands of about tile_size**2 pixels to
+                bound memory for very large images (see process_file)
+            pool: BackgroundPool to take pre-rendered backgrounds from
+            workers: Number of worker processes (1 processes in this one)
+            cost_model: CostModel used to order the jobs and estimate the
+                time remaining (or None for the default model)
+            memory_budget: Bytes the run may use for image processing (or
+                None for no limit). Images too large for a worker's share
+                are tiled, and fewer images run at once when the
+                estimates of the running ones would exceed it.
+            threads: Threads each worker renders bands of a background
+                with (None for an even share of the CPUs across workers;
+                more than that share is reduced to it)
+            animation: Animation settings to save animated backgrounds
+                instead (random modes are then drawn from the animated ones)
+            variants: Number of backgrounds to give each image, saved as
+                name_v0, name_v1, ... from a single decode (see
+                process_file)
+            result_cache: ResultCache that outputs rendered before with
+                the same pixels and settings are copied or hardlinked
+                from, instead of rendering them again
+            seed_by: Seed each image from its file name ("name") or from
+                the SHA-256 of its contents ("content")
+            resize: Resize giving the output size of each image; outputs
+                made at another size are reprocessed (see process_file)
         """
-        from rbgen.color_schemes.color_utils import generate_color_pair
+        # Outputs made from another run seed are stale, unless no seed is
+        # given (a fresh one is drawn each run)
+        required_seed = seed
+        if seed is None:
+            seed = new_run_seed()
+        if encoder is None:
+            encoder = Encoder()
+        if cost_model is None:
+            cost_model = CostModel()
+        if seed_by not in ("name", "content"):
+            raise ValueError(f"Unknown seed_by value: {seed_by}")
+        if animation is not None and not randomize:
+            from rbgen.backgrounds.animation import animated_modes
+
+            if mode not in animated_modes():
+                raise ValueError(f"Background mode '{mode}' cannot be animated")
 
         os.makedirs(output_folder, exist_ok=True)
+        manifest = Manifest(output_folder)
+        # Outputs made with another mode are stale unless only_changed is set
+        required_mode = None if (randomize or only_changed) else mode
+        skipped = 0
+        jobs = []
 
-        for filename in os.listdir(input_folder):
-            if filename.lower().endswith(".png"):
+        with span("plan_jobs"):
+            for filename in sorted(os.listdir(input_folder)):
+                if not filename.lower().endswith(".png"):
+                    continue
+                if not in_shard(filename, shard):
+                    continue
                 image_path = os.path.join(input_folder, filename)
-                image = Image.open(image_path).convert("RGBA")
+                if animation is not None:
+                    output_name = animation.output_name(filename)
+                else:
+                    output_name = encoder.output_name(filename)
+                # Recorded under the name of the first variant
+                recorded_name = output_name
+                if variants > 1:
+                    recorded_name = variant_name(output_name, 0)
 
-                if randomize:
-                    # Get random mode
-                    selected_mode = random.choice(
-                        list(self.background_functions.keys())
-                    )
-                    # Get random color pair
-                    selected_colors = generate_color_pair()
-
-                    # Prepare additional parameters for specific modes
-                    kwargs = {}
-                    if selected_mode == "gradient":
-                        kwargs["direction"] = random.choice(
-                            ["horizontal", "vertical", "diagonal", "radial"]
-                        )
-                    elif selected_mode == "radial_pattern":
-                        kwargs["num_rays"] = random.randint(4, 32)
-                    elif selected_mode == "perlin_noise":
-                        kwargs["scale"] = random.uniform(0.05, 0.3)
-                        kwargs["octaves"] = random.randint(3, 8)
-                    elif selected_mode == "marble":
-                        kwargs["turbulence"] = random.uniform(3.0, 8.0)
-                    elif selected_mode == "cloud":
-                        kwargs["scale"] = random.uniform(10.0, 30.0)
-                        kwargs["octaves"] = random.randint(3, 6)
+                if not force and manifest.is_up_to_date(
+                    filename,
+                    image_path,
+                    output=recorded_name,
+                    mode=required_mode,
+                    variants=variants,
+                    resize=resize.describe() if resize is not None else None,
+                    seed=None if only_changed else required_seed,
+                    seed_by=seed_by,
+                    encoding=None if only_changed else encoder.describe(),
+                ):
+                    skipped += 1
+                    continue
+
+                if seed_by == "content":
+                    with span("hash"):
+                        seed_key = "sha256/" + hash_file(image_path)
                 else:
-                    selected_mode = mode
-                    # Do `selected_colors = colors` to re-use the same colors
-                    # Or to use random colors every image:
-                    selected_colors = generate_color_pair()
-                    
-                    kwargs = {} # For non-random mode, kwargs passed separately
-
-                # Process the image
-                processed_image = self.process_image(
-                    image, selected_mode, selected_colors, **kwargs
+                    seed_key = filename
+                jobs.append(
+                    self._plan_job(
+                        filename,
+                        image_path,
+                        os.path.join(output_folder, output_name),
+                        mode,
+                        randomize,
+                        derive_seed(seed, seed_key),
+                        pool,
+                        cost_model,
+                        animation,
+                        variants,
+                        resize,
+                    )
                 )
 
-                # Save the processed image
-                output_path = os.path.join(output_folder, filename)
-                processed_image.save(output_path)
+        if skipped:
+            print(f"Skipped {skipped} up-to-date image(s)")
+
+        # Most expensive first, so the run does not end on one slow image
+        jobs = order_jobs(jobs)
+        self._fit_memory(
+            jobs, tile_size, encoder, memory_budget, workers, animation is not None
+        )
+        progress = Progress(sum(job["cost"] for job in jobs), workers)
+        if jobs:
+            print(
+                f"Processing {len(jobs)} image(s), estimated "
+                f"{format_duration(progress.eta())} with {workers} worker(s)"
+            )
+            largest = max(jobs, key=lambda job: job["memory"])
+            print(
+                f"Estimated peak memory per image: up to "
+                f"{format_bytes(largest['memory'])} ({largest['filename']})"
+            )
+            if memory_budget and largest["memory"] > memory_budget:
+                print(
+                    f"Warning: {largest['filename']} is estimated to need more "
+                    f"than the {format_bytes(memory_budget)} memory budget"
+                )
+        options = {
+            "randomize": randomize,
+            "encoder": encoder,
+            "pool": pool,
+            "threads": threads_per_worker(workers, threads),
+        }
+        if animation is not None:
+            options["animation"] = animation
+        if variants > 1:
+            options["variants"] = variants
+        if result_cache is not None:
+            options["result_cache"] = result_cache
+        if resize is not None:
+            options["resize"] = resize
+        units = self._batch_jobs(jobs, options)
+        served = 0
+
+        try:
+            for job, entry in self._run_jobs(units, options, workers, memory_budget):
+                entry["run_seed"] = seed
+                entry["seed_by"] = seed_by
+                manifest.record(entry)
+                progress.update(job["cost"])
+                served += entry.get("cached", False)
+
+                modes = [variant["mode"] for variant in entry.get("variants", [entry])]
+                print(
+                    f"Processed: {job['filename']} with {', '.join(modes)} "
+                    f"background{'s' if len(modes) > 1 else ''} "
+                    f"{'(cached) ' if entry.get('cached') else ''}"
+                    f"({progress.done}/{len(jobs)}, "
+                    f"ETA {format_duration(progress.eta())})"
+                )
+        finally:
+            manifest.close()
+
+        if self.background_cache is not None and self.background_cache.hits:
+            stats = self.background_cache.stats()
+            print(
+                f"Background cache: {stats['hits']} hits, {stats['misses']} misses "
+                f"({stats['hit_rate']:.0%} hit rate)"
+            )
+        if result_cache is not None:
+            evicted = result_cache.trim()
+            print(
+                f"Result cache: {served} of {len(jobs)} image(s) served, "
+                f"{evicted} entries evicted"
+            )
+
+
+# Held while a background from another package draws from the global
+# random states, which variants rendered in threads would otherwise share
+_global_random = threading.Lock()
+
+
+def variant_name(filename, index):
+    """Return the output name of one variant of an image, e.g. a_v0.png."""
+    root, extension = os.path.splitext(filename)
+    return f"{root}_v{index}{extension}"
+
+
+def _read_image(image_path, resize=None):
+    """
+    Read an input image for processing, at its output size with a Resize.
+
+    Returns:
+        tuple: (os.stat_result, file bytes, loaded PIL image)
+    """
+    stat = os.stat(image_path)
+    with open(image_path, "rb") as f:
+        data = f.read()
+    return stat, data, _decode(data, resize)
+
+
+def _decode(data, resize=None):
+    """Decode an encoded image, at its output size with a Resize."""
+    if resize is not None:
+        return resize.open(io.BytesIO(data))
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    return image
+
+
+def _manifest_entry(
+    image_path, stat, data, randomize, encoder, made, seconds, resize=None
+):
+    """
+    Build the manifest entry of a processed input.
+
+    Args:
+        image_path (str): Path of the input
+        stat (os.stat_result): Stat of the input when it was read
+        data (bytes): Contents of the input
+        randomize (bool): Whether modes and colors were randomized
+        encoder (Encoder): Encoder the output was saved with
+        made (dict): Output name, seed, mode, colors and params of the
+            (first) output
+        seconds (float): Time taken
+        resize (Resize, optional): Output size settings the image was
+            processed with
+
+    Returns:
+        dict: Manifest entry
+    """
+    entry = {
+        "input": os.path.basename(image_path),
+        "output": made["output"],
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": hash_bytes(data),
+        "seed": made["seed"],
+        "randomize": randomize,
+        "format": encoder.output_format,
+        "encoding": encoder.describe(),
+        "mode": made["mode"],
+        "colors": made["colors"],
+        "params": made["params"],
+        "seconds": round(seconds, 4),
+    }
+    if resize is not None:
+        entry["resize"] = resize.describe()
+    return entry
+
+
+def _settings(seed, mode, colors, params):
+    """Return the settings dict recorded for a background."""
+    return {
+        "seed": seed,
+        "mode": mode,
+        "colors": [list(c) for c in colors],
+        "params": params,
+    }
+
+
+def _global_random_lock(mode):
+    """Return a context holding the global random states for a mode, if used."""
+    if MODES.accepts_rng(mode):
+        return contextlib.nullcontext()
+    return _global_random
+
+
+def _run_variants(tasks, threads):
+    """
+    Run the variants of one image, concurrently when threads allow.
+
+    Each task is called with the number of threads to render with: the
+    threads are shared out across variants first, and what is left over
+    goes to rendering each one in bands. With several variants, each runs
+    in its own "variant" span, so its mode is not set on the image span
+    the others share.
+
+    Returns:
+        list: Task results, in order
+    """
+    if len(tasks) == 1:
+        return [tasks[0](threads)]
+    if threads <= 1:
+        return [_run_variant(task, threads) for task in tasks]
+    concurrent = min(threads, len(tasks))
+    band_threads = threads // concurrent
+    with ThreadPoolExecutor(max_workers=concurrent) as executor:
+        futures = [
+            executor.submit(
+                contextvars.copy_context().run, _run_variant, task, band_threads
+            )
+            for task in tasks
+        ]
+        return [future.result() for future in futures]
 
-                print(f"Processed: {filename} with {selected_mode} background")
+
+def _run_variant(task, threads):
+    """Run the task of one variant in its own span (see _run_variants)."""
+    with span("variant"):
+        return task(threads)
+
+
+# Processor of the current worker process (see _init_worker)
+_worker_processor = None
+
+
+def _init_worker(processor_class, cache_bytes):
+    """Create the processor used by a worker process."""
+    global _worker_processor
+    _worker_processor = processor_class(cache_bytes=cache_bytes)
+
+
+def _run_worker_job(job, options, profile=False):
+    """
+    Process one job, or unit of jobs, in a worker process.
+
+    Returns:
+        tuple: (manifest entries, span totals if profile is set, else None)
+    """
+    if not profile:
+        return _worker_processor._run_unit(job, options), None
+    timer = StageTimer()
+    with profiling(timer):
+        entries = _worker_processor._run_unit(job, options)
+    return entries, timer.totals()
+
+
+def _run_sample_job(
+    data, seed, mode, randomize, encoder, threads, result_cache=None, resize=None
+):
+    """Process one encoded tar member in a worker process (see process_tar)."""
+    return _worker_processor._process_sample(
+        data,
+        seed,
+        mode,
+        randomize,
+        encoder,
+        threads,
+        result_cache=result_cache,
+        resize=resize,
+    )
+
+
+def _run_export_job(
+    path, indexes, image_paths, seeds, mode, randomize, threads, resize
+):
+    """Export a batch of images into their array slots (see export_arrays)."""
+    return _worker_processor._export_frames(
+        path, indexes, image_paths, seeds, mode, randomize, threads, resize
+    )
+
+
+def _run_frame_job(handle, seed, mode, randomize, threads):
+    """
+    Give the frame in a shared memory slot a background, in place.
+
+    Returns:
+        dict: Settings used (the result is left in the slot)
+    """
+    frame = attach(handle)
+    image = Image.fromarray(frame)
+    with span("image"):
+        result, settings = _worker_processor._process_frame(
+            image, seed, mode, randomize, threads
+        )
+    frame[...] = np.asarray(result)
+    return settings
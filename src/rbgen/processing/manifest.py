@@ -0,0 +1,202 @@
+# src/rbgen/processing/manifest.py
+import hashlib
+import json
+import os
+
+MANIFEST_NAME = ".rbgen_manifest.jsonl"
+
+
+def hash_bytes(data):
+    """Return the hex SHA-256 digest of an input file's contents."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path, chunk_size=1 << 20):
+    """Return the hex SHA-256 digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Manifest:
+    """
+    Record of processed images kept in the output directory.
+
+    The manifest is an append-only JSON Lines file: one entry is appended
+    (and flushed) after each output is saved, so an interrupted run leaves
+    a valid record of everything finished so far. Later lines override
+    earlier ones for the same input, and a truncated last line is ignored.
+    Runs over different shards of the inputs can share one output
+    directory: each merges the entries on disk when it rewrites the file.
+    """
+
+    def __init__(self, output_folder, filename=MANIFEST_NAME):
+        """
+        Load the manifest for an output directory, if one exists.
+
+        Args:
+            output_folder: Directory holding the processed images
+            filename: Name of the manifest file inside output_folder
+        """
+        self.output_folder = output_folder
+        self.path = os.path.join(output_folder, filename)
+        self._handle = None
+        # Inputs recorded by this process, kept over other runs' entries
+        self._recorded = set()
+        self.entries, self._unterminated = self._read()
+
+    def _read(self):
+        """
+        Read the entries on disk.
+
+        Returns:
+            tuple: (entries by input name, whether the file ends without a
+                newline, i.e. in a truncated line)
+        """
+        entries = {}
+        unterminated = False
+        if not os.path.exists(self.path):
+            return entries, unterminated
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                unterminated = not line.endswith("\n")
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Partial line written when a previous run was killed
+                    continue
+                entries[entry["input"]] = entry
+        return entries, unterminated
+
+    def get(self, name):
+        """Return the recorded entry for an input name, or None."""
+        return self.entries.get(name)
+
+    def is_up_to_date(
+        self,
+        name,
+        input_path,
+        output=None,
+        mode=None,
+        variants=1,
+        resize=None,
+        seed=None,
+        seed_by="name",
+        encoding=None,
+    ):
+        """
+        Check whether an input's recorded output can be reused.
+
+        The output must still exist and the input must be unchanged: a
+        matching size and mtime is trusted as is, otherwise the contents
+        are hashed and compared, so touched or copied files are not
+        reprocessed.
+
+        Args:
+            name: Input name as recorded in the manifest
+            input_path: Path of the input file
+            output: Expected output name. If given, the recorded output
+                must have this name (e.g. the same output format).
+            mode: Requested background mode. If given, the recorded mode
+                must match it as well (None accepts any recorded mode).
+            variants: Requested number of variants. The same number must
+                have been recorded, and each of their outputs must exist.
+            resize: Requested output size settings (Resize.describe()),
+                or None for full size. They must match the recorded ones.
+            seed: Requested run seed. If given, the recorded run seed and
+                seed_by must match it (None accepts any recorded seed).
+            seed_by: Requested way of seeding images ("name" or "content")
+            encoding: Requested encoder settings (Encoder.describe()). If
+                given, they must match the recorded ones.
+
+        Returns:
+            bool: True if the input can be skipped
+        """
+        entry = self.entries.get(name)
+        if entry is None:
+            return False
+        if output is not None and entry["output"] != output:
+            return False
+        if mode is not None and entry.get("mode") != mode:
+            return False
+        if entry.get("resize") != resize:
+            return False
+        if seed is not None and (
+            entry.get("run_seed") != seed or entry.get("seed_by", "name") != seed_by
+        ):
+            return False
+        if encoding is not None and entry.get("encoding") != encoding:
+            return False
+        recorded = entry.get("variants", [entry])
+        if len(recorded) != variants:
+            return False
+        for variant in recorded:
+            if not os.path.exists(os.path.join(self.output_folder, variant["output"])):
+                return False
+
+        stat = os.stat(input_path)
+        if stat.st_size != entry["size"]:
+            return False
+        if stat.st_mtime_ns == entry["mtime_ns"]:
+            return True
+        return hash_file(input_path) == entry["sha256"]
+
+    def record(self, entry):
+        """
+        Append an entry for a finished output and flush it to disk.
+
+        Args:
+            entry: Dict with at least "input", "output", "size",
+                "mtime_ns" and "sha256" keys
+        """
+        self.entries[entry["input"]] = entry
+        self._recorded.add(entry["input"])
+        if self._handle is not None and self._replaced():
+            # Another run sharing the directory rewrote the file
+            self._handle.close()
+            self._handle = None
+        if self._handle is None:
+            self._handle = open(self.path, "a", encoding="utf-8")
+            if self._unterminated:
+                # End the partial line, so it is not merged with this entry
+                self._handle.write("\n")
+                self._unterminated = False
+        self._handle.write(json.dumps(entry, sort_keys=True) + "\n")
+        self._handle.flush()
+
+    def _replaced(self):
+        """Check whether the open file is no longer the one at self.path."""
+        try:
+            current = os.stat(self.path)
+        except FileNotFoundError:
+            return True
+        return not os.path.samestat(os.fstat(self._handle.fileno()), current)
+
+    def close(self):
+        """
+        Close the manifest and rewrite it with one line per input.
+
+        Entries other runs added to the file in the meantime (e.g. other
+        shards writing to the same directory) are kept; for inputs this
+        run recorded, its own entries win.
+        """
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+        entries, _ = self._read()
+        for name in self._recorded:
+            entries[name] = self.entries[name]
+        self.entries = entries
+        if not entries:
+            return
+        # Named per process, so runs closing at once do not share it
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for name in sorted(entries):
+                f.write(json.dumps(entries[name], sort_keys=True) + "\n")
+        os.replace(tmp_path, self.path)
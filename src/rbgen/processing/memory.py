@@ -0,0 +1,167 @@
+# src/rbgen/processing/memory.py
+import math
+
+# Peak working set of each built-in region renderer:
+#   mode: (bytes per rendered pixel, padding in pixels around each region)
+# Measured with tracemalloc on 512x512 and 1024x1024 renders at default
+# parameters, plus the Pillow buffers tracemalloc does not see (drawing
+# canvases, supersampled line canvases and blurred copies). The padding
+# is what filtering renderers add around the requested box.
+DEFAULT_MODE_MEMORY = {
+    "solid": (4, 0),
+    # Float64 sample coordinates of the 3x3 supersampled rotated pattern
+    "striped": (64, 0),
+    "checkered": (64, 0),
+    "perspective_checkered": (100, 0),
+    # Complex-plane coordinates and the escape-time arrays
+    "mandelbrot": (84, 0),
+    "nested_polygons": (16, 4),
+    "geometric_shapes": (12, 0),
+    "concentric_shapes": (32, 0),
+    # Canvas drawn at LINE_SCALE_FACTOR**2 the area, then resampled
+    "line": (32, 6),
+    "wavy_line": (32, 6),
+    "perlin_noise": (72, 0),
+    "gradient": (4, 0),
+    "radial_pattern": (24, 0),
+    # Several float64 noise and warp fields, then a blurred copy
+    "marble": (150, 7),
+    "cloud": (80, 8),
+    "waves": (8, 0),
+}
+
+# Assumed for modes that do not declare their memory use
+UNKNOWN_MODE_MEMORY = (128, 0)
+
+# Decoded input plus its RGBA conversion, per image pixel
+IMAGE_BYTES_PER_PIXEL = 8
+
+# Background image, composited result and flattened copy for encoding
+COMPOSE_BYTES_PER_PIXEL = 16
+
+# Assembling a tiled result for formats that cannot be streamed
+ASSEMBLE_BYTES_PER_PIXEL = 7
+
+# Bands never get thinner than this, however tight the budget
+MIN_TILE_SIZE = 64
+
+
+def mode_memory(mode):
+    """
+    Return the declared memory use of a background mode.
+
+    Modes from other packages declare theirs with `peak_bytes_per_pixel`
+    and optionally `memory_margin` attributes on their apply function.
+
+    Args:
+        mode (str): Background mode, or None for a pre-rendered background
+
+    Returns:
+        tuple: (bytes per rendered pixel, padding in pixels)
+    """
+    if mode is None:
+        # A pool crop: only the copied background pixels
+        return 4, 0
+    if mode in DEFAULT_MODE_MEMORY:
+        return DEFAULT_MODE_MEMORY[mode]
+    from rbgen.backgrounds.registry import MODES
+
+    if mode in MODES:
+        apply = MODES[mode]
+        if hasattr(apply, "peak_bytes_per_pixel"):
+            return apply.peak_bytes_per_pixel, getattr(apply, "memory_margin", 0)
+    return UNKNOWN_MODE_MEMORY
+
+
+def render_bytes(mode, size, rows=None):
+    """
+    Estimate the peak memory of rendering a background, or one band of it.
+
+    Args:
+        mode (str): Background mode (None for a pre-rendered background)
+        size (tuple): (width, height) of the image
+        rows (int, optional): Height of the band (default: the whole image)
+
+    Returns:
+        int: Estimated bytes
+    """
+    width, height = size
+    bytes_per_pixel, margin = mode_memory(mode)
+    rows = height if rows is None else min(rows, height)
+    return bytes_per_pixel * (width + 2 * margin) * (rows + 2 * margin)
+
+
+def band_rows(size, tile_size):
+    """Return the height of the bands iter_bands splits an image into."""
+    return max(1, tile_size * tile_size // max(size[0], 1))
+
+
+def estimate_memory(mode, size, tile_size=None, streamed=True, file_bytes=0):
+    """
+    Estimate the peak working set of processing one image.
+
+    Untiled, the decoded input is held while the full background renders,
+    then composited and encoded. Tiled, only one band of background and
+    result exists at a time, plus the assembled output when the format
+    cannot be streamed.
+
+    Args:
+        mode (str): Background mode (None for a pre-rendered background)
+        size (tuple): (width, height) of the image
+        tile_size (int, optional): Band size, as for process_file
+        streamed (bool): Whether tiled output is streamed to disk
+        file_bytes (int): Size of the encoded input file
+
+    Returns:
+        int: Estimated bytes
+    """
+    width, height = size
+    pixels = width * height
+    if not tile_size:
+        stages = max(render_bytes(mode, size), COMPOSE_BYTES_PER_PIXEL * pixels)
+        return file_bytes + IMAGE_BYTES_PER_PIXEL * pixels + stages
+
+    rows = min(band_rows(size, tile_size), height)
+    band = max(render_bytes(mode, size, rows), COMPOSE_BYTES_PER_PIXEL * width * rows)
+    return _tiled_fixed_bytes(size, streamed, file_bytes) + band
+
+
+def _tiled_fixed_bytes(size, streamed, file_bytes):
+    """Memory held for the whole of a tiled run, whatever the band size."""
+    pixels = size[0] * size[1]
+    # Bands are cropped from the decoded input, which is not converted
+    total = file_bytes + IMAGE_BYTES_PER_PIXEL // 2 * pixels
+    if not streamed:
+        total += ASSEMBLE_BYTES_PER_PIXEL * pixels
+    return total
+
+
+def fit_tile_size(mode, size, budget, streamed=True, file_bytes=0):
+    """
+    Find the largest band size whose working set fits in a budget.
+
+    Args:
+        mode (str): Background mode
+        size (tuple): (width, height) of the image
+        budget (int): Bytes available to the image
+        streamed (bool): Whether tiled output is streamed to disk
+        file_bytes (int): Size of the encoded input file
+
+    Returns:
+        int: tile_size for process_file (at least MIN_TILE_SIZE)
+    """
+    width, height = size
+    bytes_per_pixel, margin = mode_memory(mode)
+    per_row = max(bytes_per_pixel, COMPOSE_BYTES_PER_PIXEL) * (width + 2 * margin)
+    available = budget - _tiled_fixed_bytes(size, streamed, file_bytes)
+    rows = min(available // per_row - 2 * margin, height)
+    return max(math.isqrt(max(rows, 1) * width), MIN_TILE_SIZE)
+
+
+def format_bytes(count):
+    """Format a byte count as e.g. "512 KiB", "37.5 MiB" or "1.2 GiB"."""
+    if count < 2**20:
+        return f"{count / 2**10:.0f} KiB"
+    if count < 2**30:
+        return f"{count / 2**20:.1f} MiB"
+    return f"{count / 2**30:.1f} GiB"
@@ -0,0 +1,199 @@
+# src/rbgen/processing/pool.py
+import json
+import os
+import numpy as np
+from PIL import Image
+from rbgen.backgrounds.regions import plan_background, render_background
+from rbgen.backgrounds.utils import ImageRandom
+from rbgen.processing.seeding import derive_seed, new_run_seed
+
+POOL_DATA_NAME = "pool.bin"
+POOL_INDEX_NAME = "pool.json"
+
+# Pool backgrounds are stored as raw RGBA rows
+POOL_CHANNELS = 4
+
+
+def parse_size(value):
+    """
+    Parse a size bucket of the form "WxH".
+
+    Args:
+        value (str): Width and height, e.g. "1024x768"
+
+    Returns:
+        tuple: (width, height)
+    """
+    try:
+        width, height = (int(part) for part in value.lower().split("x"))
+    except ValueError:
+        raise ValueError(f"Invalid size '{value}', expected the form WxH")
+    if width < 1 or height < 1:
+        raise ValueError(f"Invalid size '{value}', need positive dimensions")
+    return width, height
+
+
+def build_pool(pool_folder, sizes, modes, count=8, seed=None, processor=None):
+    """
+    Pre-render backgrounds into a pool folder.
+
+    Renders `count` backgrounds for every mode and size bucket and writes
+    them back to back into one raw uint8 file, with a JSON index giving
+    each background's offset, mode, size, colors and parameters.
+
+    Args:
+        pool_folder (str): Directory to write the pool into
+        sizes (list): (width, height) size buckets
+        modes (list): Background modes to render
+        count (int): Number of backgrounds per mode and size bucket
+        seed (int, optional): Pool seed (None for a fresh random one)
+        processor (ImageProcessor, optional): Processor used to draw colors
+            and parameters (a new one is created if omitted)
+
+    Returns:
+        dict: The pool index
+    """
+    from rbgen.color_schemes.color_utils import generate_color_pair
+
+    if processor is None:
+        from rbgen.processing.image_processor import ImageProcessor
+
+        processor = ImageProcessor(cache_bytes=0)
+    if seed is None:
+        seed = new_run_seed()
+
+    os.makedirs(pool_folder, exist_ok=True)
+    data_path = os.path.join(pool_folder, POOL_DATA_NAME)
+    entries = []
+    offset = 0
+
+    with open(data_path + ".tmp", "wb") as f:
+        for mode in modes:
+            for width, height in sizes:
+                for i in range(count):
+                    name = f"pool/{mode}/{width}x{height}/{i}"
+                    background_seed = derive_seed(seed, name)
+                    rng = ImageRandom(background_seed)
+                    colors = generate_color_pair(rng)
+                    params = processor._random_params(mode, rng)
+                    rng = processor._background_rng(mode, background_seed, rng)
+                    spec = plan_background(
+                        mode, (width, height), colors, rng=rng, **params
+                    )
+                    f.write(render_background(spec).tobytes())
+
+                    entries.append(
+                        {
+                            "mode": mode,
+                            "size": [width, height],
+                            "offset": offset,
+                            "seed": background_seed,
+                            "colors": [list(c) for c in colors],
+                            "params": params,
+                        }
+                    )
+                    offset += width * height * POOL_CHANNELS
+                print(f"Rendered {count} {mode} background(s) at {width}x{height}")
+
+    index = {"seed": seed, "channels": POOL_CHANNELS, "entries": entries}
+    index_path = os.path.join(pool_folder, POOL_INDEX_NAME)
+    with open(index_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    os.replace(data_path + ".tmp", data_path)
+    os.replace(index_path + ".tmp", index_path)
+    return index
+
+
+class BackgroundPool:
+    """
+    Read-only view of a pre-rendered background pool.
+
+    The pool file is memory-mapped, so picking a background costs a page
+    cache read rather than a render or a decode, and worker processes
+    opening the same pool share its pages. Pickling only carries the
+    folder path; each process maps the file itself.
+    """
+
+    def __init__(self, pool_folder):
+        """
+        Open a pool written by build_pool.
+
+        Args:
+            pool_folder (str): Directory holding the pool files
+        """
+        self.pool_folder = pool_folder
+        with open(os.path.join(pool_folder, POOL_INDEX_NAME), encoding="utf-8") as f:
+            index = json.load(f)
+        self.entries = index["entries"]
+        self.data = np.memmap(
+            os.path.join(pool_folder, POOL_DATA_NAME), dtype=np.uint8, mode="r"
+        )
+
+        # Entry indices grouped by mode, then by size bucket
+        self.buckets = {}
+        for i, entry in enumerate(self.entries):
+            size = tuple(entry["size"])
+            self.buckets.setdefault(entry["mode"], {}).setdefault(size, []).append(i)
+
+    def __getstate__(self):
+        return {"pool_folder": self.pool_folder}
+
+    def __setstate__(self, state):
+        self.__init__(state["pool_folder"])
+
+    @property
+    def modes(self):
+        """Background modes available in the pool."""
+        return sorted(self.buckets)
+
+    def _choose_bucket(self, mode, size):
+        """Pick the smallest bucket covering size, or the largest one."""
+        buckets = self.buckets[mode]
+        covering = [b for b in buckets if b[0] >= size[0] and b[1] >= size[1]]
+        if covering:
+            return min(covering, key=lambda b: b[0] * b[1])
+        return max(buckets, key=lambda b: b[0] * b[1])
+
+    def array(self, index):
+        """Return pool background `index` as a read-only (H, W, 4) array."""
+        entry = self.entries[index]
+        width, height = entry["size"]
+        start = entry["offset"]
+        pixels = self.data[start : start + width * height * POOL_CHANNELS]
+        return pixels.reshape(height, width, POOL_CHANNELS)
+
+    def pick(self, size, seed, mode=None):
+        """
+        Pick a background for an image by seed.
+
+        The smallest size bucket covering the image is used and centre
+        cropped; if no bucket is large enough, the largest one is resized.
+
+        Args:
+            size (tuple): (width, height) of the image
+            seed (int): Per-image seed
+            mode (str, optional): Background mode (None picks any mode)
+
+        Returns:
+            tuple: (pool entry dict, RGBA PIL.Image of the given size)
+        """
+        if mode is None:
+            mode = self.modes[seed % len(self.modes)]
+        elif mode not in self.buckets:
+            raise ValueError(f"Background mode '{mode}' is not in the pool")
+
+        candidates = self.buckets[mode][self._choose_bucket(mode, size)]
+        # Use the high bits, so the choice is independent of the mode choice
+        index = candidates[(seed >> 32) % len(candidates)]
+        pixels = self.array(index)
+
+        width, height = size
+        bucket_height, bucket_width = pixels.shape[:2]
+        if bucket_width >= width and bucket_height >= height:
+            left = (bucket_width - width) // 2
+            top = (bucket_height - height) // 2
+            pixels = pixels[top : top + height, left : left + width]
+            background = Image.fromarray(np.ascontiguousarray(pixels))
+        else:
+            background = Image.fromarray(np.asarray(pixels)).resize(size)
+        return self.entries[index], background
@@ -0,0 +1,100 @@
+# src/rbgen/processing/resizing.py
+"""
+Output resolution of processed images.
+
+Results are often scaled down to thumbnails right after processing, so a
+background rendered at the input's full resolution is mostly thrown away.
+With a Resize, each foreground is brought to the output size once, as it
+is decoded, and the background is rendered directly at that size: the
+cost of an image then follows its output pixels, not its input pixels.
+"""
+from PIL import Image
+
+# Pillow reduces by an integer factor (a box average) until the image is
+# within this factor of the output size, then resamples the rest (as in
+# Image.thumbnail)
+REDUCING_GAP = 2.0
+
+
+class Resize:
+    """
+    Settings for the output size of processed images.
+    """
+
+    def __init__(self, max_size=None, target_size=None):
+        """
+        Configure the output size.
+
+        Args:
+            max_size (int, optional): Longest side of the output; larger
+                inputs are scaled down, smaller ones are kept as they are
+            target_size (tuple, optional): (width, height) box every
+                output is scaled to fit, up or down, keeping its aspect
+                ratio
+        """
+        if max_size is not None and max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        if target_size is not None:
+            target_size = tuple(target_size)
+            if len(target_size) != 2 or min(target_size) < 1:
+                raise ValueError("target_size must be a positive (width, height)")
+        self.max_size = max_size
+        self.target_size = target_size
+
+    def describe(self):
+        """Return the settings as a dict, as recorded in the manifest."""
+        settings = {}
+        if self.max_size is not None:
+            settings["max_size"] = self.max_size
+        if self.target_size is not None:
+            settings["target_size"] = list(self.target_size)
+        return settings
+
+    def output_size(self, size):
+        """
+        Return the output size of an image.
+
+        Args:
+            size (tuple): (width, height) of the input
+
+        Returns:
+            tuple: (width, height) of the output
+        """
+        width, height = size
+        scale = 1.0
+        if self.target_size is not None:
+            scale = min(self.target_size[0] / width, self.target_size[1] / height)
+        if self.max_size is not None:
+            scale = min(scale, self.max_size / max(width, height))
+        if scale == 1.0:
+            return size
+        return max(1, round(width * scale)), max(1, round(height * scale))
+
+    def apply(self, image):
+        """Return a loaded image scaled to its output size."""
+        size = self.output_size(image.size)
+        if size == image.size:
+            return image
+        # RGBA is resampled with premultiplied alpha, so fully
+        # transparent pixels do not bleed their color into the edges
+        return image.resize(size, Image.Resampling.LANCZOS, reducing_gap=REDUCING_GAP)
+
+    def open(self, fp):
+        """
+        Decode an image at its output size.
+
+        Formats that can decode at a reduced scale (JPEG) skip the detail
+        that would be thrown away; others are decoded in full and reduced.
+
+        Args:
+            fp: Path or binary file object of the image
+
+        Returns:
+            PIL.Image: Loaded image
+        """
+        image = Image.open(fp)
+        size = self.output_size(image.size)
+        if size != image.size:
+            image.draft(None, size)
+        image.load()
+        return self.apply(image)
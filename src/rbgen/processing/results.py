@@ -0,0 +1,278 @@
+# src/rbgen/processing/results.py
+"""
+Persistent, content-addressed cache of encoded results.
+
+A result is keyed by a hash of the input's pixels together with
+everything that decides the output: the mode, colors, parameters and
+seed, and the encoder settings. Reruns of the same work, and
+byte-identical inputs given the same settings (see the "content" seeds
+of process_directory), are then served from the cache instead of being
+rendered again.
+
+Entries are plain files (<key[:2]>/<key><extension>) under the cache
+directory, which several processes may share. Each is written to a
+temporary file and renamed into place, so no reader ever sees a partial
+entry. Hits refresh an entry's mtime, and entries least recently used
+are evicted once the cache grows past its size cap.
+"""
+import hashlib
+import json
+import os
+import shutil
+import uuid
+
+# Default size cap of the cache
+DEFAULT_RESULT_CACHE_BYTES = 4 * 1024**3
+
+# Written bytes, as a share of the cap, after which the cache is trimmed
+TRIM_FRACTION = 0.1
+
+# Pixel bytes hashed at a time, so large inputs are not copied whole
+HASH_BAND_BYTES = 2**24
+
+
+def hash_pixels(image):
+    """Return the hex SHA-256 digest of an image's mode, size and pixels."""
+    width, height = image.size
+    digest = hashlib.sha256(f"{image.mode} {width}x{height}\n".encode())
+    rows = max(1, HASH_BAND_BYTES // max(1, width * len(image.getbands())))
+    for top in range(0, height, rows):
+        band = image.crop((0, top, width, min(height, top + rows)))
+        digest.update(band.tobytes())
+    return digest.hexdigest()
+
+
+def result_key(pixels, settings, encoder):
+    """
+    Return the cache key of a result.
+
+    Args:
+        pixels (str): hash_pixels digest of the input
+        settings (dict): Seed, mode, colors and params of the background
+        encoder (Encoder): Encoder the result is saved with
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    document = {
+        "pixels": pixels,
+        "seed": settings["seed"],
+        "mode": settings["mode"],
+        "colors": [list(c) for c in settings["colors"]],
+        "params": settings["params"],
+        "format": encoder.output_format,
+        "save": encoder.save_options(),
+        "flatten": encoder.flatten,
+    }
+    encoded = json.dumps(document, sort_keys=True)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def _replace_with(path, place):
+    """Create a file at path atomically, with place(temporary_path)."""
+    directory = os.path.dirname(path) or "."
+    temporary = os.path.join(directory, f".rbgen-{uuid.uuid4().hex}")
+    try:
+        place(temporary)
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.lexists(temporary):
+            os.unlink(temporary)
+        raise
+
+
+def unshare(path):
+    """
+    Remove an output that is hardlinked elsewhere before it is rewritten.
+
+    Outputs served by hardlink share their file with a cache entry;
+    writers truncate files in place, which would change the entry too.
+    """
+    try:
+        if os.stat(path).st_nlink > 1:
+            os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+class ResultCache:
+    """
+    On-disk cache of encoded results, bounded by bytes.
+
+    Safe to share between processes; counters are per process.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_RESULT_CACHE_BYTES, link=False):
+        """
+        Open (or create) a cache directory.
+
+        Args:
+            directory (str): Cache directory
+            max_bytes (int): Size cap; the least recently used entries
+                are evicted beyond it
+            link (bool): Serve hits by hardlinking the entry to the output
+                instead of copying it (same file system only; outputs
+                then share their storage with the cache)
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.link = link
+        self.hits = 0
+        self.misses = 0
+        self._written = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def __getstate__(self):
+        # Counters stay with the process that made them
+        return {
+            "directory": self.directory,
+            "max_bytes": self.max_bytes,
+            "link": self.link,
+        }
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def path(self, key, extension):
+        """Return the path of the entry for a key."""
+        return os.path.join(self.directory, key[:2], key + extension)
+
+    def _touch(self, path):
+        """Mark an entry as recently used; False if it does not exist."""
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return False
+        self.hits += 1
+        return True
+
+    def fetch(self, key, extension, output_path):
+        """
+        Place a cached result at an output path, if there is one.
+
+        The output is replaced atomically, by a hardlink to the entry or
+        a copy of it.
+
+        Returns:
+            bool: True on a hit
+        """
+        entry = self.path(key, extension)
+        if not self._touch(entry):
+            return False
+
+        def place(temporary):
+            if self.link:
+                try:
+                    os.link(entry, temporary)
+                    return
+                except OSError:
+                    # Across file systems, or not supported there
+                    pass
+            shutil.copyfile(entry, temporary)
+
+        try:
+            _replace_with(output_path, place)
+        except FileNotFoundError:
+            # Evicted by another process in the meantime
+            self.hits -= 1
+            self.misses += 1
+            return False
+        return True
+
+    def read(self, key, extension):
+        """Return the cached result for a key as bytes, or None on a miss."""
+        entry = self.path(key, extension)
+        if not self._touch(entry):
+            return None
+        try:
+            with open(entry, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            self.hits -= 1
+            self.misses += 1
+            return None
+
+    def store(self, key, extension, output_path):
+        """Copy a saved result into the cache."""
+        self._add(
+            key, extension, lambda temporary: shutil.copyfile(output_path, temporary)
+        )
+
+    def write(self, key, extension, data):
+        """Store an encoded result given as bytes."""
+
+        def place(temporary):
+            with open(temporary, "wb") as f:
+                f.write(data)
+
+        self._add(key, extension, place)
+
+    def _add(self, key, extension, place):
+        entry = self.path(key, extension)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        _replace_with(entry, place)
+        try:
+            self._written += os.path.getsize(entry)
+        except FileNotFoundError:
+            # Already evicted by another process
+            pass
+        if self._written > self.max_bytes * TRIM_FRACTION:
+            self.trim()
+
+    def entries(self):
+        """
+        List the cache entries.
+
+        Returns:
+            list: (mtime, size, path) of each entry
+        """
+        found = []
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.startswith("."):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                found.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        return found
+
+    def trim(self):
+        """
+        Evict the least recently used entries beyond the size cap.
+
+        Returns:
+            int: Number of entries evicted
+        """
+        self._written = 0
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            evicted += 1
+        return evicted
+
+    def stats(self):
+        """
+        Return hit-rate statistics of this process.
+
+        Returns:
+            dict: hits, misses and hit_rate
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,250 @@
+# src/rbgen/processing/scheduling.py
+import json
+import os
+import time
+from PIL import Image
+
+# Render cost of each built-in mode, in seconds per megapixel at default
+# parameters, measured from 1024x1024 renders (see CostModel.calibrate)
+DEFAULT_MODE_COSTS = {
+    "solid": 0.005,
+    "striped": 0.34,
+    "checkered": 0.35,
+    "perspective_checkered": 1.26,
+    "mandelbrot": 1.49,
+    "nested_polygons": 0.06,
+    "geometric_shapes": 0.002,
+    "concentric_shapes": 0.03,
+    "line": 0.23,
+    "wavy_line": 0.25,
+    "perlin_noise": 0.26,
+    "gradient": 0.0004,
+    "radial_pattern": 0.09,
+    "marble": 0.93,
+    "cloud": 0.31,
+    "waves": 0.01,
+}
+
+# Cost assumed for modes that have not been calibrated
+UNKNOWN_MODE_COST = 1.0
+
+# Decoding, compositing and encoding, in seconds per megapixel
+OVERHEAD_COST = 0.05
+
+
+def param_factor(mode, params):
+    """
+    Scale factor of a mode's render cost for non-default key parameters.
+
+    Args:
+        mode (str): Background mode
+        params (dict): Mode parameters, as passed to process_image
+
+    Returns:
+        float: Cost relative to the mode's default parameters
+    """
+    if mode == "mandelbrot":
+        return params.get("max_iter", 100) / 100
+    if mode == "perlin_noise":
+        return params.get("octaves", 6) / 6
+    if mode == "cloud":
+        return params.get("octaves", 4) / 4
+    if mode == "marble":
+        return params.get("octaves", 5) / 5
+    if mode == "nested_polygons":
+        # Polygons multiply by the number of sides (5.5 on average) per level
+        return 5.5 ** (params.get("depth", 4) - 4)
+    if mode == "geometric_shapes":
+        return params.get("num_shapes", 50) / 50
+    return 1.0
+
+
+def read_size(path):
+    """Return the (width, height) of an image, reading only its header."""
+    with Image.open(path) as image:
+        return image.size
+
+
+def format_duration(seconds):
+    """Format a duration in seconds as e.g. "42s", "3m05s" or "1h02m"."""
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+
+
+class CostModel:
+    """
+    Estimate of the time to process an image, by mode, size and parameters.
+
+    cost = (mode cost * parameter factor + overhead) * megapixels
+    """
+
+    def __init__(self, mode_costs=None, overhead=OVERHEAD_COST):
+        """
+        Create a cost model.
+
+        Args:
+            mode_costs (dict, optional): Seconds per megapixel for each mode
+                at default parameters (defaults to DEFAULT_MODE_COSTS)
+            overhead (float): Per-megapixel cost shared by all modes
+        """
+        self.mode_costs = dict(DEFAULT_MODE_COSTS)
+        if mode_costs:
+            self.mode_costs.update(mode_costs)
+        self.overhead = overhead
+
+    def estimate(self, mode, size, params=None):
+        """
+        Estimate the processing time of one image.
+
+        Args:
+            mode (str): Background mode, or None for a pre-rendered background
+            size (tuple): (width, height) of the image
+            params (dict, optional): Mode parameters
+
+        Returns:
+            float: Estimated seconds
+        """
+        megapixels = size[0] * size[1] / 1e6
+        render = 0.0
+        if mode is not None:
+            render = self.mode_costs.get(mode, UNKNOWN_MODE_COST)
+            render *= param_factor(mode, params or {})
+        return (render + self.overhead) * megapixels
+
+    @classmethod
+    def calibrate(cls, modes=None, size=(512, 512), repeat=3):
+        """
+        Measure the render cost of each mode on this machine.
+
+        Args:
+            modes (list, optional): Modes to measure (default: all)
+            size (tuple): (width, height) of the test renders
+            repeat (int): Renders per mode; the fastest one is used
+
+        Returns:
+            CostModel: Model with the measured costs
+        """
+        from rbgen.backgrounds.regions import plan_background, render_background
+        from rbgen.backgrounds.registry import available_modes
+        from rbgen.backgrounds.utils import ImageRandom
+        from rbgen.color_schemes.color_utils import generate_color_pair
+
+        megapixels = size[0] * size[1] / 1e6
+        mode_costs = {}
+        for mode in modes or available_modes():
+            times = []
+            for i in range(repeat):
+                rng = ImageRandom(i, numpy_seed=i)
+                spec = plan_background(mode, size, generate_color_pair(rng), rng=rng)
+                start = time.perf_counter()
+                render_background(spec)
+                times.append(time.perf_counter() - start)
+            mode_costs[mode] = min(times) / megapixels
+        return cls(mode_costs)
+
+    def save(self, path):
+        """Save the model as JSON."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"mode_costs": self.mode_costs, "overhead": self.overhead},
+                f,
+                indent=2,
+            )
+
+    @classmethod
+    def load(cls, path):
+        """Load a model saved with save()."""
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["mode_costs"], data.get("overhead", OVERHEAD_COST))
+
+
+def order_jobs(jobs):
+    """
+    Order jobs longest first, so no expensive image is left for last.
+
+    Jobs are grouped by image size, so the distance and angle fields
+    cached for a size (see backgrounds/grids.py) are reused by every
+    image of that size before they are evicted. Groups come in order of
+    their most expensive job, and jobs within a group longest first.
+
+    Args:
+        jobs (list): Job dicts with "cost" and "filename" keys, and
+            optionally "size"
+
+    Returns:
+        list: Jobs grouped by size, by decreasing cost (ties by file name)
+    """
+    groups = {}
+    for job in sorted(jobs, key=lambda job: (-job["cost"], job["filename"])):
+        groups.setdefault(tuple(job.get("size", ())), []).append(job)
+    # Dicts keep insertion order: groups by their first (longest) job
+    return [job for group in groups.values() for job in group]
+
+
+def available_cpus():
+    """Return the number of CPUs this process may run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def threads_per_worker(workers, threads=None):
+    """
+    Choose how many band-rendering threads each worker process may use.
+
+    Workers share the CPUs, so threads * workers is kept within the
+    number of available CPUs.
+
+    Args:
+        workers (int): Number of worker processes
+        threads (int, optional): Requested threads per worker (None for
+            an even share of the CPUs)
+
+    Returns:
+        int: Threads per worker (at least 1)
+    """
+    share = max(1, available_cpus() // max(workers, 1))
+    if threads is None:
+        return share
+    if threads > share:
+        print(
+            f"Using {share} thread(s) per worker instead of {threads}: "
+            f"{workers} worker(s) share {available_cpus()} CPU(s)"
+        )
+        return share
+    return max(1, threads)
+
+
+class Progress:
+    """
+    Track completed work and estimate the time remaining.
+
+    The ETA scales the estimated cost still to do by the wall-clock time
+    spent per unit of estimated cost so far, which corrects for both the
+    machine speed and the number of workers as the run goes on.
+    """
+
+    def __init__(self, total_cost, workers=1):
+        self.total_cost = total_cost
+        self.workers = workers
+        self.done_cost = 0.0
+        self.done = 0
+        self.start = time.perf_counter()
+
+    def update(self, cost):
+        """Record one finished job of the given estimated cost."""
+        self.done += 1
+        self.done_cost += cost
+
+    def eta(self):
+        """Return the estimated seconds until all jobs are finished."""
+        remaining = max(self.total_cost - self.done_cost, 0.0)
+        if self.done_cost <= 0:
+            return remaining / self.workers
+        elapsed = time.perf_counter() - self.start
+        return remaining * elapsed / self.done_cost
@@ -0,0 +1,71 @@
+# src/rbgen/processing/seeding.py
+import hashlib
+import os
+import random
+
+
+def _hash_int(text, num_bytes=8):
+    """Return a stable integer hash of a string (independent of PYTHONHASHSEED)."""
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    return int.from_bytes(digest[:num_bytes], "big")
+
+
+def new_run_seed():
+    """Draw a fresh run-level seed from the operating system's entropy source."""
+    return random.SystemRandom().randrange(2**63)
+
+
+def derive_seed(run_seed, relative_path):
+    """
+    Derive the seed for a single image from the run seed and its path.
+
+    The result only depends on the two arguments, so an image gets the
+    same background regardless of processing order, worker count or host.
+
+    Args:
+        run_seed (int): Run-level seed
+        relative_path (str): Path of the input relative to the input folder
+
+    Returns:
+        int: 64-bit per-image seed
+    """
+    return _hash_int(f"{run_seed}:{relative_path.replace(os.sep, '/')}")
+
+
+def parse_shard(value):
+    """
+    Parse a shard specification of the form "i/N".
+
+    Args:
+        value (str): Shard index and count, e.g. "0/4"
+
+    Returns:
+        tuple: (index, count)
+    """
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise ValueError(f"Invalid shard '{value}', expected the form i/N")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Invalid shard '{value}', need 0 <= i < N")
+    return index, count
+
+
+def in_shard(relative_path, shard):
+    """
+    Check whether an input belongs to a shard.
+
+    Inputs are assigned by a hash of their relative path, so every machine
+    selects the same disjoint subset without coordination.
+
+    Args:
+        relative_path (str): Path of the input relative to the input folder
+        shard (tuple): (index, count) as returned by parse_shard, or None
+
+    Returns:
+        bool: True if the input should be processed by this shard
+    """
+    if shard is None:
+        return True
+    index, count = shard
+    return _hash_int("shard:" + relative_path.replace(os.sep, "/")) % count == index
@@ -0,0 +1,87 @@
+# src/rbgen/processing/shards.py
+"""
+Tar shards as streams of samples (as used by WebDataset).
+
+Shards are read and written strictly in order ("r|" and "w|" tar modes),
+so they can be pipes. Each processed image is written back under its own
+name (with the output format's extension) followed by a "<name>.rbgen.json"
+member holding the settings it was given; other members are copied as is.
+"""
+import io
+import json
+import os
+import tarfile
+
+# Extension of the settings member written after each processed image
+PARAMS_EXTENSION = ".rbgen.json"
+
+# Paths naming a tar shard (anything else is a directory)
+TAR_EXTENSIONS = (".tar", ".tar.gz", ".tgz")
+
+# Stands for stdin or stdout on the command line
+STREAM_PATH = "-"
+
+
+def is_shard_path(path):
+    """Check whether a command-line path names a tar shard or a pipe."""
+    return path == STREAM_PATH or path.lower().endswith(TAR_EXTENSIONS)
+
+
+def is_image_member(member):
+    """Check whether a tar member is an image to process."""
+    return member.isfile() and member.name.lower().endswith(".png")
+
+
+def sample_key(name):
+    """
+    Return the sample a member belongs to: its path up to the first dot of
+    the file name, as WebDataset groups members ("a/b.png", "a/b.cls" -> "a/b").
+    """
+    directory, filename = os.path.split(name)
+    return os.path.join(directory, filename.split(".", 1)[0])
+
+
+def open_reader(fileobj):
+    """Open a tar stream for reading, compressed or not."""
+    return tarfile.open(fileobj=fileobj, mode="r|*")
+
+
+def open_writer(fileobj, name=None):
+    """Open a tar stream for writing, gzipped if `name` asks for it."""
+    gzipped = name is not None and name.lower().endswith((".tar.gz", ".tgz"))
+    return tarfile.open(fileobj=fileobj, mode="w|gz" if gzipped else "w|")
+
+
+def _member_like(member, name, size):
+    """Return a TarInfo for new contents, keeping a member's metadata."""
+    info = tarfile.TarInfo(name)
+    info.size = size
+    info.mtime = member.mtime
+    info.mode = member.mode
+    info.uid, info.gid = member.uid, member.gid
+    info.uname, info.gname = member.uname, member.gname
+    return info
+
+
+def write_member(tar, member, data=None):
+    """Copy a member (with its contents, for regular files) to a tar stream."""
+    tar.addfile(member, io.BytesIO(data) if data is not None else None)
+
+
+def write_sample(tar, member, output_name, image_bytes, settings):
+    """
+    Write a processed image and its settings in place of a member.
+
+    Args:
+        tar (tarfile.TarFile): Output stream
+        member (tarfile.TarInfo): Input member the image came from
+        output_name (str): Member name of the processed image
+        image_bytes (bytes): Encoded processed image
+        settings (dict): Settings recorded in the params member
+    """
+    tar.addfile(
+        _member_like(member, output_name, len(image_bytes)), io.BytesIO(image_bytes)
+    )
+    params = json.dumps(settings, sort_keys=True).encode("utf-8")
+    params_name = os.path.splitext(member.name)[0] + PARAMS_EXTENSION
+    tar.addfile(_member_like(member, params_name, len(params)), io.BytesIO(params))
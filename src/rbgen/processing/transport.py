@@ -0,0 +1,126 @@
+# src/rbgen/processing/transport.py
+"""
+Shared-memory transport of image frames between processes.
+
+The coordinator copies each decoded frame into a slot of a FrameRing and
+sends workers only its FrameHandle (a shared memory block name and an
+array shape). A worker attaches to the block, reads the frame in place and
+writes its result back into the same slot, so no pixels are pickled in
+either direction. Slots are recycled once the coordinator has copied the
+result out.
+"""
+from collections import deque, namedtuple
+from multiprocessing import shared_memory
+import numpy as np
+
+# What crosses process boundaries in place of a frame
+FrameHandle = namedtuple("FrameHandle", ["name", "shape"])
+
+# Shared memory blocks attached to by this process, by name
+_attached = {}
+
+
+def _frame_view(block, shape):
+    """Return a uint8 array of the given shape over a shared memory block."""
+    return np.ndarray(shape, dtype=np.uint8, buffer=block.buf)
+
+
+class FrameRing:
+    """
+    Recycled ring of shared memory slots holding uint8 frames.
+
+    Created (and finally unlinked) by the coordinating process; workers
+    only attach to slots through their handles.
+    """
+
+    def __init__(self, slots, slot_bytes):
+        """
+        Allocate the slots.
+
+        Args:
+            slots (int): Number of frames that can be in flight at once
+            slot_bytes (int): Size of each slot, i.e. of the largest frame
+        """
+        if slots < 1:
+            raise ValueError("A frame ring needs at least one slot")
+        self.slot_bytes = max(int(slot_bytes), 1)
+        self._blocks = []
+        try:
+            for _ in range(slots):
+                self._blocks.append(
+                    shared_memory.SharedMemory(create=True, size=self.slot_bytes)
+                )
+        except BaseException:
+            self.close()
+            raise
+        self._slots = {block.name: block for block in self._blocks}
+        self._free = deque(self._slots)
+
+    def __len__(self):
+        return len(self._blocks)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    @property
+    def free(self):
+        """Number of slots available to put()."""
+        return len(self._free)
+
+    def put(self, frame):
+        """
+        Copy a frame into a free slot.
+
+        Args:
+            frame (np.array): uint8 array of at most slot_bytes bytes
+
+        Returns:
+            FrameHandle: Handle of the slot, until it is released
+        """
+        frame = np.asarray(frame, dtype=np.uint8)
+        if frame.nbytes > self.slot_bytes:
+            raise ValueError(
+                f"Frame of {frame.nbytes} bytes does not fit in a "
+                f"{self.slot_bytes}-byte slot"
+            )
+        if not self._free:
+            raise ValueError("No free slot in the frame ring")
+        name = self._free.popleft()
+        _frame_view(self._slots[name], frame.shape)[...] = frame
+        return FrameHandle(name, frame.shape)
+
+    def get(self, handle):
+        """Return the frame in a slot as an array view (valid until release)."""
+        return _frame_view(self._slots[handle.name], handle.shape)
+
+    def release(self, handle):
+        """Return a slot to the ring."""
+        if handle.name not in self._slots or handle.name in self._free:
+            raise ValueError(f"Slot {handle.name} is not in use")
+        self._free.append(handle.name)
+
+    def close(self):
+        """Free the shared memory of every slot."""
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+        self._slots = {}
+        self._free.clear()
+
+
+def attach(handle):
+    """
+    Return a writable view of the frame behind a handle, in any process.
+
+    Blocks stay attached for the life of the process, so reusing a slot
+    costs nothing after its first frame.
+    """
+    block = _attached.get(handle.name)
+    if block is None:
+        block = _attached[handle.name] = shared_memory.SharedMemory(handle.name)
+    return _frame_view(block, handle.shape)
@@ -0,0 +1,197 @@
+# src/rbgen/profiling.py
+"""
+Lightweight timing instrumentation.
+
+Code marks its stages with `span()` context managers:
+
+    with span("render"):
+        ...
+
+Spans nest: each is recorded under its path, e.g. "image/render/marble.noise",
+together with tags set on it or on an enclosing span, such as the mode.
+Nothing is recorded unless a sink is active, and while none is, span()
+returns a shared no-op context manager, so instrumentation can stay in
+hot code.
+"""
+import json
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Active sinks; spans are only timed while this is non-empty
+_sinks = []
+
+# Path and tags of the innermost open span (None outside any span)
+_current = ContextVar("rbgen_profiling_span", default=None)
+
+
+class _NullSpan:
+    """Context manager that does nothing, used while profiling is off."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    """A timed stage; records itself to every active sink on exit."""
+
+    __slots__ = ("name", "tags", "path", "start", "_token")
+
+    def __init__(self, name, tags):
+        self.name = name
+        self.tags = tags
+
+    def __enter__(self):
+        parent_path, parent_tags = _current.get() or ("", {})
+        self.path = f"{parent_path}/{self.name}" if parent_path else self.name
+        self.tags = {**parent_tags, **self.tags}
+        self._token = _current.set((self.path, self.tags))
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self.start
+        _current.reset(self._token)
+        for sink in _sinks:
+            sink.record(self.path, seconds, self.tags)
+        return False
+
+
+def span(name, **tags):
+    """
+    Time a stage of work.
+
+    Args:
+        name (str): Stage name
+        **tags: Tags recorded with this span and the spans nested in it
+
+    Returns:
+        Context manager timing the enclosed block
+    """
+    if not _sinks:
+        return _NULL_SPAN
+    return _Span(name, tags)
+
+
+def annotate(**tags):
+    """
+    Add tags to the innermost open span (e.g. once the mode is known).
+
+    Does nothing outside any span.
+    """
+    current = _current.get()
+    if _sinks and current is not None:
+        current[1].update(tags)
+
+
+def is_enabled():
+    """Return True if any sink is active."""
+    return bool(_sinks)
+
+
+def add_sink(sink):
+    """Start sending spans to a sink (any object with a record method)."""
+    _sinks.append(sink)
+
+
+def remove_sink(sink):
+    """Stop sending spans to a sink."""
+    _sinks.remove(sink)
+
+
+@contextmanager
+def profiling(*sinks):
+    """Send spans to the given sinks for the duration of a with block."""
+    for sink in sinks:
+        add_sink(sink)
+    try:
+        yield sinks
+    finally:
+        for sink in sinks:
+            remove_sink(sink)
+
+
+def merge_totals(totals):
+    """
+    Pass span totals collected elsewhere (e.g. in a worker process) to the
+    active sinks that aggregate (see StageTimer.totals).
+    """
+    for sink in _sinks:
+        if hasattr(sink, "merge"):
+            sink.merge(totals)
+
+
+class StageTimer:
+    """
+    Sink aggregating span count and total time per mode and stage.
+
+    Spans closed before the mode of their image is known (such as loading
+    it) are reported under the mode "-".
+    """
+
+    def __init__(self):
+        # (mode, path): [count, total seconds]
+        self.stats = {}
+        # Spans may close in band-rendering threads
+        self._lock = threading.Lock()
+
+    def record(self, path, seconds, tags):
+        key = (tags.get("mode", ""), path)
+        with self._lock:
+            stat = self.stats.setdefault(key, [0, 0.0])
+            stat[0] += 1
+            stat[1] += seconds
+
+    def totals(self):
+        """Return the aggregated stats as a picklable list."""
+        return [
+            (mode, path, count, total)
+            for (mode, path), (count, total) in self.stats.items()
+        ]
+
+    def merge(self, totals):
+        """Add totals returned by another StageTimer's totals()."""
+        for mode, path, count, total in totals:
+            stat = self.stats.setdefault((mode, path), [0, 0.0])
+            stat[0] += count
+            stat[1] += total
+
+    def report(self):
+        """
+        Format a per-mode, per-stage breakdown.
+
+        Returns:
+            str: Table with the count, total and mean seconds of each stage
+        """
+        lines = [
+            f"{'mode':<22} {'stage':<40} {'count':>6} {'total s':>9} {'mean ms':>9}"
+        ]
+        for (mode, path), (count, total) in sorted(self.stats.items()):
+            lines.append(
+                f"{mode or '-':<22} {path:<40} {count:>6} {total:>9.3f} "
+                f"{total / count * 1000:>9.2f}"
+            )
+        return "\n".join(lines)
+
+
+class JSONLinesSink:
+    """Sink writing every span as one JSON line, for later analysis."""
+
+    def __init__(self, path):
+        self._file = open(path, "a", encoding="utf-8")
+
+    def record(self, path, seconds, tags):
+        event = {"stage": path, "seconds": seconds, **tags}
+        self._file.write(json.dumps(event, default=str) + "\n")
+
+    def close(self):
+        self._file.close()
@@ -0,0 +1,430 @@
+# src/rbgen/service.py
+"""
+Local HTTP render service (`rbgen serve`).
+
+A long-running server keeps a pool of worker processes with NumPy and the
+background modules already imported, so each request only pays for its
+own render. Requests are queued for the workers up to a limit, beyond
+which they are turned away with 503 rather than piling up.
+
+Endpoints:
+    POST /render   Foreground image in, composited image out. The body is
+                   the encoded image, with the settings in the query
+                   (mode=marble&colors=1e3c5a,c8b4a0&seed=7&turbulence=5),
+                   or a JSON object with "image" (base64) and "mode",
+                   "colors", "params", "seed" and "format" keys. The
+                   settings used come back in the X-Rbgen-Settings header.
+    GET /metrics   Request counts and latency percentiles per mode, as JSON.
+
+With a result cache, requests that repeat an earlier one (same image,
+settings and seed) are answered from it without rendering.
+
+The server only binds to the loopback interface.
+"""
+import base64
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+from PIL import UnidentifiedImageError
+from rbgen.backgrounds.registry import MODES
+from rbgen.processing.encoding import OUTPUT_FORMATS, Encoder
+from rbgen.processing.seeding import new_run_seed
+
+HOST = "127.0.0.1"
+
+# Latencies kept per mode for the percentiles
+LATENCY_WINDOW = 1024
+
+# Percentiles reported by /metrics
+PERCENTILES = (50, 90, 99)
+
+# Query keys that are not mode parameters
+_SETTING_KEYS = {"mode", "colors", "seed", "format"}
+
+# Content types of the output formats
+_CONTENT_TYPES = {
+    "png": "image/png",
+    "webp": "image/webp",
+    "jpeg": "image/jpeg",
+    "qoi": "image/qoi",
+}
+
+
+class RequestError(ValueError):
+    """A request that cannot be served as sent (answered with 400)."""
+
+
+def parse_color(value):
+    """Parse a color given as "rrggbb" (or "#rrggbb") or an [r, g, b] list."""
+    if isinstance(value, str):
+        value = value.lstrip("#")
+        if len(value) != 6:
+            raise RequestError(f"Invalid color: {value}")
+        try:
+            return tuple(int(value[i : i + 2], 16) for i in (0, 2, 4))
+        except ValueError:
+            raise RequestError(f"Invalid color: {value}") from None
+    # JSON true and false are ints to Python, but not color components
+    if (
+        not isinstance(value, list)
+        or len(value) != 3
+        or not all(
+            isinstance(c, int) and not isinstance(c, bool) and 0 <= c <= 255
+            for c in value
+        )
+    ):
+        raise RequestError(f"Invalid color: {value}")
+    return tuple(value)
+
+
+def _parse_value(value):
+    """Read a query parameter as JSON (numbers, lists), else as a string."""
+    try:
+        return json.loads(value)
+    except json.JSONDecodeError:
+        return value
+
+
+def parse_request(query, content_type, body):
+    """
+    Read the image and settings of a render request.
+
+    Args:
+        query (str): URL query string
+        content_type (str): Content-Type of the body
+        body (bytes): Request body
+
+    Returns:
+        dict: "image" (bytes), "mode", "colors", "params", "seed" and
+            "format", with None for settings left to the server
+    """
+    fields = dict(parse_qsl(query))
+    settings = {key: fields[key] for key in _SETTING_KEYS if key in fields}
+    params = {
+        key: _parse_value(value)
+        for key, value in fields.items()
+        if key not in _SETTING_KEYS
+    }
+    if "colors" in settings:
+        settings["colors"] = settings["colors"].split(",")
+    if "seed" in settings:
+        try:
+            settings["seed"] = int(settings["seed"])
+        except ValueError:
+            raise RequestError(f"Invalid seed: {settings['seed']}") from None
+
+    if content_type.split(";")[0].strip() == "application/json":
+        try:
+            document = json.loads(body)
+            image = base64.b64decode(document.pop("image"), validate=True)
+            params.update(document.pop("params", {}))
+        except (ValueError, KeyError, TypeError, AttributeError):
+            raise RequestError('JSON body needs a base64 "image"') from None
+        settings.update(document)
+    else:
+        image = body
+    if not image:
+        raise RequestError("No image in the request")
+
+    mode = settings.get("mode")
+    if mode is not None and mode not in MODES:
+        raise RequestError(f"Unknown background mode: {mode}")
+    colors = settings.get("colors")
+    if colors is not None:
+        if not isinstance(colors, list) or not colors:
+            raise RequestError(f"Invalid colors: {colors}")
+        colors = [parse_color(color) for color in colors]
+    seed = settings.get("seed")
+    if seed is not None and (isinstance(seed, bool) or not isinstance(seed, int)):
+        raise RequestError(f"Invalid seed: {seed}")
+    output_format = settings.get("format", "png")
+    if output_format not in OUTPUT_FORMATS:
+        raise RequestError(f"Unknown output format: {output_format}")
+    return {
+        "image": image,
+        "mode": mode,
+        "colors": colors,
+        # Parameters only apply to a requested mode
+        "params": params if (params and mode is not None) else None,
+        "seed": seed,
+        "format": output_format,
+    }
+
+
+class LatencyStats:
+    """Request counts and recent latencies per mode (thread-safe)."""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.window = window
+        self._latencies = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+        self.errors = 0
+        self.rejected = 0
+
+    def record(self, mode, seconds):
+        """Record the latency of a request served with a mode."""
+        with self._lock:
+            if mode not in self._latencies:
+                self._latencies[mode] = deque(maxlen=self.window)
+                self._counts[mode] = 0
+            self._latencies[mode].append(seconds)
+            self._counts[mode] += 1
+
+    def count_error(self, rejected=False):
+        """Count a failed request (rejected ones were over the queue limit)."""
+        with self._lock:
+            if rejected:
+                self.rejected += 1
+            else:
+                self.errors += 1
+
+    def report(self):
+        """
+        Summarize the recorded requests.
+
+        Returns:
+            dict: "requests", "errors", "rejected", and per mode the
+                request count and latency percentiles in milliseconds
+                over the last `window` requests
+        """
+        with self._lock:
+            modes = {}
+            for mode, latencies in sorted(self._latencies.items()):
+                ordered = sorted(latencies)
+                summary = {"count": self._counts[mode]}
+                for percentile in PERCENTILES:
+                    index = round(percentile / 100 * (len(ordered) - 1))
+                    summary[f"p{percentile}_ms"] = round(ordered[index] * 1000, 3)
+                modes[mode] = summary
+            return {
+                "requests": sum(self._counts.values()),
+                "errors": self.errors,
+                "rejected": self.rejected,
+                "modes": modes,
+            }
+
+
+class RenderService:
+    """
+    Render server with a warm worker pool.
+
+    Up to `workers` requests render at once; up to `max_queue` more wait
+    for a worker, and any beyond that are answered with 503.
+    """
+
+    def __init__(
+        self,
+        port=0,
+        workers=1,
+        max_queue=16,
+        threads=1,
+        cache_bytes=None,
+        processor_class=None,
+        result_cache=None,
+    ):
+        """
+        Start the workers and bind the server (call serve_forever to run it).
+
+        Args:
+            port (int): Port on the loopback interface (0 for a free one)
+            workers (int): Number of worker processes
+            max_queue (int): Requests that may wait for a worker
+            threads (int): Threads each worker renders bands with
+            cache_bytes (int, optional): Byte budget of each worker's
+                background cache (None for the default)
+            processor_class (optional): ImageProcessor (sub)class the
+                workers use
+            result_cache (ResultCache, optional): Cache of encoded
+                results shared by the workers
+        """
+        from rbgen.processing.cache import DEFAULT_CACHE_BYTES
+        from rbgen.processing.image_processor import ImageProcessor
+
+        if workers < 1:
+            raise ValueError("The service needs at least one worker")
+        if max_queue < 0:
+            raise ValueError("max_queue cannot be negative")
+        self.workers = workers
+        self.threads = threads
+        self.stats = LatencyStats()
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_service_worker,
+            initargs=(
+                processor_class or ImageProcessor,
+                DEFAULT_CACHE_BYTES if cache_bytes is None else cache_bytes,
+                result_cache,
+            ),
+        )
+        # Start the workers now, so no request waits for their imports
+        for future in [self._executor.submit(_ping) for _ in range(workers)]:
+            future.result()
+        self._server = ThreadingHTTPServer((HOST, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.service = self
+
+    @property
+    def address(self):
+        """(host, port) the server is bound to."""
+        return self._server.server_address[:2]
+
+    def serve_forever(self):
+        """Handle requests until shutdown() is called."""
+        self._server.serve_forever()
+
+    def start(self):
+        """Serve requests on a background thread and return that thread."""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+    def shutdown(self):
+        """Stop serving and stop the workers."""
+        self._server.shutdown()
+        self._server.server_close()
+        self._executor.shutdown(cancel_futures=True)
+
+    def render(self, request):
+        """
+        Render one parsed request on a worker.
+
+        Returns:
+            tuple: (encoded image, settings dict), or None when the queue
+                is full
+        """
+        if not self._slots.acquire(blocking=False):
+            return None
+        try:
+            seed = request["seed"]
+            future = self._executor.submit(
+                _run_service_job,
+                request["image"],
+                new_run_seed() if seed is None else seed,
+                request["mode"],
+                request["colors"],
+                request["params"],
+                request["format"],
+                self.threads,
+            )
+            return future.result()
+        finally:
+            self._slots.release()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Request handler; HTTP/1.1 keeps connections alive between requests."""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "rbgen"
+
+    def log_message(self, format, *args):
+        # Requests are counted in /metrics instead of logged one by one
+        pass
+
+    def _send(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status, document, headers=None):
+        body = json.dumps(document, sort_keys=True).encode("utf-8")
+        self._send(status, body, "application/json", headers)
+
+    def do_GET(self):
+        service = self.server.service
+        if urlsplit(self.path).path == "/metrics":
+            self._send_json(HTTPStatus.OK, service.stats.report())
+        else:
+            self._send_json(HTTPStatus.NOT_FOUND, {"error": "Not found"})
+
+    def do_POST(self):
+        service = self.server.service
+        start = time.perf_counter()
+        url = urlsplit(self.path)
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if url.path != "/render":
+            self._send_json(HTTPStatus.NOT_FOUND, {"error": "Not found"})
+            return
+
+        try:
+            request = parse_request(
+                url.query, self.headers.get("Content-Type", ""), body
+            )
+            result = service.render(request)
+        except (RequestError, ValueError, TypeError, UnidentifiedImageError) as e:
+            service.stats.count_error()
+            self._send_json(HTTPStatus.BAD_REQUEST, {"error": str(e)})
+            return
+        except Exception as e:
+            service.stats.count_error()
+            self._send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)})
+            return
+        if result is None:
+            service.stats.count_error(rejected=True)
+            self._send_json(
+                HTTPStatus.SERVICE_UNAVAILABLE,
+                {"error": "Too many requests queued"},
+                {"Retry-After": "1"},
+            )
+            return
+
+        image, settings = result
+        service.stats.record(settings["mode"], time.perf_counter() - start)
+        self._send(
+            HTTPStatus.OK,
+            image,
+            _CONTENT_TYPES[request["format"]],
+            {"X-Rbgen-Settings": json.dumps(settings, sort_keys=True)},
+        )
+
+
+# Processor of the current worker process (see _init_service_worker)
+_worker_processor = None
+
+# Encoders of the current worker process, by output format
+_worker_encoders = {}
+
+# ResultCache of the current worker process, if any
+_worker_results = None
+
+
+def _init_service_worker(processor_class, cache_bytes, result_cache=None):
+    """Create a worker's processor and import every background mode."""
+    global _worker_processor, _worker_results
+    _worker_processor = processor_class(cache_bytes=cache_bytes)
+    _worker_results = result_cache
+    for mode in MODES:
+        MODES[mode]
+
+
+def _ping():
+    """No-op job used to start the worker processes."""
+
+
+def _run_service_job(data, seed, mode, colors, params, output_format, threads):
+    """Render one request in a worker process."""
+    encoder = _worker_encoders.get(output_format)
+    if encoder is None:
+        encoder = _worker_encoders[output_format] = Encoder(output_format)
+    return _worker_processor._process_sample(
+        data,
+        seed,
+        mode,
+        mode is None,
+        encoder,
+        threads,
+        colors,
+        params,
+        result_cache=_worker_results,
+    )
@@ -1,6 +1,7 @@
 # tests/test_backgrounds.py
 import pytest
 from pathlib import Path
+from PIL import Image
 from rbgen.color_schemes.color_utils import generate_color_pair
 
 def test_get_available_background_modes(image_processor):
@@ -45,3 +46,371 @@ def test_generate_backgrounds(mode, image_processor, sample_image, output_dir):
     # Check if the file was successfully created
     assert output_path.exists(), f"Output file was not created for mode: {mode}"
 
+
+@pytest.mark.parametrize("mode", [
+    "solid", "striped", "checkered", "perspective_checkered",
+    "mandelbrot", "nested_polygons", "geometric_shapes",
+    "concentric_shapes", "line", "wavy_line", "perlin_noise",
+    "gradient", "radial_pattern", "marble", "cloud", "waves"
+])
+def test_render_region_matches_full_render(mode):
+    """Test that any region of a background matches the full render."""
+    import random
+    import numpy as np
+    from rbgen.backgrounds.regions import plan_background, render_background, render_region
+
+    for seed, (width, height) in [(3, (97, 61)), (7, (301, 203)), (11, (64, 150))]:
+        random.seed(seed)
+        np.random.seed(seed)
+        spec = plan_background(mode, (width, height), generate_color_pair())
+        full = render_background(spec)
+        assert full.shape == (height, width, 4)
+
+        # Quadrants tile the image
+        split_x, split_y = width * 2 // 5, height * 2 // 5
+        tiled = np.zeros_like(full)
+        for box in [
+            (0, 0, split_x, split_y),
+            (split_x, 0, width, split_y),
+            (0, split_y, width * 3 // 5, height),
+            (width * 3 // 5, split_y, width, height),
+        ]:
+            left, top, right, bottom = box
+            tiled[top:bottom, left:right] = render_region(spec, box)
+        assert np.array_equal(tiled, full), f"Tile seams differ for mode: {mode}"
+
+        # Arbitrary boxes, not only full-width bands
+        boxes = random.Random(seed)
+        for _ in range(16):
+            left = boxes.randrange(width)
+            top = boxes.randrange(height)
+            right = boxes.randrange(left + 1, width + 1)
+            bottom = boxes.randrange(top + 1, height + 1)
+            region = render_region(spec, (left, top, right, bottom))
+            assert np.array_equal(region, full[top:bottom, left:right]), (
+                f"Region {(left, top, right, bottom)} differs for mode: {mode}, "
+                f"seed {seed}"
+            )
+
+def test_listing_modes_imports_no_background_modules():
+    """Test that the CLI can list modes without importing NumPy or any mode."""
+    import subprocess
+    import sys
+
+    code = (
+        "import sys\n"
+        "from rbgen.main import main\n"
+        "main(['--list-modes'])\n"
+        "loaded = [m for m in sys.modules\n"
+        "          if m in ('numpy', 'PIL') or m.startswith('rbgen.backgrounds.')]\n"
+        "print(sorted(loaded))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert "  - marble" in result.stdout
+    assert result.stdout.strip().splitlines()[-1] == "['rbgen.backgrounds.registry']"
+
+
+def test_mode_registry_loads_entry_point_modes(monkeypatch, sample_image):
+    """Test that modes from entry points are listed and loaded on demand."""
+    from rbgen.backgrounds import registry
+    from rbgen.backgrounds.solid import plan_solid, render_solid
+    from rbgen.backgrounds.utils import compose_images
+
+    def apply_custom_background(image, colors):
+        return compose_images(Image.new("RGBA", image.size, (1, 2, 3, 255)), image)
+
+    apply_custom_background.plan = plan_solid
+    apply_custom_background.render = render_solid
+
+    class FakeEntryPoint:
+        name = "custom"
+
+        def load(self):
+            return apply_custom_background
+
+    monkeypatch.setattr(
+        registry, "_find_entry_points", lambda: {"custom": FakeEntryPoint()}
+    )
+    modes = registry.ModeRegistry()
+    assert list(modes)[-1] == "custom" and len(modes) == 17
+    assert "custom" in modes and "missing" not in modes
+    assert modes["custom"](sample_image, None).getpixel((0, 0)) == (1, 2, 3, 255)
+    assert modes.region_renderer("custom") == (plan_solid, render_solid)
+    with pytest.raises(ValueError):
+        modes.region_renderer("missing")
+
+
+def test_benchmark_detects_regressions_and_mismatches(tmp_path):
+    """Test the benchmark harness on a tiny grid."""
+    import copy
+    from rbgen import benchmark
+    from rbgen.backgrounds.regions import render_background
+
+    cases = benchmark.bench_cases(["gradient", "mandelbrot"], sizes=[(64, 64)])
+    assert [case["name"] for case in cases] == [
+        "gradient-64x64",
+        "mandelbrot-64x64",
+        "mandelbrot-1024x1024-max_iter=20",
+        "mandelbrot-1024x1024-max_iter=500",
+    ]
+
+    results = benchmark.run_benchmarks(cases[:2], repeat=1)
+    path = tmp_path / "results.json"
+    benchmark.save_results(results, str(path))
+    baseline = benchmark.load_results(str(path))
+    assert baseline["results"][0]["peak_bytes"] > 0
+    assert benchmark.compare_results(results, baseline, threshold=10.0) == ([], [])
+
+    slower = copy.deepcopy(results)
+    slower["results"][1]["seconds"] = baseline["results"][1]["seconds"] * 2
+    slower["results"][0]["thumbnail"] = [
+        [[255 - value for value in pixel] for pixel in row]
+        for row in baseline["results"][0]["thumbnail"]
+    ]
+    regressions, mismatches = benchmark.compare_results(slower, baseline)
+    assert [r["name"] for r in regressions] == ["mandelbrot-64x64"]
+    assert [m["name"] for m in mismatches] == ["gradient-64x64"]
+
+    # Reference thumbnails, as committed with the pytest-benchmark suite
+    references_path = str(tmp_path / "references.npz")
+    benchmark.save_thumbnails(results, references_path)
+    references = benchmark.load_thumbnails(references_path)
+    assert sorted(references) == ["gradient-64x64", "mandelbrot-64x64"]
+    render = render_background(benchmark.plan_case(cases[0]))
+    assert benchmark.perceptual_distance(render, references["gradient-64x64"]) < 0.5
+    changed = render_background(benchmark.plan_case(cases[0], seed=1))
+    assert (
+        benchmark.perceptual_distance(changed, references["gradient-64x64"])
+        > benchmark.DEFAULT_PERCEPTUAL_THRESHOLD
+    )
+
+
+def test_backgrounds_planned_concurrently_match_serial_plans():
+    """Test that modes planned with explicit rngs in threads are reproducible."""
+    import random
+    from concurrent.futures import ThreadPoolExecutor
+    import numpy as np
+    from rbgen.backgrounds.regions import plan_background, render_background
+    from rbgen.backgrounds.registry import available_modes
+    from rbgen.backgrounds.utils import ImageRandom
+
+    def render(job):
+        mode, seed = job
+        rng = ImageRandom(seed)
+        colors = generate_color_pair(rng)
+        return render_background(plan_background(mode, (64, 56), colors, rng=rng))
+
+    jobs = [(mode, seed) for mode in available_modes() for seed in (1, 2)]
+    random.seed(5)
+    np.random.seed(5)
+    serial = [render(job) for job in jobs]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        threaded = list(executor.map(render, jobs * 2))
+
+    for i, (mode, seed) in enumerate(jobs * 2):
+        assert np.array_equal(threaded[i], serial[i % len(jobs)]), (mode, seed)
+    # The global random states were never drawn from
+    assert random.random() == random.Random(5).random()
+    assert np.random.random() == np.random.RandomState(5).random()
+
+
+def test_threaded_band_rendering_matches_serial_render(monkeypatch):
+    """Test that rendering bands on threads gives the single-thread result."""
+    import numpy as np
+    from rbgen.backgrounds import regions
+    from rbgen.backgrounds.registry import THREADED_MODES
+    from rbgen.backgrounds.utils import ImageRandom
+    from rbgen.processing import scheduling
+    from rbgen.profiling import StageTimer, profiling, span
+
+    monkeypatch.setattr(regions, "MIN_BAND_PIXELS", 64)
+    assert regions.split_box((0, 10, 30, 31), 4) == [
+        (0, 10, 30, 16), (0, 16, 30, 22), (0, 22, 30, 28), (0, 28, 30, 31)
+    ]
+    assert regions.split_box((0, 10, 30, 31), 4, min_pixels=300) == [
+        (0, 10, 30, 20), (0, 20, 30, 30), (0, 30, 30, 31)
+    ]
+
+    specs = {}
+    for mode in sorted(THREADED_MODES):
+        rng = ImageRandom(11)
+        colors = generate_color_pair(rng)
+        spec = specs[mode] = regions.plan_background(mode, (90, 70), colors, rng=rng)
+        serial = regions.render_background(spec)
+        for threads in (2, 3):
+            threaded = regions.render_background(spec, threads)
+            assert np.array_equal(threaded, serial), (mode, threads)
+        box = (5, 7, 80, 66)
+        assert np.array_equal(
+            regions.render_region(spec, box, 3), regions.render_region(spec, box)
+        )
+
+    # Spans closed in band threads nest under the caller's span
+    timer = StageTimer()
+    with profiling(timer):
+        with span("render", mode="marble"):
+            regions.render_background(specs["marble"], 3)
+    assert ("marble", "render/marble.blur") in timer.stats
+
+    monkeypatch.setattr(scheduling, "available_cpus", lambda: 8)
+    assert scheduling.threads_per_worker(1) == 8
+    assert scheduling.threads_per_worker(3) == 2
+    assert scheduling.threads_per_worker(2, threads=2) == 2
+    assert scheduling.threads_per_worker(4, threads=16) == 2
+    assert scheduling.threads_per_worker(16) == 1
+
+
+def test_background_arrays_match_pil_backgrounds(monkeypatch):
+    """Test array in, array out: layouts, RGB plus alpha and caller buffers."""
+    import numpy as np
+    from rbgen.backgrounds import arrays
+    from rbgen.backgrounds.registry import MODES
+    from rbgen.backgrounds.utils import ImageRandom
+
+    sprite = np.zeros((40, 48, 4), dtype=np.uint8)
+    sprite[10:30, 12:36] = (250, 250, 10, 160)
+    sprite[15:20, 15:20] = (0, 0, 200, 255)
+    colors = [(30, 60, 90), (200, 180, 160)]
+
+    results = {}
+    for mode in ("gradient", "marble", "checkered"):
+        expected = np.asarray(
+            MODES[mode](Image.fromarray(sprite), colors, rng=ImageRandom(4))
+        )
+        results[mode] = arrays.apply_background_array(
+            sprite, mode, colors, rng=ImageRandom(4)
+        )
+        assert np.array_equal(results[mode], expected), mode
+
+        # Channels first into a slot of a batch, from RGB plus alpha
+        batch = np.zeros((2, 3, 40, 48), dtype=np.uint8)
+        returned = arrays.apply_background_array(
+            np.ascontiguousarray(sprite[..., :3]),
+            mode,
+            colors,
+            alpha=sprite[..., 3],
+            out=batch[1],
+            layout="CHW",
+            channels="RGB",
+            rng=ImageRandom(4),
+        )
+        assert returned.base is batch
+        assert np.array_equal(batch[1], expected[..., :3].transpose(2, 0, 1))
+        assert not batch[0].any()
+
+    # Composited in chunks, on threads, with the same result
+    monkeypatch.setattr(arrays, "COMPOSITE_CHUNK_PIXELS", 100)
+    chunked = arrays.apply_background_array(
+        sprite, "marble", colors, rng=ImageRandom(4), threads=3
+    )
+    assert np.array_equal(chunked, results["marble"])
+
+    with pytest.raises(ValueError):
+        arrays.apply_background_array(sprite, "solid", colors, layout="WHC")
+    with pytest.raises(ValueError):
+        arrays.apply_background_array(
+            sprite, "solid", colors, out=np.empty((40, 48, 3), dtype=np.uint8)
+        )
+    with pytest.raises(ValueError):
+        arrays.apply_background_array(sprite[..., :3], "solid", colors)
+
+
+def test_batch_renderers_match_single_renders(monkeypatch):
+    """Test batched backgrounds against rendering each spec on its own."""
+    import numpy as np
+    from rbgen.backgrounds import regions
+    from rbgen.backgrounds.registry import MODES
+    from rbgen.backgrounds.utils import ImageRandom
+
+    params = {
+        "gradient": [{"direction": d} for d in ("horizontal", "radial", "diagonal")],
+        "radial_pattern": [{"num_rays": n} for n in (5, 12, 31)],
+        "mandelbrot": [{"max_iter": n} for n in (20, 100, 45)],
+    }
+    specs = []
+    for mode, variations in params.items():
+        assert MODES.batch_renderer(mode) is not None
+        for i, extra in enumerate(variations):
+            colors = [(10 * i, 90, 200), (240, 40 * i, 15)]
+            specs.append(
+                regions.plan_background(
+                    mode, (57, 31), colors, rng=ImageRandom(i), **extra
+                )
+            )
+    # Modes without a batch renderer are rendered one by one
+    assert MODES.batch_renderer("marble") is None
+    specs.append(
+        regions.plan_background("marble", (57, 31), [(1, 2, 3), (200, 100, 0)])
+    )
+
+    expected = [regions.render_background(spec) for spec in specs]
+    assert np.array_equal(regions.render_backgrounds(specs), np.stack(expected))
+    # Split into chunks on threads, with the same result
+    monkeypatch.setattr(regions, "BATCH_PIXELS", 2 * 57 * 31)
+    assert np.array_equal(
+        regions.render_backgrounds(specs, threads=3), np.stack(expected)
+    )
+
+    with pytest.raises(ValueError):
+        regions.render_backgrounds(
+            [specs[0], regions.plan_background("solid", (8, 8), [(0, 0, 0)])]
+        )
+
+
+def test_grid_cache_shares_fields_across_modes(monkeypatch):
+    """Test cached distance and angle fields and their byte budget."""
+    import numpy as np
+    from rbgen.backgrounds import grids
+    from rbgen.backgrounds.regions import plan_background, render_background
+
+    cache = grids.GridCache()
+    monkeypatch.setattr(grids, "grid_cache", cache)
+    box, center = (2, 3, 50, 40), (24, 20)
+    dx = np.arange(2, 50, dtype=np.float64)[None, :] - 24
+    dy = np.arange(3, 40, dtype=np.float64)[:, None] - 20
+    distance = grids.distance_field(box, center)
+    assert np.array_equal(distance, np.sqrt(dx**2 + dy**2))
+    assert np.array_equal(
+        grids.angle_field(box, center), np.degrees(np.arctan2(dy, dx)) % 360
+    )
+    assert not distance.flags.writeable
+    assert grids.distance_field(box, center) is distance
+
+    # A radial gradient and concentric circles of one size share a field
+    colors = [(10, 20, 30), (200, 100, 0)]
+    gradient = plan_background("gradient", (64, 64), colors, direction="radial")
+    render_background(gradient)
+    misses, hits = cache.misses, cache.hits
+    render_background(
+        plan_background("concentric_shapes", (64, 64), colors, shape_type="circle")
+    )
+    assert cache.misses == misses and cache.hits == hits + 1
+
+    # At full-HD size, the fields of one image are there for the next
+    cache = grids.GridCache()
+    monkeypatch.setattr(grids, "grid_cache", cache)
+    full_hd = [
+        plan_background("gradient", (1920, 1080), colors, direction="radial"),
+        plan_background(
+            "concentric_shapes", (1920, 1080), colors, shape_type="circle"
+        ),
+        plan_background("gradient", (1920, 1080), colors, direction="radial"),
+    ]
+    full_hd[1]["center"] = (960, 540)
+    for spec in full_hd:
+        render_background(spec)
+    assert cache.hits == 2 and cache.misses == 2
+    assert cache.bytes == 2 * 1920 * 1080 * 8
+
+    # Cheap fields too large to be worth keeping are recomputed
+    monkeypatch.setattr(grids, "CHEAP_FIELD_BYTES", 1000)
+    assert grids.distance_field((0, 0, 30, 30), center) is not (
+        grids.distance_field((0, 0, 30, 30), center)
+    )
+    # The budget evicts the least recently used fields
+    cache.resize(distance.nbytes)
+    assert cache.bytes <= distance.nbytes
+    cache.resize(0)
+    assert len(cache) == 0
@@ -1,4 +1,6 @@
 # tests/test_color_schemes.py
+import random
+import numpy as np
 import pytest
 from pathlib import Path
 from rbgen.color_schemes.palettes import THEME_COLOR_SCHEMES, get_themed_color_scheme
@@ -43,6 +45,25 @@ def test_generate_color_pair():
     ), "RGB values should be in range 0-255"
 
 
+@pytest.mark.parametrize(
+    "make_rng",
+    [random.Random, np.random.default_rng, np.random.RandomState],
+    ids=["Random", "Generator", "RandomState"],
+)
+def test_color_functions_accept_any_rng(make_rng):
+    """Test that the color functions take Python and NumPy random sources."""
+    first = generate_color_pair(make_rng(1))
+    assert len(first) == 2 and all(len(color) == 3 for color in first)
+    assert generate_color_pair(make_rng(1)) == first
+
+    all_colors = [pair for pairs in THEME_COLOR_SCHEMES.values() for pair in pairs]
+    themed = get_themed_color_scheme(rng=make_rng(2))
+    assert themed in all_colors
+    assert get_themed_color_scheme(rng=make_rng(2)) == themed
+    forest = get_themed_color_scheme("forest", make_rng(3))
+    assert forest in THEME_COLOR_SCHEMES["forest"]
+
+
 def test_get_themed_color_scheme_valid():
     """Test that get_themed_color_scheme returns a valid color pair for known themes."""
     for theme in THEME_COLOR_SCHEMES.keys():
@@ -63,3 +84,30 @@ def test_get_themed_color_scheme_invalid():
     """Test that an invalid theme raises a ValueError."""
     with pytest.raises(ValueError, match="Unknown theme: invalid_theme"):
         get_themed_color_scheme("invalid_theme")
+
+
+def test_generate_color_pairs_matches_single_pair_distribution():
+    """Test batch color pairs against the single-pair strategies."""
+    import numpy as np
+    from rbgen.color_schemes import AliasSampler, generate_color_pairs
+    from rbgen.color_schemes.color_utils import BASE_COLORS
+
+    pairs = generate_color_pairs(20000, rng=5)
+    assert pairs.shape == (20000, 2, 3) and pairs.dtype == np.uint8
+    assert np.array_equal(pairs, generate_color_pairs(20000, rng=5))
+
+    # One color of every pair comes from the base palette
+    base = np.array(BASE_COLORS, dtype=np.uint8)
+    in_base = (pairs[:, :, None, :] == base[None, None]).all(axis=-1).any(axis=-1)
+    assert in_base.any(axis=1).all()
+
+    sampler = AliasSampler([3, 0, 1])
+    counts = np.bincount(sampler.sample(np.random.default_rng(0), 40000), minlength=3)
+    assert counts[1] == 0
+    assert abs(counts[0] / counts[2] - 3) < 0.2
+
+    themed = generate_color_pairs(50, rng=1, theme="ocean")
+    schemes = [tuple(map(tuple, pair)) for pair in THEME_COLOR_SCHEMES["ocean"]]
+    assert all(tuple(map(tuple, pair.tolist())) in schemes for pair in themed)
+    with pytest.raises(ValueError, match="Unknown theme"):
+        generate_color_pairs(1, theme="invalid_theme")
@@ -1,5 +1,6 @@
 # tests/test_processing.py
 
+import pytest
 from pathlib import Path
 from PIL import Image
 
@@ -33,3 +34,1031 @@ def test_process_directory(image_processor, tmp_path, output_dir):
         processed_image_path.exists()
     ), f"Processed image not found at {processed_image_path}"
     assert processed_image_path.is_file(), "Processed image path is not a file"
+
+
+def test_process_directory_skips_up_to_date(image_processor, tmp_path, capsys):
+    """Test that a rerun skips unchanged inputs and reprocesses modified ones."""
+    input_dir = tmp_path / "input_images"
+    output_dir = tmp_path / "output_images"
+    input_dir.mkdir()
+    for name in ("a.png", "b.png"):
+        Image.new("RGBA", (50, 50), (255, 255, 255, 0)).save(input_dir / name)
+
+    def run(**kwargs):
+        image_processor.process_directory(
+            str(input_dir), str(output_dir), mode="solid", randomize=False, **kwargs
+        )
+        return capsys.readouterr().out
+
+    first = run()
+    assert "Processed: a.png" in first and "Processed: b.png" in first
+    assert (output_dir / ".rbgen_manifest.jsonl").exists()
+
+    # Nothing changed: everything is skipped
+    second = run()
+    assert "Processed:" not in second
+    assert "Skipped 2 up-to-date image(s)" in second
+
+    # A modified input and a deleted output are both redone
+    Image.new("RGBA", (60, 60), (255, 255, 255, 0)).save(input_dir / "a.png")
+    (output_dir / "b.png").unlink()
+    third = run()
+    assert "Processed: a.png" in third and "Processed: b.png" in third
+
+    # A different mode makes outputs stale unless only_changed is set
+    image_processor.process_directory(
+        str(input_dir), str(output_dir), mode="gradient", randomize=False,
+        only_changed=True,
+    )
+    assert "Processed:" not in capsys.readouterr().out
+
+    forced = run(force=True)
+    assert "Processed: a.png" in forced and "Processed: b.png" in forced
+
+    # So does another run seed or encoder setting; without a seed, any goes
+    from rbgen.processing.encoding import Encoder
+
+    assert "Processed: a.png" in run(seed=1)
+    assert "Processed:" not in run(seed=1)
+    assert "Processed: a.png" in run(seed=2)
+    assert "Processed: a.png" in run(seed=2, encoder=Encoder(compress_level=1))
+    assert "Processed:" not in run(seed=2, encoder=Encoder(compress_level=1))
+    assert "Processed: a.png" in run(seed=2, seed_by="content")
+    assert "Processed:" not in run(seed=3, only_changed=True)
+    assert "Processed:" not in run()
+
+
+def test_manifest_recovers_from_truncated_line(tmp_path):
+    """Test that an entry recorded after a killed run is not merged into it."""
+    from rbgen.processing.manifest import Manifest
+
+    def entry(name):
+        return {"input": name, "output": name, "size": 1, "mtime_ns": 0, "sha256": ""}
+
+    manifest = Manifest(str(tmp_path))
+    manifest.record(entry("a.png"))
+    manifest.record(entry("b.png"))
+    manifest._handle.close()
+    # Killed while writing the second line
+    data = (tmp_path / ".rbgen_manifest.jsonl").read_bytes()
+    (tmp_path / ".rbgen_manifest.jsonl").write_bytes(data[:-10])
+
+    manifest = Manifest(str(tmp_path))
+    assert sorted(manifest.entries) == ["a.png"]
+    manifest.record(entry("c.png"))
+    manifest._handle.close()
+
+    assert sorted(Manifest(str(tmp_path)).entries) == ["a.png", "c.png"]
+
+
+def test_manifest_keeps_entries_of_concurrent_runs(tmp_path):
+    """Test that shards sharing an output directory keep each other's entries."""
+    from rbgen.processing.manifest import Manifest
+
+    def entry(name, size=1):
+        return {"input": name, "output": name, "size": size, "mtime_ns": 0}
+
+    first = Manifest(str(tmp_path))
+    second = Manifest(str(tmp_path))
+    first.record(entry("a.png"))
+    second.record(entry("b.png"))
+    first.record(entry("c.png"))
+    first.close()
+    # Appends after the file was rewritten reach the new file
+    second.record(entry("d.png"))
+    assert sorted(Manifest(str(tmp_path)).entries) == [
+        "a.png", "b.png", "c.png", "d.png"
+    ]
+    second.record(entry("a.png", size=2))
+    second.close()
+
+    entries = Manifest(str(tmp_path)).entries
+    assert sorted(entries) == ["a.png", "b.png", "c.png", "d.png"]
+    assert entries["a.png"]["size"] == 2
+    assert [path.name for path in tmp_path.iterdir()] == [".rbgen_manifest.jsonl"]
+
+
+def test_process_directory_is_reproducible_and_shardable(image_processor, tmp_path):
+    """Test that per-image seeding gives identical results in any order or shard."""
+    import json
+
+    input_dir = tmp_path / "input_images"
+    input_dir.mkdir()
+    names = [f"img_{i}.png" for i in range(6)]
+    for name in names:
+        Image.new("RGBA", (40, 30), (255, 255, 255, 0)).save(input_dir / name)
+
+    full_dir = tmp_path / "full"
+    image_processor.process_directory(str(input_dir), str(full_dir), seed=7)
+
+    # Two shards cover every input exactly once with identical outputs
+    sharded_dir = tmp_path / "sharded"
+    for index in range(2):
+        image_processor.process_directory(
+            str(input_dir), str(sharded_dir), seed=7, shard=(index, 2)
+        )
+    for name in names:
+        assert (full_dir / name).read_bytes() == (sharded_dir / name).read_bytes()
+
+    # A single output can be regenerated from its manifest entry
+    manifest = full_dir / ".rbgen_manifest.jsonl"
+    entry = json.loads(manifest.read_text().splitlines()[0])
+    regenerated = tmp_path / "regenerated.png"
+    image_processor.process_file(
+        str(input_dir / entry["input"]),
+        str(regenerated),
+        mode=entry["mode"],
+        randomize=entry["randomize"],
+        seed=entry["seed"],
+    )
+    assert regenerated.read_bytes() == (full_dir / entry["output"]).read_bytes()
+
+
+def test_process_directory_output_formats(image_processor, tmp_path):
+    """Test that the encoder controls format and flattens opaque results."""
+    from rbgen.processing.encoding import Encoder
+
+    input_dir = tmp_path / "input_images"
+    input_dir.mkdir()
+    Image.new("RGBA", (64, 64), (255, 255, 255, 0)).save(input_dir / "test.png")
+
+    for encoder, name, mode in [
+        (Encoder("png", compress_level=1), "test.png", "RGB"),
+        (Encoder("png", flatten=False), "test.png", "RGBA"),
+        (Encoder("webp", lossless=True), "test.webp", "RGB"),
+        (Encoder("jpeg", quality=90), "test.jpg", "RGB"),
+    ]:
+        output_dir = tmp_path / f"out_{encoder.output_format}_{mode}"
+        image_processor.process_directory(
+            str(input_dir), str(output_dir), mode="solid", randomize=False,
+            encoder=encoder,
+        )
+        with Image.open(output_dir / name) as result:
+            assert result.mode == mode
+
+
+def test_process_file_tiled_matches_untiled(image_processor, sample_image, tmp_path):
+    """Test that banded rendering with streamed PNG output matches a full render."""
+    import numpy as np
+    from rbgen.processing.encoding import Encoder
+
+    input_path = tmp_path / "input.png"
+    sample_image.save(input_path)
+
+    for mode in ["checkered", "marble", "wavy_line"]:
+        for encoder in [Encoder("png"), Encoder("png", flatten=False)]:
+            full_path = tmp_path / "full.png"
+            tiled_path = tmp_path / "tiled.png"
+            for path, tile_size in [(full_path, None), (tiled_path, 64)]:
+                image_processor.process_file(
+                    str(input_path), str(path), mode=mode, randomize=False,
+                    seed=11, encoder=encoder, tile_size=tile_size,
+                )
+            with Image.open(full_path) as full, Image.open(tiled_path) as tiled:
+                assert tiled.mode == full.mode
+                assert np.array_equal(np.asarray(tiled), np.asarray(full)), mode
+
+    # Streamed PNGs honor optimize with the best zlib level
+    sizes = []
+    for encoder in [Encoder("png"), Encoder("png", optimize=True)]:
+        path = tmp_path / f"optimize_{encoder.optimize}.png"
+        image_processor.process_file(
+            str(input_path), str(path), mode="marble", randomize=False,
+            seed=11, encoder=encoder, tile_size=64,
+        )
+        sizes.append(path.stat().st_size)
+    assert sizes[1] < sizes[0]
+
+
+def test_background_cache_reuses_deterministic_backgrounds(sample_image, tmp_path):
+    """Test that cached backgrounds give the same output as rendering afresh."""
+    from rbgen.processing.image_processor import ImageProcessor
+
+    input_path = tmp_path / "input.png"
+    sample_image.save(input_path)
+
+    cached = ImageProcessor()
+    uncached = ImageProcessor(cache_bytes=0)
+    assert uncached.background_cache is None
+
+    for mode in ["solid", "gradient", "concentric_shapes", "radial_pattern"]:
+        outputs = []
+        for processor, name in [(cached, "a"), (cached, "b"), (uncached, "c")]:
+            path = tmp_path / f"{mode}_{name}.png"
+            processor.process_file(
+                str(input_path), str(path), mode=mode, randomize=False, seed=5
+            )
+            outputs.append(path.read_bytes())
+        assert outputs[0] == outputs[1] == outputs[2], mode
+
+    stats = cached.background_cache.stats()
+    assert stats["hits"] == 4 and stats["misses"] == 4
+    assert stats["hit_rate"] == 0.5
+    assert stats["bytes"] == 4 * sample_image.width * sample_image.height * 4
+
+
+def test_background_cache_evicts_least_recently_used():
+    """Test that the cache stays within its byte budget."""
+    from rbgen.processing.cache import BackgroundCache
+
+    cache = BackgroundCache(max_bytes=2 * 10 * 10 * 4)
+    specs = [{"mode": "solid", "size": (10, 10), "colors": [(i, 0, 0)]} for i in range(3)]
+    for spec in specs[:2]:
+        cache.put(spec, Image.new("RGBA", (10, 10)))
+    assert cache.get(specs[0]) is not None
+    cache.put(specs[2], Image.new("RGBA", (10, 10)))
+
+    assert len(cache) == 2 and cache.bytes == 2 * 10 * 10 * 4
+    assert cache.get(specs[1]) is None
+    assert cache.get(specs[0]) is not None
+    assert cache.get(specs[2]) is not None
+
+
+def test_background_pool_build_and_pick(image_processor, tmp_path):
+    """Test building a pool and taking backgrounds from it by seed."""
+    import pickle
+    import numpy as np
+    from rbgen.main import main
+    from rbgen.processing.pool import BackgroundPool
+
+    pool_dir = tmp_path / "pool"
+    main(["pool", "build", "-o", str(pool_dir), "-s", "64x48", "32x32",
+          "-m", "marble", "solid", "-n", "3", "--seed", "1"])
+    pool = BackgroundPool(str(pool_dir))
+    assert pool.modes == ["marble", "solid"]
+    assert len(pool.entries) == 2 * 2 * 3
+
+    # The smallest covering bucket is centre cropped; larger sizes are resized
+    entry, background = pool.pick((60, 40), seed=9, mode="marble")
+    assert entry["mode"] == "marble" and entry["size"] == [64, 48]
+    assert background.size == (60, 40)
+    full = pool.array(pool.entries.index(entry))
+    assert np.array_equal(np.asarray(background), full[4:44, 2:62])
+    assert pool.pick((100, 100), seed=9)[1].size == (100, 100)
+
+    # Workers reopen the mapped file from the pickled pool folder
+    reopened = pickle.loads(pickle.dumps(pool))
+    assert reopened.pick((60, 40), seed=9, mode="marble")[0] == entry
+
+    input_dir = tmp_path / "input_images"
+    input_dir.mkdir()
+    for i in range(3):
+        Image.new("RGBA", (32, 32), (255, 255, 255, 0)).save(input_dir / f"{i}.png")
+    output_dir = tmp_path / "output"
+    image_processor.process_directory(
+        str(input_dir), str(output_dir), mode="solid", randomize=False, seed=3,
+        pool=pool,
+    )
+    for i in range(3):
+        with Image.open(output_dir / f"{i}.png") as result:
+            color = result.convert("RGB").getpixel((0, 0))
+        assert any(tuple(e["colors"][0]) == color for e in pool.entries)
+
+
+def test_process_directory_workers_match_serial_run(image_processor, tmp_path, capsys):
+    """Test that parallel longest-first runs give the same outputs as serial ones."""
+    input_dir = tmp_path / "input_images"
+    input_dir.mkdir()
+    for i, size in enumerate([(20, 20), (80, 60), (40, 40), (60, 30)]):
+        Image.new("RGBA", size, (255, 255, 255, 0)).save(input_dir / f"{i}.png")
+
+    serial_dir = tmp_path / "serial"
+    image_processor.process_directory(str(input_dir), str(serial_dir), seed=4)
+    parallel_dir = tmp_path / "parallel"
+    image_processor.process_directory(
+        str(input_dir), str(parallel_dir), seed=4, workers=2
+    )
+    for i in range(4):
+        name = f"{i}.png"
+        assert (serial_dir / name).read_bytes() == (parallel_dir / name).read_bytes()
+
+    # With a single mode, the largest image is processed first
+    ordered_dir = tmp_path / "ordered"
+    capsys.readouterr()
+    image_processor.process_directory(
+        str(input_dir), str(ordered_dir), mode="marble", randomize=False, seed=4
+    )
+    processed = [
+        line.split()[1]
+        for line in capsys.readouterr().out.splitlines()
+        if line.startswith("Processed:")
+    ]
+    assert processed == ["1.png", "3.png", "2.png", "0.png"]
+
+
+def test_workers_keep_a_bounded_number_of_jobs_in_flight(
+    image_processor, tmp_path, monkeypatch
+):
+    """Test that parallel runs only submit about two jobs per worker at once."""
+    from rbgen.processing import image_processor as module
+
+    input_dir = tmp_path / "input_images"
+    input_dir.mkdir()
+    for i in range(10):
+        size = (20 + 4 * i, 20)
+        Image.new("RGBA", size, (255, 255, 255, 0)).save(input_dir / f"{i}.png")
+
+    outstanding = []
+    real_wait = module.wait
+
+    def wait(futures, return_when):
+        outstanding.append(len(futures))
+        return real_wait(futures, return_when=return_when)
+
+    monkeypatch.setattr(module, "wait", wait)
+    image_processor.process_directory(
+        str(input_dir),
+        str(tmp_path / "output"),
+        mode="solid",
+        randomize=False,
+        seed=2,
+        workers=2,
+    )
+    assert len(list((tmp_path / "output").glob("*.png"))) == 10
+    assert max(outstanding) == 4
+
+
+def test_cost_model_scales_with_size_and_params(tmp_path):
+    """Test cost estimates and saving a calibrated model."""
+    from rbgen.processing.scheduling import CostModel, order_jobs
+
+    model = CostModel()
+    small = model.estimate("mandelbrot", (500, 500))
+    assert model.estimate("mandelbrot", (1000, 1000)) == pytest.approx(4 * small)
+    assert model.estimate("mandelbrot", (500, 500), {"max_iter": 200}) > 1.5 * small
+    assert model.estimate("solid", (500, 500)) < small / 10
+
+    calibrated = CostModel.calibrate(["solid", "marble"], size=(64, 64), repeat=1)
+    assert calibrated.mode_costs["marble"] > calibrated.mode_costs["solid"]
+    path = tmp_path / "costs.json"
+    calibrated.save(str(path))
+    assert CostModel.load(str(path)).mode_costs == calibrated.mode_costs
+
+    jobs = [{"filename": "a", "cost": 1.0}, {"filename": "b", "cost": 3.0}]
+    assert [job["filename"] for job in order_jobs(jobs)] == ["b", "a"]
+    # Jobs of one size run together, sizes by their longest job
+    jobs = [
+        {"filename": "a", "cost": 4.0, "size": (20, 20)},
+        {"filename": "b", "cost": 3.0, "size": (10, 10)},
+        {"filename": "c", "cost": 1.0, "size": (20, 20)},
+        {"filename": "d", "cost": 2.0, "size": (10, 10)},
+        {"filename": "e", "cost": 5.0, "size": (30, 30)},
+    ]
+    assert [job["filename"] for job in order_jobs(jobs)] == ["e", "a", "c", "b", "d"]
+
+
+def test_profiling_records_stages_per_mode(image_processor, sample_image, tmp_path):
+    """Test that profiling spans are timed per mode and free when disabled."""
+    from rbgen.profiling import StageTimer, profiling, span
+
+    input_path = tmp_path / "input.png"
+    sample_image.save(input_path)
+    assert span("render") is span("save")
+
+    timer = StageTimer()
+    with profiling(timer):
+        image_processor.process_file(
+            str(input_path), str(tmp_path / "out.png"), mode="marble",
+            randomize=False, seed=5,
+        )
+    stages = {path for mode, path in timer.stats if mode == "marble"}
+    for stage in ["image", "image/render/marble.warp", "image/save"]:
+        assert stage in stages
+    # Loading happens before the mode is chosen
+    assert ("", "image/load") in timer.stats
+    assert "marble" in timer.report()
+    assert span("render") is span("save")
+
+    # Tags set during a run do not leak into spans opened after it
+    from rbgen.profiling import annotate
+
+    timer = StageTimer()
+    with profiling(timer):
+        image_processor.process_images(
+            [sample_image], mode="marble", randomize=False, seed=1
+        )
+        annotate(mode="cloud")
+        with span("unrelated"):
+            pass
+    assert ("marble", "image") in timer.stats
+    assert ("", "unrelated") in timer.stats
+
+    # Variants rendered concurrently each time their own mode
+    timer = StageTimer()
+    with profiling(timer):
+        entry = image_processor.process_file(
+            str(input_path), str(tmp_path / "variants.png"), seed=8, variants=4,
+            threads=4,
+        )
+    modes = [variant["mode"] for variant in entry["variants"]]
+    for mode in set(modes):
+        count, _ = timer.stats[(mode, "image/variant")]
+        assert count == modes.count(mode)
+    assert ("", "image") in timer.stats
+
+
+def test_memory_budget_tiles_large_images(image_processor, tmp_path, capsys):
+    """Test memory estimates and routing of oversized images to tiling."""
+    import numpy as np
+    from rbgen.processing.memory import estimate_memory, fit_tile_size
+
+    size = (2000, 1000)
+    full = estimate_memory("marble", size)
+    assert full > 150 * 2000 * 1000
+    tile_size = fit_tile_size("marble", size, full // 4)
+    assert estimate_memory("marble", size, tile_size) <= full // 4
+    assert estimate_memory("solid", size) < full
+
+    input_dir = tmp_path / "input"
+    input_dir.mkdir()
+    Image.new("RGBA", (300, 200), (255, 0, 0, 128)).save(input_dir / "big.png")
+    Image.new("RGBA", (40, 40), (0, 255, 0, 128)).save(input_dir / "small.png")
+
+    outputs = {}
+    for name, budget in [("plain", None), ("budget", 4 * 2**20)]:
+        output_dir = tmp_path / name
+        image_processor.process_directory(
+            str(input_dir), str(output_dir), mode="marble", randomize=False,
+            seed=3, memory_budget=budget,
+        )
+        outputs[name] = output_dir
+
+    out = capsys.readouterr().out
+    assert "Tiling big.png" in out
+    assert "Tiling small.png" not in out
+    for filename in ["big.png", "small.png"]:
+        with Image.open(outputs["plain"] / filename) as plain:
+            with Image.open(outputs["budget"] / filename) as budgeted:
+                assert np.array_equal(np.asarray(plain), np.asarray(budgeted))
+
+
+def test_process_images_through_shared_memory_matches_serial(image_processor):
+    """Test that worker processes fed through the frame ring match serial runs."""
+    import numpy as np
+    from rbgen.processing.transport import FrameRing, attach
+
+    with FrameRing(2, 64) as ring:
+        handle = ring.put(np.arange(48, dtype=np.uint8).reshape(2, 6, 4))
+        attach(handle)[0, 0, 0] = 99
+        assert ring.get(handle)[0, 0, 0] == 99 and ring.free == 1
+        with pytest.raises(ValueError):
+            ring.put(np.zeros(65, dtype=np.uint8))
+        ring.release(handle)
+        assert ring.free == 2
+
+    images = [
+        Image.new("RGBA", size, (0, 0, 0, 0))
+        for size in [(40, 30), (64, 48), (25, 60), (50, 50), (33, 33)]
+    ]
+    images[1].paste((10, 200, 30, 255), (5, 5, 20, 20))
+    serial = image_processor.process_images(images, seed=9)
+    parallel = image_processor.process_images(images, seed=9, workers=2)
+
+    for (expected, expected_settings), (result, settings) in zip(serial, parallel):
+        assert settings == expected_settings
+        assert result.mode == "RGBA" and result.size == expected.size
+        assert np.array_equal(np.asarray(result), np.asarray(expected))
+    # Inputs are left untouched
+    assert images[0].getpixel((0, 0)) == (0, 0, 0, 0)
+
+
+@pytest.mark.parametrize("mode", [
+    "perlin_noise", "cloud", "waves", "wavy_line", "mandelbrot", "striped", "checkered"
+])
+def test_animated_backgrounds_stream_frames(image_processor, tmp_path, mode):
+    """Test animated output: frame count, first frame and incremental keyframes."""
+    import numpy as np
+    from rbgen.processing.animation import Animation
+    from rbgen.profiling import StageTimer, profiling
+
+    image_path = tmp_path / "sprite.png"
+    sprite = Image.new("RGBA", (72, 64), (0, 0, 0, 0))
+    sprite.paste((250, 250, 10, 160), (20, 20, 50, 40))
+    sprite.save(image_path)
+
+    still_path = tmp_path / "still.png"
+    image_processor.process_file(
+        str(image_path), str(still_path), mode=mode, randomize=False, seed=3
+    )
+    animation = Animation(frames=8, fps=10)
+    output_path = tmp_path / animation.output_name("sprite.png")
+    timer = StageTimer()
+    with profiling(timer):
+        entry = image_processor.process_file(
+            str(image_path),
+            str(output_path),
+            mode=mode,
+            randomize=False,
+            seed=3,
+            animation=animation,
+        )
+    assert entry["format"] == "apng" and entry["frames"] == 8
+
+    with Image.open(output_path) as result:
+        assert result.n_frames == 8
+        assert result.info["duration"] == 100
+        first = np.asarray(result.convert("RGBA"), dtype=np.int16)
+        result.seek(7)
+        last = np.asarray(result.convert("RGBA"), dtype=np.int16)
+    with Image.open(still_path) as still:
+        still = np.asarray(still.convert("RGBA"), dtype=np.int16)
+
+    if mode == "mandelbrot":
+        # Resampled from a wider keyframe, which is rendered once per zoom step
+        assert np.abs(first - still).mean() < 8
+        stats = {path: count for (_, path), (count, _) in timer.stats.items()}
+        assert stats["image/render/animate.keyframe"] < 8
+    else:
+        assert np.abs(first - still).max() <= 1
+    assert not np.array_equal(first, last)
+
+
+def test_variants_share_one_decode(image_processor, tmp_path, capsys):
+    """Test K backgrounds per input: names, seeds, manifest and threads."""
+    import json
+    from rbgen.backgrounds.utils import PreparedForeground, compose_images
+    from rbgen.profiling import StageTimer, profiling
+
+    input_dir = tmp_path / "input_images"
+    input_dir.mkdir()
+    sprite = Image.new("RGBA", (64, 56), (0, 0, 0, 0))
+    sprite.paste((250, 250, 10, 160), (20, 20, 50, 40))
+    sprite.save(input_dir / "sprite.png")
+
+    # Blending only the visible box gives exactly compose_images' result
+    background = Image.new("RGBA", (64, 56), (10, 200, 30, 90))
+    assert (
+        PreparedForeground(sprite).composite(background).tobytes()
+        == compose_images(background, sprite).tobytes()
+    )
+
+    image_processor.process_directory(
+        str(input_dir), str(tmp_path / "single"), seed=5
+    )
+    timer = StageTimer()
+    with profiling(timer):
+        image_processor.process_directory(
+            str(input_dir), str(tmp_path / "variants"), seed=5, variants=3
+        )
+    assert "backgrounds (1/1" in capsys.readouterr().out
+    stats = {path: count for (_, path), (count, _) in timer.stats.items()}
+    assert stats["image/load"] == 1 and stats["image/mask"] == 1
+
+    outputs = [tmp_path / "variants" / f"sprite_v{k}.png" for k in range(3)]
+    assert all(path.exists() for path in outputs)
+    assert not (tmp_path / "variants" / "sprite.png").exists()
+    # The first variant is what a single-output run gives
+    with Image.open(outputs[0]) as first, Image.open(
+        tmp_path / "single" / "sprite.png"
+    ) as single:
+        assert first.tobytes() == single.tobytes()
+
+    with open(tmp_path / "variants" / ".rbgen_manifest.jsonl") as f:
+        entry = json.loads(f.readline())
+    assert [v["output"] for v in entry["variants"]] == [p.name for p in outputs]
+    assert len({v["seed"] for v in entry["variants"]}) == 3
+
+    # Up to date only for the same number of variants
+    image_processor.process_directory(
+        str(input_dir), str(tmp_path / "variants"), seed=5, variants=3
+    )
+    assert "Skipped 1 up-to-date image(s)" in capsys.readouterr().out
+    image_processor.process_directory(
+        str(input_dir), str(tmp_path / "variants"), seed=5, variants=4
+    )
+    assert "Processed: sprite.png" in capsys.readouterr().out
+
+    # Variants rendered concurrently match the serial ones
+    threaded = tmp_path / "threaded" / "sprite.png"
+    threaded.parent.mkdir()
+    threaded_entry = image_processor.process_file(
+        str(input_dir / "sprite.png"),
+        str(threaded),
+        seed=entry["seed"],
+        threads=3,
+        variants=3,
+    )
+    assert threaded_entry["variants"] == entry["variants"]
+    for k, path in enumerate(outputs):
+        with Image.open(path) as serial, Image.open(
+            threaded.parent / f"sprite_v{k}.png"
+        ) as concurrent:
+            assert serial.tobytes() == concurrent.tobytes()
+
+
+def test_process_tar_streams_shards_in_order(image_processor, tmp_path, capsys):
+    """Test tar shard input and output: names, params, order and workers."""
+    import io
+    import json
+    import tarfile
+    from rbgen.main import main
+
+    input_dir = tmp_path / "input_images"
+    input_dir.mkdir()
+    shard_path = tmp_path / "shard.tar"
+    with tarfile.open(shard_path, "w") as tar:
+        for name in ("b", "a", "c"):
+            path = input_dir / f"{name}.png"
+            sprite = Image.new("RGBA", (64, 56), (0, 0, 0, 0))
+            sprite.paste((250, 250, 10, 160), (20, 20, 50, 40))
+            sprite.save(path)
+            tar.add(path, arcname=f"{name}.png")
+            label = f"{name}\n".encode()
+            info = tarfile.TarInfo(f"{name}.cls")
+            info.size = len(label)
+            tar.addfile(info, io.BytesIO(label))
+
+    def members(data):
+        with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+            return [(m.name, tar.extractfile(m).read()) for m in tar.getmembers()]
+
+    output = io.BytesIO()
+    with open(shard_path, "rb") as source:
+        count = image_processor.process_tar(source, output, seed=9)
+    assert count == 3
+    serial = members(output.getvalue())
+    assert [name for name, _ in serial] == [
+        "b.png", "b.rbgen.json", "b.cls",
+        "a.png", "a.rbgen.json", "a.cls",
+        "c.png", "c.rbgen.json", "c.cls",
+    ]
+    params = json.loads(serial[1][1])
+    assert params["input"] == "b.png" and "mode" in params
+
+    # Same images as processing the loose files with the same run seed
+    image_processor.process_directory(
+        str(input_dir), str(tmp_path / "loose"), seed=9
+    )
+    with Image.open(io.BytesIO(serial[0][1])) as from_shard, Image.open(
+        tmp_path / "loose" / "b.png"
+    ) as loose:
+        assert from_shard.tobytes() == loose.tobytes()
+
+    # Workers keep the order; the CLI writes a shard file too
+    capsys.readouterr()
+    out_path = tmp_path / "out.tar"
+    main(["-i", str(shard_path), "-o", str(out_path), "-r", "--seed", "9", "-w", "2"])
+    assert "Processed: c.png" in capsys.readouterr().out
+    assert members(out_path.read_bytes()) == serial
+
+    # Shards split the samples, keeping each image with its label
+    split = []
+    for index in range(3):
+        shard_out = tmp_path / f"out_{index}.tar"
+        main([
+            "-i", str(shard_path), "-o", str(shard_out), "-r", "--seed", "9",
+            "--shard", f"{index}/3",
+        ])
+        split.extend(members(shard_out.read_bytes()))
+    assert sorted(split) == sorted(serial)
+
+    # Options only a directory run implements are rejected, not dropped
+    for option in (
+        ["--seed-by", "content"],
+        ["--only-changed"],
+        ["--force"],
+        ["--memory-budget", "64"],
+        ["--cost-model", "costs.json"],
+    ):
+        with pytest.raises(SystemExit):
+            main(["-i", str(shard_path), "-o", str(out_path)] + option)
+        assert f"{option[0]} do not apply to shards" in capsys.readouterr().err
+
+
+def test_render_service_over_localhost():
+    """Test the render service: keep-alive, settings, errors, queue and metrics."""
+    import base64
+    import http.client
+    import io
+    import json
+    from rbgen.service import RenderService
+
+    sprite = Image.new("RGBA", (64, 56), (0, 0, 0, 0))
+    sprite.paste((250, 250, 10, 160), (20, 20, 50, 40))
+    buffer = io.BytesIO()
+    sprite.save(buffer, format="PNG")
+    png = buffer.getvalue()
+
+    service = RenderService(workers=1, max_queue=0)
+    service.start()
+    try:
+        connection = http.client.HTTPConnection(*service.address, timeout=30)
+
+        def request(method, path, body=None, headers=None):
+            connection.request(method, path, body, headers or {})
+            response = connection.getresponse()
+            return response, response.read()
+
+        response, body = request(
+            "POST", "/render?mode=marble&colors=1e3c5a,c8b4a0&seed=7&turbulence=5", png
+        )
+        assert response.status == 200
+        assert response.getheader("Content-Type") == "image/png"
+        settings = json.loads(response.getheader("X-Rbgen-Settings"))
+        assert settings["mode"] == "marble" and settings["seed"] == 7
+        assert settings["colors"] == [[30, 60, 90], [200, 180, 160]]
+        assert settings["params"] == {"turbulence": 5}
+        with Image.open(io.BytesIO(body)) as result:
+            assert result.size == (64, 56)
+
+        # Same connection, JSON body, random settings
+        document = {"image": base64.b64encode(png).decode(), "format": "webp"}
+        response, body = request(
+            "POST",
+            "/render",
+            json.dumps(document),
+            {"Content-Type": "application/json"},
+        )
+        assert response.status == 200
+        assert response.getheader("Content-Type") == "image/webp"
+        random_mode = json.loads(response.getheader("X-Rbgen-Settings"))["mode"]
+
+        response, body = request("POST", "/render?mode=nope", png)
+        assert response.status == 400 and b"nope" in body
+        response, body = request("POST", "/render?mode=solid", b"not an image")
+        assert response.status == 400
+        for settings in (
+            {"colors": "1e3c5a"},
+            {"colors": [[30, 60]]},
+            {"colors": [[True, 0, 0]]},
+            {"colors": 7},
+            {"seed": True},
+            {"seed": 1.5},
+        ):
+            response, body = request(
+                "POST",
+                "/render",
+                json.dumps({**document, **settings}),
+                {"Content-Type": "application/json"},
+            )
+            assert response.status == 400, settings
+            assert b"Invalid" in body
+
+        # No worker or queue slot left: turned away rather than queued
+        service._slots.acquire()
+        response, _ = request("POST", "/render", png)
+        assert response.status == 503 and response.getheader("Retry-After")
+        service._slots.release()
+
+        response, body = request("GET", "/metrics")
+        metrics = json.loads(body)
+        assert metrics["errors"] == 8 and metrics["rejected"] == 1
+        assert metrics["modes"]["marble"]["count"] >= 1
+        assert metrics["modes"][random_mode]["p99_ms"] > 0
+        connection.close()
+    finally:
+        service.shutdown()
+
+
+def test_export_arrays_writes_memory_mapped_buckets(image_processor, tmp_path, capsys):
+    """Test .npy export: size buckets, index, workers and PNG equivalence."""
+    import json
+    import numpy as np
+
+    input_dir = tmp_path / "input_images"
+    input_dir.mkdir()
+    for name, size in (("a.png", (64, 56)), ("b.png", (48, 40)), ("c.png", (64, 56))):
+        sprite = Image.new("RGBA", size, (0, 0, 0, 0))
+        sprite.paste((250, 250, 10, 160), (10, 10, 30, 30))
+        sprite.save(input_dir / name)
+
+    paths = image_processor.export_arrays(
+        str(input_dir), str(tmp_path / "serial"), seed=4
+    )
+    assert sorted(paths) == [(48, 40), (64, 56)]
+    array = np.load(paths[(64, 56)], mmap_mode="r")
+    assert array.shape == (2, 56, 64, 3) and array.dtype == np.uint8
+    with open(tmp_path / "serial" / "images_64x56.json") as f:
+        index = json.load(f)
+    assert [entry["input"] for entry in index["entries"]] == ["a.png", "c.png"]
+    assert index["channels"] == "RGB" and "mode" in index["entries"][0]
+
+    # Same pixels as the PNGs of a run with the same seed
+    image_processor.process_directory(str(input_dir), str(tmp_path / "png"), seed=4)
+    with Image.open(tmp_path / "png" / "c.png") as png:
+        assert np.array_equal(array[1], np.asarray(png.convert("RGB")))
+
+    # Workers write disjoint slots of the same arrays
+    parallel = image_processor.export_arrays(
+        str(input_dir), str(tmp_path / "parallel"), seed=4, workers=2,
+        channels="RGBA",
+    )
+    for size, path in paths.items():
+        rgba = np.load(parallel[size])
+        assert rgba.shape[3] == 4
+        assert np.array_equal(rgba[..., :3], np.load(path))
+
+
+    # Options only a directory run implements are rejected, not dropped
+    from rbgen.main import main
+
+    command = ["-i", str(input_dir), "-o", str(tmp_path / "cli"), "--format", "npy"]
+    for option in (
+        ["--seed-by", "content"],
+        ["--only-changed"],
+        ["--force"],
+        ["--result-cache", str(tmp_path / "results")],
+        ["--link-results"],
+    ):
+        with pytest.raises(SystemExit):
+            main(command + option)
+        assert f"cannot be used with {option[0]}" in capsys.readouterr().err
+    assert not (tmp_path / "cli").exists()
+    assert not (tmp_path / "results").exists()
+
+
+def test_batched_jobs_match_single_files(image_processor, tmp_path):
+    """Test that same-size images rendered in batches match process_file."""
+    import json
+    from rbgen.profiling import StageTimer, profiling
+
+    input_dir = tmp_path / "input_images"
+    input_dir.mkdir()
+    for i in range(5):
+        sprite = Image.new("RGBA", (40, 30), (0, 0, 0, 0))
+        sprite.paste((200, 20 * i, 90, 255), (5 + i, 5, 25, 20))
+        sprite.save(input_dir / f"sprite{i}.png")
+    Image.new("RGBA", (24, 24), (0, 0, 0, 0)).save(input_dir / "other.png")
+
+    timer = StageTimer()
+    with profiling(timer):
+        image_processor.process_directory(
+            str(input_dir),
+            str(tmp_path / "output"),
+            mode="mandelbrot",
+            randomize=False,
+            seed=11,
+        )
+    stats = {path: count for (_, path), (count, _) in timer.stats.items()}
+    # The five same-size images ran as one batch, the other on its own
+    assert stats["batch"] == 1 and stats["image"] == 1
+
+    with open(tmp_path / "output" / ".rbgen_manifest.jsonl") as f:
+        entries = {entry["input"]: entry for entry in map(json.loads, f)}
+    assert len(entries) == 6
+    for name, entry in entries.items():
+        single = image_processor.process_file(
+            str(input_dir / name),
+            str(tmp_path / name),
+            mode="mandelbrot",
+            randomize=False,
+            seed=entry["seed"],
+        )
+        with Image.open(tmp_path / "output" / name) as batched, Image.open(
+            tmp_path / name
+        ) as expected:
+            assert batched.tobytes() == expected.tobytes()
+        assert {key: single[key] for key in ("mode", "colors", "params", "sha256")} == {
+            key: entry[key] for key in ("mode", "colors", "params", "sha256")
+        }
+
+    # In-memory batches give the same results as one image at a time
+    images = [Image.open(input_dir / f"sprite{i}.png") for i in range(5)]
+    results = image_processor.process_images(
+        images, mode="radial_pattern", randomize=False, seed=3
+    )
+    for image, (result, settings) in zip(images, results):
+        single, _ = image_processor._process_frame(
+            image, settings["seed"], "radial_pattern", False
+        )
+        assert result.tobytes() == single.tobytes()
+
+
+def test_result_cache_serves_repeated_work(image_processor, tmp_path, capsys):
+    """Test that identical inputs and reruns are served from the result cache."""
+    import io
+    import os
+    import shutil
+    import tarfile
+    from rbgen.processing.encoding import Encoder
+    from rbgen.processing.results import ResultCache
+
+    input_dir = tmp_path / "input_images"
+    input_dir.mkdir()
+    for name, color in (("a", (200, 40, 90, 255)), ("c", (20, 40, 250, 255))):
+        sprite = Image.new("RGBA", (40, 30), (0, 0, 0, 0))
+        sprite.paste(color, (5, 5, 25, 20))
+        sprite.save(input_dir / f"{name}.png")
+    # The same picture listed twice
+    shutil.copyfile(input_dir / "a.png", input_dir / "b.png")
+    run = dict(mode="radial_pattern", randomize=False, seed=5, seed_by="content")
+
+    cache = ResultCache(str(tmp_path / "cache"))
+    image_processor.process_directory(
+        str(input_dir), str(tmp_path / "first"), result_cache=cache, **run
+    )
+    assert "Result cache: 1 of 3 image(s) served" in capsys.readouterr().out
+    names = ("a.png", "b.png", "c.png")
+    first = {name: (tmp_path / "first" / name).read_bytes() for name in names}
+    assert first["a.png"] == first["b.png"] != first["c.png"]
+    assert len(cache.entries()) == 2
+
+    # A rerun elsewhere hardlinks every output from the cache
+    linked = ResultCache(str(tmp_path / "cache"), link=True)
+    image_processor.process_directory(
+        str(input_dir), str(tmp_path / "second"), result_cache=linked, **run
+    )
+    assert "Result cache: 3 of 3 image(s) served" in capsys.readouterr().out
+    for name, data in first.items():
+        assert (tmp_path / "second" / name).read_bytes() == data
+        assert os.stat(tmp_path / "second" / name).st_nlink > 1
+
+    # Rewriting a linked output leaves the cache entry alone
+    image_processor.process_directory(
+        str(input_dir),
+        str(tmp_path / "second"),
+        mode="solid",
+        randomize=False,
+        force=True,
+        seed=5,
+    )
+    for _, _, path in cache.entries():
+        with open(path, "rb") as f:
+            assert f.read() in first.values()
+
+    # Encoded samples (tar shards, the service) hit the same way
+    encoder = Encoder()
+    data = first["c.png"]
+    results = [
+        image_processor._process_sample(
+            data, 9, "marble", False, encoder, result_cache=cache
+        )
+        for _ in range(2)
+    ]
+    assert results[0] == results[1]
+    assert cache.hits == 1
+    with Image.open(io.BytesIO(results[1][0])) as result:
+        assert result.size == (40, 30)
+
+    # Tar members too, whether processed here or in workers
+    tar_cache = ResultCache(str(tmp_path / "tar_cache"))
+    shard = io.BytesIO()
+    with tarfile.open(fileobj=shard, mode="w") as tar:
+        info = tarfile.TarInfo("c.png")
+        info.size = len(data)
+        tar.addfile(info, io.BytesIO(data))
+    for workers in (1, 2, 1):
+        image_processor.process_tar(
+            io.BytesIO(shard.getvalue()), io.BytesIO(), seed=9, mode="marble",
+            randomize=False, workers=workers, result_cache=tar_cache,
+        )
+    assert tar_cache.hits == 1 and len(tar_cache.entries()) == 1
+
+    # Least recently used entries go first once over the size cap
+    cache.max_bytes = max(size for _, size, _ in cache.entries())
+    assert cache.trim() == 2
+    assert len(cache.entries()) == 1
+
+
+def test_resize_renders_backgrounds_at_output_size(image_processor, tmp_path, capsys):
+    """Test that a Resize scales inputs on decode and renders at the output size."""
+    import json
+    from rbgen.processing.resizing import Resize
+
+    input_dir = tmp_path / "input_images"
+    input_dir.mkdir()
+    sprite = Image.new("RGBA", (600, 400), (0, 0, 0, 0))
+    sprite.paste((200, 40, 90, 255), (100, 80, 400, 300))
+    sprite.save(input_dir / "big.png")
+    Image.new("RGBA", (50, 30), (0, 0, 0, 0)).save(input_dir / "small.png")
+
+    resize = Resize(max_size=120)
+    assert resize.output_size((600, 400)) == (120, 80)
+    assert resize.output_size((50, 30)) == (50, 30)
+    assert Resize(target_size=(100, 100)).output_size((50, 30)) == (100, 60)
+    with pytest.raises(ValueError):
+        Resize(max_size=0)
+
+    output_dir = tmp_path / "output"
+    run = dict(mode="marble", randomize=False, seed=4)
+    image_processor.process_directory(
+        str(input_dir), str(output_dir), resize=resize, **run
+    )
+    with Image.open(output_dir / "big.png") as result:
+        assert result.size == (120, 80)
+        resized = result.tobytes()
+    with open(output_dir / ".rbgen_manifest.jsonl") as f:
+        entries = {entry["input"]: entry for entry in map(json.loads, f)}
+    assert entries["big.png"]["resize"] == {"max_size": 120}
+
+    # Same as processing an input scaled down beforehand
+    resize.apply(Image.open(input_dir / "big.png")).save(tmp_path / "scaled.png")
+    image_processor.process_file(
+        str(tmp_path / "scaled.png"),
+        str(tmp_path / "expected.png"),
+        mode="marble",
+        randomize=False,
+        seed=entries["big.png"]["seed"],
+    )
+    with Image.open(tmp_path / "expected.png") as expected:
+        assert expected.tobytes() == resized
+
+    # Outputs are up to date for the same size only
+    capsys.readouterr()
+    image_processor.process_directory(
+        str(input_dir), str(output_dir), resize=resize, **run
+    )
+    assert "Skipped 2 up-to-date image(s)" in capsys.readouterr().out
+    image_processor.process_directory(str(input_dir), str(output_dir), **run)
+    with Image.open(output_dir / "big.png") as result:
+        assert result.size == (600, 400)